@@ -0,0 +1,233 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+DEFAULT_SEED = 42
+DEFAULT_START = "2026-01-01T00:00:00"
+# Simulated entries per second of log time.
+DEFAULT_RATE = 200.0
+# Entries per independently seeded block (the unit of parallel generation).
+BLOCK_SIZE = 65_536
+# Recent correlation ids a new entry may join, so traces span services.
+ACTIVE_TRACES = 64
+
+_INVENTORY_TRACE = json.dumps(
+    "Traceback (most recent call last):\n"
+    "  File \"/app/inventory/pool.py\", line 88, in acquire\n"
+    "    conn = self._connect(timeout=self.timeout)\n"
+    "  File \"/app/inventory/pool.py\", line 42, in _connect\n"
+    "    raise ConnectionRefusedError(\"max connections reached\")\n"
+    "ConnectionRefusedError: max connections reached"
+)[1:-1]
+_RECOMMENDATION_TRACE = json.dumps(
+    "Traceback (most recent call last):\n"
+    "  File \"/app/recs/features.py\", line 130, in fetch\n"
+    "    return self.client.get(key, timeout=0.2)\n"
+    "  File \"/app/recs/store.py\", line 57, in get\n"
+    "    raise FeatureStoreUnavailable(key)\n"
+    "recs.store.FeatureStoreUnavailable: feature store unavailable"
+)[1:-1]
+
+
+def _hex(rng):
+    return f"{rng.getrandbits(48):012x}"
+
+
+def _int(rng, low, high):
+    # Much cheaper than `randrange`, and just as deterministic.
+    return low + int(rng.random() * (high - low))
+
+
+# (service, level, relative weight, message factory, escaped stack trace or None).
+# Messages never contain characters that need JSON escaping.
+TEMPLATES = [
+    ("checkout-service", "INFO", 30, lambda r: f"Cart updated for user user{_int(r, 0, 50000)} items={_int(r, 1, 12)}", None),
+    ("checkout-service", "INFO", 10, lambda r: f"Checkout started order_id=ord-{_hex(r)}", None),
+    ("checkout-service", "WARN", 3, lambda r: f"Cart service slow response {_int(r, 300, 3000)}ms", None),
+    ("checkout-service", "ERROR", 1, lambda r: f"Order submission failed: inventory reservation timeout order_id=ord-{_hex(r)}", None),
+    ("auth-service", "INFO", 30, lambda r: f"User login successful: user{_int(r, 0, 50000)}@example.com", None),
+    ("auth-service", "INFO", 8, lambda r: f"Token refreshed for session sess-{_hex(r)}", None),
+    ("auth-service", "WARN", 2, lambda r: f"Failed login attempt for user{_int(r, 0, 50000)}@example.com from 10.{_int(r, 0, 256)}.{_int(r, 0, 256)}.{_int(r, 0, 256)}", None),
+    ("auth-service", "ERROR", 0.5, lambda r: f"JWT validation failed: signature expired for session sess-{_hex(r)}", None),
+    ("payment-gateway", "INFO", 20, lambda r: f"Payment processed transaction_id=txn-{_hex(r)} amount={_int(r, 100, 50000) / 100:.2f}", None),
+    ("payment-gateway", "WARN", 2, lambda r: f"Payment provider latency {_int(r, 500, 5000)}ms", None),
+    ("payment-gateway", "ERROR", 1, lambda r: f"Payment declined: Gateway Timeout (504) transaction_id=txn-{_hex(r)}", None),
+    ("inventory-db", "INFO", 15, lambda r: f"Query executed in {_int(r, 1, 400)}ms rows={_int(r, 0, 5000)}", None),
+    ("inventory-db", "WARN", 3, lambda r: f"Connection pool usage at {_int(r, 70, 100)}%", None),
+    ("inventory-db", "ERROR", 0.7, lambda r: "ConnectionRefusedError: max connections reached", _INVENTORY_TRACE),
+    ("recommendation-engine", "INFO", 10, lambda r: f"Recommendations generated for user{_int(r, 0, 50000)} in {_int(r, 5, 900)}ms", None),
+    ("recommendation-engine", "ERROR", 0.3, lambda r: "Exception: feature store unavailable, serving fallback recommendations", _RECOMMENDATION_TRACE),
+    ("search-api", "INFO", 15, lambda r: f"Search query served in {_int(r, 2, 600)}ms results={_int(r, 0, 200)}", None),
+    ("search-api", "WARN", 1, lambda r: f"Slow query detected: {_int(r, 1000, 9000)}ms for index products", None),
+    ("notification-service", "INFO", 8, lambda r: f"Email sent to user{_int(r, 0, 50000)}@example.com template=order_confirmation", None),
+    ("notification-service", "ERROR", 0.3, lambda r: "SMTP delivery failed: 421 service not available", None),
+    ("shipping-service", "INFO", 6, lambda r: f"Shipment label created shipment_id=shp-{_hex(r)}", None),
+    ("shipping-service", "ERROR", 0.2, lambda r: f"Carrier API returned 503 for shipment_id=shp-{_hex(r)}", None),
+] + [(service, "INFO", 4, lambda r: "Health check OK", None) for service in (
+    "checkout-service", "auth-service", "payment-gateway", "inventory-db",
+    "recommendation-engine", "search-api", "notification-service", "shipping-service",
+)]
+
+
+class CorpusGenerator:
+    """
+    Deterministic synthetic log corpus in the ingestor's JSON-lines format.
+
+    Entries follow a skewed template distribution (health checks and INFO
+    traffic dominate, errors are rare), timestamps advance at `rate` entries
+    per simulated second, and a `trace_share` of entries joins a recently
+    active correlation id so traces span services. Every `incident_every`
+    entries (on average) an error template bursts: for `burst_length`
+    entries it makes up `burst_share` of the traffic. Bursts are recorded in
+    `incidents` as ground truth for retrieval benchmarks.
+
+    The same `seed` always yields the same bytes, whatever the number of
+    workers. Lines are formatted directly instead of through `json.dumps`
+    and blocks are generated in parallel, so a multi-core host writes
+    millions of entries in seconds.
+    """
+    def __init__(self, seed=DEFAULT_SEED, rate=DEFAULT_RATE, start=DEFAULT_START, incident_every=50_000,
+                 burst_length=2_000, burst_share=0.3, trace_share=0.2):
+        self.seed = seed
+        self.rate = rate
+        self.start = datetime.fromisoformat(start)
+        self.incident_every = incident_every
+        self.burst_length = burst_length
+        self.burst_share = burst_share
+        self.trace_share = trace_share
+        self.incidents = []
+        self._prefixes = {}
+
+    def _timestamp(self, index):
+        second, micros = divmod(round(index * 1_000_000 / self.rate), 1_000_000)
+        prefix = self._prefixes.get(second)
+        if prefix is None:
+            if len(self._prefixes) > 4096:
+                self._prefixes.clear()
+            prefix = self._prefixes[second] = (self.start + timedelta(seconds=second)).isoformat()
+        return f"{prefix}.{micros:06d}"
+
+    def block(self, block, entries):
+        """
+        Lines and incidents of block number `block` (entries
+        `block * BLOCK_SIZE` up to `entries`). Every block has its own seeded
+        random state, so blocks can be generated in any order or in parallel
+        and the corpus stays the same.
+        """
+        rng = random.Random(self.seed * 1_000_003 + block)
+        block_start = block * BLOCK_SIZE
+        block_end = min(block_start + BLOCK_SIZE, entries)
+        weights = [weight for _, _, weight, _, _ in TEMPLATES]
+        errors = [i for i, template in enumerate(TEMPLATES) if template[1] == "ERROR"]
+        picks = rng.choices(range(len(TEMPLATES)), weights=weights, k=block_end - block_start)
+        traces = [_hex(rng) for _ in range(ACTIVE_TRACES)]
+        next_incident = block_start + _int(rng, 0, 2 * self.incident_every) if self.incident_every else None
+        incident = None
+        incidents, lines = [], []
+
+        for index, pick in zip(range(block_start, block_end), picks):
+            if index == next_incident:
+                incident = {"template": rng.choice(errors), "start_index": index, "count": 0,
+                            "end_index": min(index + self.burst_length, block_end)}
+                next_incident = index + self.burst_length + _int(rng, 1, 2 * self.incident_every)
+            if incident is not None:
+                if index >= incident["end_index"]:
+                    incidents.append(self._incident(incident))
+                    incident = None
+                elif rng.random() < self.burst_share:
+                    pick = incident["template"]
+                    incident["count"] += 1
+
+            service, level, _, message, stack_trace = TEMPLATES[pick]
+            if rng.random() < self.trace_share:
+                trace_id = traces[int(rng.random() * ACTIVE_TRACES)]
+            else:
+                trace_id = _hex(rng)
+                traces[int(rng.random() * ACTIVE_TRACES)] = trace_id
+            text = message(rng)
+            if incident is not None and pick == incident["template"] and "message" not in incident:
+                incident["message"] = text
+            line = (f'{{"timestamp": "{self._timestamp(index)}", "service": "{service}", "level": "{level}", '
+                    f'"correlation_id": "req-{trace_id}", "message": "{text}"')
+            if stack_trace:
+                line += f', "stack_trace": "{stack_trace}"'
+            lines.append(line + "}\n")
+        if incident is not None:
+            incidents.append(self._incident(incident))
+        return "".join(lines), incidents
+
+    def _incident(self, incident):
+        service, level, _, _, _ = TEMPLATES[incident["template"]]
+        return {
+            "service": service,
+            "level": level,
+            "message": incident.get("message", ""),
+            "count": incident["count"],
+            "start": self._timestamp(incident["start_index"]),
+            "end": self._timestamp(incident["end_index"]),
+        }
+
+    def write(self, path, entries, workers=1):
+        """
+        Writes `entries` lines to `path`, generating blocks in `workers`
+        processes (0 = one per core). Fills `incidents` and returns
+        {"entries", "bytes", "seconds", "incidents"}.
+        """
+        start = time.perf_counter()
+        workers = workers if workers > 0 else (os.cpu_count() or 1)
+        blocks = range((entries + BLOCK_SIZE - 1) // BLOCK_SIZE)
+        generate = functools.partial(_generate_block, self, entries=entries)
+        self.incidents = []
+        size = 0
+        pool = multiprocessing.Pool(workers) if workers > 1 and len(blocks) > 1 else None
+        try:
+            results = pool.imap(generate, blocks) if pool else map(generate, blocks)
+            with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                for text, incidents in results:
+                    size += len(text)
+                    f.write(text)
+                    self.incidents.extend(incidents)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return {"entries": entries, "bytes": size, "seconds": time.perf_counter() - start, "incidents": len(self.incidents)}
+
+
+def _generate_block(generator, block, entries):
+    return generator.block(block, entries)
+
+
+def incidents_path(path):
+    return f"{path}.incidents.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic log corpus for benchmarks")
+    parser.add_argument("--output", type=str, default="logsense_ai/data/raw/bench.log", help="Log file to write")
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Number of log entries")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed (same seed, same corpus)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Entries per second of simulated log time")
+    parser.add_argument("--start", type=str, default=DEFAULT_START, help="Timestamp of the first entry")
+    parser.add_argument("--incident_every", type=int, default=50_000, help="Mean entries between error bursts (0 = none)")
+    parser.add_argument("--workers", type=int, default=0, help="Generator processes (0 = one per CPU core)")
+    parser.add_argument("--burst_length", type=int, default=2_000, help="Entries an error burst lasts")
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed, rate=args.rate, start=args.start,
+                                incident_every=args.incident_every, burst_length=args.burst_length)
+    stats = generator.write(args.output, args.entries, workers=args.workers)
+    with open(incidents_path(args.output), "w") as f:
+        json.dump(generator.incidents, f, indent=2)
+    stats["entries_per_second"] = round(stats["entries"] / max(stats["seconds"], 1e-9), 1)
+    stats["seconds"] = round(stats["seconds"], 3)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = "Root cause: benchmark stub answer."
+
+
+class StubLLMServer:
+    """
+    Local stand-in for the OpenAI-compatible chat completions API, so
+    benchmarks measure LogSense and not a remote model. Answers every
+    request with `answer` after `delay` seconds (plain or streamed).
+
+    Use as a context manager; point `RAGEngine(llm_base_url=server.url)` at it.
+    """
+    def __init__(self, delay=0.0, answer=DEFAULT_ANSWER, host="127.0.0.1", port=0):
+        self.delay = delay
+        self.answer = answer
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                model = request.get("model", "stub")
+                if request.get("stream"):
+                    events = []
+                    for word in stub.answer.split(" "):
+                        delta = {"content": word + " "}
+                        events.append({"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                       "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                    self._send(body.encode("utf-8"), "text/event-stream")
+                    return
+                body = {
+                    "id": "stub", "object": "chat.completion", "created": 0, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": stub.answer}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }
+                self._send(json.dumps(body).encode("utf-8"), "application/json")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
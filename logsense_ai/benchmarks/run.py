@@ -0,0 +1,495 @@
+import argparse
+import functools
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+from logsense_ai.benchmarks.corpus import DEFAULT_SEED, CorpusGenerator, incidents_path
+from logsense_ai.benchmarks.llm_stub import StubLLMServer
+from logsense_ai.benchmarks.startup import measure_startup
+from logsense_ai.src.ingestion.ingestor import LogIngestor
+from logsense_ai.src.processing.chunker import CHUNKING_STRATEGIES, covered_entries
+from logsense_ai.src.processing.processor import LogProcessor
+from logsense_ai.src.models.ann_index import INDEX_TYPES, recall_at_k
+from logsense_ai.src.models.embedder import BatchEmbedder
+from logsense_ai.src.models.vector_store import LogVectorStore
+from logsense_ai.src.utils.timeutils import to_epoch
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Seconds around a sampled entry used by the filtered-search queries.
+FILTER_WINDOW_SECONDS = 300
+# Report sections compared against a baseline, and which way is better.
+COMPARED_SECTIONS = ("stages", "startup", "search", "recall", "incidents", "analyze")
+HIGHER_IS_BETTER = ("per_second", "recall@", "hit_rate@", "precision@")
+LOWER_IS_BETTER = ("seconds", "_ms", "_mb")
+# PQ training dominates a run on few cores; compare it with --recall_index_type ivf_pq.
+DEFAULT_RECALL_INDEX_TYPES = ("flat", "ivf_flat", "hnsw")
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+_VARIABLE_TOKEN = re.compile(r"\S*\d\S*")
+_IDENTIFIER = re.compile(r"\b(?:txn|ord|shp|sess)-[0-9a-f]{12}\b")
+
+
+class _HashingModel:
+    """
+    sentence-transformers stand-in: L2-normalised feature hashing of tokens.
+    """
+    def __init__(self, dimension):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                vectors[row, zlib.crc32(token.encode()) % self.dimension] += 1.0
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+class HashingEmbedder(BatchEmbedder):
+    """
+    `BatchEmbedder` over a feature-hashing model: no torch and no download,
+    and fast enough to index millions of chunks. Batching, caching and the
+    vector store run exactly as with the real model, so every stage but
+    model inference is measured; semantic search quality is not.
+    """
+    def __init__(self, dimension=384, **kwargs):
+        super().__init__(model_name=f"hashing-{dimension}", **kwargs)
+        self._model = _HashingModel(dimension)
+
+
+def rss_bytes():
+    """
+    Resident set size of this process (the peak so far where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _mb(size):
+    return round(size / (1 << 20), 1)
+
+
+class Stage:
+    """
+    Times one benchmark stage and samples this process's RSS on a background
+    thread to find its peak. `count(entries=...)` records work done; integer
+    counts also get a `<name>_per_second` rate. The result is stored in
+    `report[name]` on exit.
+    """
+    def __init__(self, name, report, interval=0.01):
+        self.name = name
+        self.report = report
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, rss_bytes())
+
+    def __enter__(self):
+        logger.info(f"Benchmark stage: {self.name}")
+        self._start_rss = self._peak = rss_bytes()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = self.elapsed
+        self._stop.set()
+        self._sampler.join()
+        self._peak = max(self._peak, rss_bytes())
+        result = {"seconds": round(seconds, 3), "peak_rss_mb": _mb(self._peak),
+                  "rss_growth_mb": _mb(self._peak - self._start_rss)}
+        for name, value in self.counts.items():
+            result[name] = round(value, 3) if isinstance(value, float) else value
+            if isinstance(value, int):
+                result[f"{name}_per_second"] = round(value / max(seconds, 1e-9), 1)
+        self.report[self.name] = result
+
+
+def _timed(iterable, totals, key):
+    """
+    Passes items through, adding the time spent producing them to `totals[key]`.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            totals[key] += time.perf_counter() - start
+            return
+        totals[key] += time.perf_counter() - start
+        yield item
+
+
+def latency_summary(samples):
+    """
+    Percentiles (milliseconds) of a list of durations in seconds.
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "queries": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _timings(calls):
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _free_text(message):
+    return " ".join(_VARIABLE_TOKEN.sub(" ", message).split())
+
+
+def sample_queries(store, count, seed=DEFAULT_SEED):
+    """
+    Builds queries from `count` randomly chosen indexed entries: the message
+    with variable tokens dropped, its first business identifier, and its
+    service, time and correlation id.
+    """
+    rng = random.Random(seed)
+    total = len(store.docstore)
+    positions = sorted(rng.sample(range(total), min(count, total)))
+    queries = []
+    for doc in store.docstore.get_many(positions):
+        entries = covered_entries(doc.page_content, doc.metadata)
+        text, metadata = entries[rng.randrange(len(entries))]
+        message = text.partition("]: ")[2].partition("\n")[0]
+        identifiers = _IDENTIFIER.findall(message)
+        queries.append({
+            "text": _free_text(message),
+            "identifier": identifiers[0] if identifiers else None,
+            "service": metadata.get("service"),
+            "epoch": to_epoch(metadata.get("timestamp")),
+            "trace_id": metadata.get("correlation_id"),
+        })
+    return queries
+
+
+def bench_search(store, queries, k):
+    """
+    Latency percentiles per query kind: free text (hybrid, vector, lexical),
+    identifier lookups, service/time-filtered search and trace lookups.
+    """
+    texts = [query["text"] for query in queries if query["text"]]
+    # Warm-up: loads the embedding model and touches the index pages.
+    store.search(texts[0] if texts else "error", k=k)
+    calls = {
+        mode: [functools.partial(store.search, text, k=k, mode=mode) for text in texts]
+        for mode in ("hybrid", "vector", "lexical")
+    }
+    calls["identifier"] = [functools.partial(store.search, query["identifier"], k=k)
+                           for query in queries if query["identifier"]]
+    calls["filtered"] = [
+        functools.partial(store.search, query["text"], k=k, filters={
+            "service": query["service"],
+            "since": query["epoch"] - FILTER_WINDOW_SECONDS,
+            "until": query["epoch"] + FILTER_WINDOW_SECONDS,
+        })
+        for query in queries if query["text"] and query["epoch"] is not None
+    ]
+    calls["trace"] = [functools.partial(store.trace, query["trace_id"]) for query in queries if query["trace_id"]]
+    return {kind: latency_summary(_timings(kind_calls)) for kind, kind_calls in calls.items() if kind_calls}
+
+
+def incident_query(incident):
+    """
+    (question, filters, needle) for a ground-truth incident: the needle is
+    the error message up to its first variable token.
+    """
+    needle = _VARIABLE_TOKEN.split(incident["message"])[0].strip() or incident["message"]
+    filters = {"since": to_epoch(incident["start"]), "until": to_epoch(incident["end"])}
+    return f"Why is {incident['service']} failing with {needle}?", filters, needle
+
+
+def bench_incidents(store, incidents, k):
+    """
+    For every generated error burst, asks about it within its time window:
+    `hit_rate@k` is the share of incidents with a matching chunk in the
+    top k, `precision@k` the share of returned chunks that match.
+    """
+    hits = matching = returned = 0
+    samples = []
+    for incident in incidents:
+        question, filters, needle = incident_query(incident)
+        start = time.perf_counter()
+        docs = store.search(question, k=k, filters=filters)
+        samples.append(time.perf_counter() - start)
+        matches = sum(1 for doc in docs
+                      if doc.metadata.get("service") == incident["service"] and needle in doc.page_content)
+        hits += matches > 0
+        matching += matches
+        returned += len(docs)
+    return {
+        "incidents": len(incidents),
+        f"hit_rate@{k}": round(hits / len(incidents), 4),
+        f"precision@{k}": round(matching / max(returned, 1), 4),
+        "latency": latency_summary(samples),
+    }
+
+
+def bench_analyze(index_path, embeddings, questions, k, delay):
+    """
+    End-to-end `RAGEngine.analyze_incident` latency against a local stub LLM.
+    """
+    # Heavy imports (LangChain, OpenAI client) only when this stage runs
+    from logsense_ai.src.models.rag_engine import RAGEngine
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    with StubLLMServer(delay=delay) as llm:
+        rag = RAGEngine(index_path=index_path, llm_base_url=llm.url, answer_cache_size=0, max_retries=0)
+        # Share the benchmark's embedder instead of loading a second model.
+        rag.vector_store.embeddings = embeddings
+        # The LLM client is created lazily; its one-off import cost is what `startup` tracks.
+        rag.llm
+        samples = _timings(functools.partial(rag.analyze_incident, question, k=k) for question in questions)
+        summary = latency_summary(samples)
+        summary["llm_requests"] = llm.requests
+        summary["llm_delay_ms"] = round(delay * 1000, 3)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        # Lists of per-variant results, e.g. recall per index type.
+        items = ((item.get("index_type", str(i)) if isinstance(item, dict) else str(i), item) for i, item in enumerate(value))
+    else:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield prefix, value
+        return
+    for key, item in items:
+        yield from _flatten(item, f"{prefix}.{key}" if prefix else str(key))
+
+
+def compare(baseline, report, tolerance=0.1):
+    """
+    Compares the metrics of two reports. Returns (metric, baseline, current,
+    relative change, regressed) rows; a metric regressed if it got worse by
+    more than `tolerance` (relative).
+    """
+    old = dict(_flatten({section: baseline.get(section) for section in COMPARED_SECTIONS}))
+    rows = []
+    for key, new in _flatten({section: report.get(section) for section in COMPARED_SECTIONS}):
+        if any(marker in key for marker in HIGHER_IS_BETTER):
+            direction = 1
+        elif key.endswith(LOWER_IS_BETTER):
+            direction = -1
+        else:
+            continue
+        if not old.get(key):
+            continue
+        change = (new - old[key]) / old[key]
+        rows.append((key, old[key], new, change, direction * change < -tolerance))
+    return rows
+
+
+def run_benchmarks(args):
+    """
+    Runs every stage and returns the report dict.
+    """
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="logsense-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    index_path = os.path.join(work_dir, "faiss_index")
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "stages": {},
+    }
+    stages = report["stages"]
+    with Stage("startup", stages):
+        report["startup"] = measure_startup()
+    for module, result in report["startup"].items():
+        if not result["ok"]:
+            logger.warning(f"{module} startup over budget: {result}")
+    try:
+        corpus = args.corpus
+        incidents = []
+        if corpus is None:
+            corpus = os.path.join(work_dir, "corpus.log")
+            generator = CorpusGenerator(seed=args.seed, incident_every=args.incident_every)
+            with Stage("generate", stages) as stage:
+                result = generator.write(corpus, args.entries, workers=args.generator_workers)
+                stage.count(entries=result["entries"], megabytes=_mb(result["bytes"]))
+            incidents = generator.incidents
+        elif os.path.exists(incidents_path(corpus)):
+            with open(incidents_path(corpus)) as f:
+                incidents = json.load(f)
+        report["corpus"] = {"path": corpus, "bytes": os.path.getsize(corpus), "incidents": len(incidents)}
+
+        ingestor = LogIngestor()
+        processor = LogProcessor(chunking=args.chunking)
+        with Stage("ingest", stages) as stage:
+            stage.count(entries=sum(1 for _ in ingestor.iter_file(corpus)))
+        with Stage("process", stages) as stage:
+            stage.count(chunks=sum(1 for _ in processor.iter_documents(ingestor.iter_file(corpus))))
+
+        embeddings = (HashingEmbedder(batch_size=args.embed_batch_size, log_progress=False) if args.embedder == "hashing"
+                      else BatchEmbedder(batch_size=args.embed_batch_size, workers=args.embed_workers, log_progress=False))
+        store = LogVectorStore(index_path=index_path, embeddings=embeddings, index_type=args.index_type)
+        totals = {"parse_chunk": 0.0}
+        documents = _timed(processor.iter_documents(ingestor.iter_file(corpus)), totals, "parse_chunk")
+        if args.max_chunks:
+            documents = itertools.islice(documents, args.max_chunks)
+        with Stage("index", stages) as stage:
+            chunks = store.add_documents_batched(documents, batch_size=args.batch_size)
+            embed_seconds = embeddings.stats.seconds
+            stage.count(chunks=chunks, parse_chunk_seconds=totals["parse_chunk"], embed_seconds=embed_seconds,
+                        store_seconds=stage.elapsed - totals["parse_chunk"] - embed_seconds,
+                        embed_chunks_per_second=round(chunks / max(embed_seconds, 1e-9), 1))
+
+        if chunks and args.recall_queries:
+            vectors = store.index.reconstruct_n(0, min(store.index.ntotal, args.recall_vectors))
+            with Stage("recall", stages):
+                report["recall"] = recall_at_k(vectors, index_types=args.recall_index_type or DEFAULT_RECALL_INDEX_TYPES,
+                                               k=args.k, n_queries=args.recall_queries)
+            del vectors
+
+        with Stage("save", stages):
+            store.save()
+        store.docstore.close()
+        store = LogVectorStore(index_path=index_path, embeddings=embeddings, index_type=args.index_type)
+        with Stage("load", stages):
+            store.load(read_only=True)
+        if store.empty:
+            raise RuntimeError(f"Benchmark index at {index_path} could not be loaded")
+
+        queries = sample_queries(store, args.queries, seed=args.seed)
+        with Stage("search", stages):
+            report["search"] = bench_search(store, queries, args.k)
+        if incidents:
+            with Stage("incidents", stages):
+                report["incidents"] = bench_incidents(store, incidents, args.k)
+        if args.analyze_queries:
+            questions = [incident_query(incident)[0] for incident in incidents]
+            questions += [query["text"] for query in queries if query["text"]]
+            with Stage("analyze", stages):
+                report["analyze"] = bench_analyze(index_path, embeddings, questions[:args.analyze_queries], args.k, args.llm_delay)
+        store.docstore.close()
+        embeddings.close()
+    finally:
+        if not args.keep_work_dir and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogSense-AI end-to-end pipeline and retrieval benchmarks")
+    parser.add_argument("--entries", type=int, default=200_000, help="Entries in the generated corpus")
+    parser.add_argument("--corpus", type=str, help="Benchmark an existing log file instead of generating one")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the corpus and query sample")
+    parser.add_argument("--incident_every", type=int, default=50_000, help="Mean entries between generated error bursts")
+    parser.add_argument("--generator_workers", type=int, default=0, help="Corpus generator processes (0 = one per CPU core)")
+    parser.add_argument("--work_dir", type=str, help="Directory for the corpus and index (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--keep_work_dir", action="store_true", help="Keep the temporary directory")
+    parser.add_argument("--chunking", type=str, default="grouped", choices=CHUNKING_STRATEGIES, help="Chunking strategy")
+    parser.add_argument("--embedder", type=str, default="model", choices=["model", "hashing"], help="Real embedding model, or feature hashing to benchmark everything but inference")
+    parser.add_argument("--embed_batch_size", type=int, default=64, help="Texts per embedding model forward pass")
+    parser.add_argument("--embed_workers", type=int, default=1, help="Embedding worker processes (0 = one per CPU core)")
+    parser.add_argument("--batch_size", type=int, default=512, help="Chunks embedded and added per batch")
+    parser.add_argument("--max_chunks", type=int, help="Index at most this many chunks")
+    parser.add_argument("--index_type", type=str, default="auto", choices=["auto"] + list(INDEX_TYPES), help="FAISS index structure")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--queries", type=int, default=200, help="Sampled entries turned into search queries")
+    parser.add_argument("--recall_queries", type=int, default=200, help="Queries for ANN recall@k (0 = skip)")
+    parser.add_argument("--recall_vectors", type=int, default=200_000, help="Max vectors the ANN recall stage builds indexes over")
+    parser.add_argument("--recall_index_type", type=str, action="append", choices=INDEX_TYPES, help="Index types compared for recall (repeatable; default flat, ivf_flat, hnsw)")
+    parser.add_argument("--analyze_queries", type=int, default=20, help="End-to-end analyses against the stub LLM (0 = skip)")
+    parser.add_argument("--llm_delay", type=float, default=0.0, help="Seconds the stub LLM waits before answering")
+    parser.add_argument("--output", type=str, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", type=str, help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change counted as a regression")
+    parser.add_argument("--fail_on_regression", action="store_true", help="Exit with status 1 if any metric regressed")
+    args = parser.parse_args()
+
+    # Per-batch progress of the library modules would drown the stage log.
+    logging.getLogger("logsense_ai.src").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = run_benchmarks(args)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        logger.info(f"Benchmark report written to {args.output}")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            logger.warning("Baseline was run with a different configuration; differences may not be regressions.")
+        rows = compare(baseline, report, args.tolerance)
+        regressions = [row for row in rows if row[4]]
+        for key, old, new, change, regressed in rows:
+            print(f"{'REGRESSION ' if regressed else ''}{key}: {old} -> {new} ({change:+.1%})", file=sys.stderr)
+        print(f"{len(regressions)} of {len(rows)} metrics regressed by more than {args.tolerance:.0%}.", file=sys.stderr)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Directory that contains the `logsense_ai` package; entry points are run from here.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Import-time budget (seconds) per CLI entry point. On-call tooling shells out
+# to search.py constantly, so these must stay far below the cost of the
+# dependencies they load lazily.
+IMPORT_BUDGETS = {
+    "logsense_ai.src.search": 0.25,
+    "logsense_ai.src.pipeline": 0.25,
+    "logsense_ai.src.detector": 0.25,
+    "logsense_ai.src.client": 0.25,
+}
+# Loaded only on the code paths that need them, never by importing an entry point.
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "faiss", "langchain_openai",
+                 "langchain_core", "langchain_text_splitters", "tiktoken", "numpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure_import(module, repeat=3):
+    """
+    Seconds to import `module` in a fresh interpreter (best of `repeat`, so a
+    cold page cache does not count), and the heavy modules it pulled in.
+    """
+    best, heavy = None, []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, cwd=REPO_ROOT, check=True)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or sample["seconds"] < best:
+            best = sample["seconds"]
+        heavy = sample["heavy"]
+    return best, heavy
+
+
+def measure_startup(budgets=IMPORT_BUDGETS, repeat=3, budget_scale=1.0):
+    """
+    {module: {"import_ms", "budget_ms", "heavy_modules", "ok"}} for every
+    entry point; a module fails if it is over budget (times `budget_scale`)
+    or imports any of `HEAVY_MODULES`.
+    """
+    results = {}
+    for module, budget in budgets.items():
+        seconds, heavy = measure_import(module, repeat=repeat)
+        results[module] = {
+            "import_ms": round(1000 * seconds, 1),
+            "budget_ms": round(1000 * budget * budget_scale, 1),
+            "heavy_modules": heavy,
+            "ok": seconds <= budget * budget_scale and not heavy,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogSense-AI CLI startup check")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per entry point (best time counts)")
+    parser.add_argument("--budget_scale", type=float, default=1.0, help="Multiply every budget, e.g. 2 on slow CI machines")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = measure_startup(repeat=args.repeat, budget_scale=args.budget_scale)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, result in results.items():
+            heavy = f", imports {', '.join(result['heavy_modules'])}" if result["heavy_modules"] else ""
+            print(f"{'ok  ' if result['ok'] else 'FAIL'} {module}: {result['import_ms']} ms (budget {result['budget_ms']} ms){heavy}")
+    if not all(result["ok"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
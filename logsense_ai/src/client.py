@@ -0,0 +1,116 @@
+import http.client
+import json
+import os
+import socket
+from urllib.parse import urlsplit
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+SERVER_URL_ENV = "LOGSENSE_SERVER_URL"
+
+
+class ServiceUnavailable(ConnectionError):
+    """
+    Raised when no query server is reachable at the configured address.
+    """
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class QueryClient:
+    """
+    Thin client for the resident query server (`logsense_ai.src.server`).
+
+    `url` is "http://host:port" or "unix:///path/to.sock"; it defaults to
+    $LOGSENSE_SERVER_URL, then http://127.0.0.1:8765. Only the standard
+    library is imported, so clients start instantly.
+    """
+    def __init__(self, url=None, timeout=120.0):
+        self.url = url or os.getenv(SERVER_URL_ENV) or DEFAULT_SERVER_URL
+        self.timeout = timeout
+
+    def _connection(self, timeout):
+        parts = urlsplit(self.url)
+        if parts.scheme == "unix":
+            return _UnixHTTPConnection(parts.path, timeout)
+        return http.client.HTTPConnection(parts.hostname or "127.0.0.1", parts.port or 80, timeout=timeout)
+
+    def _request(self, method, path, payload=None, timeout=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        conn = self._connection(timeout or self.timeout)
+        try:
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        except (ConnectionError, socket.timeout, FileNotFoundError, OSError) as e:
+            raise ServiceUnavailable(f"Query server not reachable at {self.url}: {e}") from e
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise RuntimeError(data.get("error", f"Query server returned HTTP {response.status}"))
+        return data
+
+    def health(self, timeout=1.0):
+        return self._request("GET", "/health", timeout=timeout)
+
+    def is_available(self):
+        try:
+            self.health()
+            return True
+        except (ServiceUnavailable, RuntimeError):
+            return False
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Returns a list of {"text", "metadata"} dicts.
+        """
+        return self._request("POST", "/search", {"query": query, "k": k, "filters": filters, "mode": mode})["results"]
+
+    def analyze(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Returns {"answer", "source_logs"} like `RAGEngine.analyze_incident`.
+        """
+        return self._request("POST", "/analyze", {"query": query, "k": k, "filters": filters, "mode": mode})
+
+    def trace(self, trace_id, limit=None):
+        """
+        Returns the {"text", "metadata"} entries of one correlation id, oldest first.
+        """
+        return self._request("POST", "/trace", {"trace_id": trace_id, "limit": limit})["entries"]
+
+    def stream_analyze(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Like `analyze`, but yields events as the server produces them:
+        {"type": "sources", ...}, {"type": "token", "text"}..., {"type": "done", "answer"}.
+        """
+        body = json.dumps({"query": query, "k": k, "filters": filters, "mode": mode}).encode("utf-8")
+        conn = self._connection(self.timeout)
+        try:
+            try:
+                conn.request("POST", "/analyze/stream", body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+            except (ConnectionError, socket.timeout, FileNotFoundError, OSError) as e:
+                raise ServiceUnavailable(f"Query server not reachable at {self.url}: {e}") from e
+            if response.status != 200:
+                data = json.loads(response.read() or b"{}")
+                raise RuntimeError(data.get("error", f"Query server returned HTTP {response.status}"))
+            for line in iter(response.readline, b""):
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "error":
+                    raise RuntimeError(event["error"])
+                yield event
+        finally:
+            conn.close()
+
+    def reload(self):
+        return self._request("POST", "/reload", {})
@@ -0,0 +1,184 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logsense_ai.src.client import QueryClient, ServiceUnavailable
+from logsense_ai.src.ingestion.ingestor import LogIngestor
+from logsense_ai.src.ingestion.parsers import log_formats
+from logsense_ai.src.ingestion.sources import expand_sources
+from logsense_ai.src.processing.anomaly import (AnomalyDetector, DEFAULT_MIN_COUNT, DEFAULT_SLOTS,
+                                                DEFAULT_SPIKE_FACTOR, DEFAULT_WINDOW_SECONDS, format_alert)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Spike analyses waiting for the LLM; further spikes are only reported.
+MAX_PENDING_ANALYSES = 4
+
+
+class StreamDetector:
+    """
+    Follows log files and feeds every entry to an `AnomalyDetector`.
+
+    One reader thread per file tails it with `LogIngestor.monitor_stream`;
+    alerts are logged as they fire and, with `analyze=True`, each spike
+    triggers a root-cause analysis of its burst window in the background
+    (through the query server when it is running, else an in-process
+    RAGEngine), so the explanation is ready by the time someone looks.
+    """
+    def __init__(self, log_files, from_start=False, poll_interval=1.0, analyze=False,
+                 index_path="logsense_ai/data/processed/faiss_index", k=5, server=None, json_output=False,
+                 log_format="auto", log_pattern=None, timestamp_format=None, **detector_kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.log_files = list(log_files)
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.analyze = analyze
+        self.index_path = index_path
+        self.k = k
+        self.json_output = json_output
+        self.ingestor = LogIngestor(log_format=log_format, log_pattern=log_pattern, timestamp_format=timestamp_format)
+        self.detector = AnomalyDetector(on_alert=self.on_alert, **detector_kwargs)
+        self.client = QueryClient(server)
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._readers = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analyze") if analyze else None
+        self._pending = 0
+        self._rag = None
+
+    def _reader(self, path):
+        stream = self.ingestor.monitor_stream(
+            path,
+            poll_interval=self.poll_interval,
+            start_offset=0 if self.from_start else None,
+            stop_event=self.stop_event,
+        )
+        for entry in stream:
+            with self._lock:
+                self.detector.observe(entry)
+
+    def on_alert(self, alert):
+        if self.json_output:
+            print(json.dumps(alert), flush=True)
+        else:
+            self.logger.warning(format_alert(alert))
+        if self.analyze and alert["type"] == "spike":
+            if self._pending >= MAX_PENDING_ANALYSES:
+                self.logger.info("Analysis queue full; skipping analysis of this spike.")
+                return
+            self._pending += 1
+            self._executor.submit(self._analyze, alert)
+
+    def _analyze_query(self, query, filters):
+        try:
+            return self.client.analyze(query, k=self.k, filters=filters)
+        except ServiceUnavailable:
+            pass
+        if self._rag is None:
+            if not os.path.exists(self.index_path):
+                raise FileNotFoundError(f"Index not found at {self.index_path}. Run pipeline first.")
+            # Heavy imports (torch, FAISS, LangChain) only when running without the server
+            from logsense_ai.src.models.rag_engine import RAGEngine
+            self._rag = RAGEngine(index_path=self.index_path)
+        return self._rag.analyze_incident(query, k=self.k, filters=filters)
+
+    def _analyze(self, alert):
+        try:
+            if alert["scope"] == "service_errors":
+                subject = "errors"
+            else:
+                subject = f"{alert['level']} '{alert['template']}' logs"
+            query = f"What is causing the burst of {subject} from {alert['service']}?"
+            filters = {"service": alert["service"], "since": alert["window_start"], "until": alert["window_end"]}
+            result = self._analyze_query(query, filters)
+            if self.json_output:
+                print(json.dumps({"type": "analysis", "alert": alert, "answer": result["answer"]}), flush=True)
+            else:
+                self.logger.info(f"Analysis of {format_alert(alert)}:\n{result['answer']}")
+        except Exception as e:
+            self.logger.error(f"Analysis failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def run(self):
+        """
+        Follows all files until `stop()` is called.
+        """
+        for path in self.log_files:
+            thread = threading.Thread(target=self._reader, args=(path,), name=f"detect:{path}", daemon=True)
+            thread.start()
+            self._readers.append(thread)
+        self.logger.info(f"Watching {len(self.log_files)} file(s) for anomalies. Press Ctrl+C to stop.")
+        try:
+            while not self.stop_event.is_set() and any(thread.is_alive() for thread in self._readers):
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            self.stop_event.set()
+            for thread in self._readers:
+                thread.join(timeout=self.poll_interval * 2)
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self.logger.info(f"Detector stopped after {self.detector.events} entries and {self.detector.alerts} alerts.")
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogSense-AI Anomaly Detector")
+    parser.add_argument("--log_file", type=str, nargs="+", default=["logsense_ai/data/raw/app.log"], help="Log files, directories or glob patterns to watch")
+    parser.add_argument("--log_format", type=str, default="auto", choices=log_formats(), help="Log line format (auto detects it per file)")
+    parser.add_argument("--log_pattern", type=str, help="Regex with named groups (timestamp, level, service, message) for --log_format regex")
+    parser.add_argument("--timestamp_format", type=str, help="strptime format for timestamps that are not ISO 8601")
+    parser.add_argument("--from_start", action="store_true", help="Replay the files from the beginning instead of only new lines")
+    parser.add_argument("--window_seconds", type=float, default=DEFAULT_WINDOW_SECONDS, help="Sliding window for burst counts")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Steps the sliding window advances in")
+    parser.add_argument("--spike_factor", type=float, default=DEFAULT_SPIKE_FACTOR, help="Alert when a window count exceeds this multiple of its baseline")
+    parser.add_argument("--min_count", type=int, default=DEFAULT_MIN_COUNT, help="Ignore bursts smaller than this many entries per window")
+    parser.add_argument("--poll_interval", type=float, default=1.0, help="Fallback polling interval when inotify is unavailable")
+    parser.add_argument("--json", action="store_true", help="Print alerts as JSON lines")
+    parser.add_argument("--analyze", action="store_true", help="Run a root-cause analysis of every spike's window in the background")
+    parser.add_argument("--index_path", type=str, default="logsense_ai/data/processed/faiss_index", help="Index used by --analyze without a query server")
+    parser.add_argument("--server", type=str, help="Query server URL (default $LOGSENSE_SERVER_URL or http://127.0.0.1:8765)")
+    parser.add_argument("--k", type=int, default=5, help="Log chunks retrieved per analysis")
+
+    args = parser.parse_args()
+    if args.log_format == "regex" and not args.log_pattern:
+        parser.error("--log_format regex requires --log_pattern")
+    log_files = expand_sources(args.log_file)
+    if not log_files:
+        parser.error(f"No log files match {' '.join(args.log_file)}")
+
+    detector = StreamDetector(
+        log_files,
+        from_start=args.from_start,
+        poll_interval=args.poll_interval,
+        analyze=args.analyze,
+        index_path=args.index_path,
+        k=args.k,
+        server=args.server,
+        json_output=args.json,
+        log_format=args.log_format,
+        log_pattern=args.log_pattern,
+        timestamp_format=args.timestamp_format,
+        window_seconds=args.window_seconds,
+        slots=args.slots,
+        spike_factor=args.spike_factor,
+        min_count=args.min_count,
+    )
+
+    signal.signal(signal.SIGTERM, lambda *_: detector.stop())
+    try:
+        detector.run()
+    except KeyboardInterrupt:
+        detector.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+import argparse
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from logsense_ai.src.ingestion.ingestor import LogIngestor
+from logsense_ai.src.ingestion.checkpoint import CheckpointStore, FileCheckpoint, hash_line
+from logsense_ai.src.ingestion.parsers import log_formats
+from logsense_ai.src.ingestion.sources import expand_sources
+from logsense_ai.src.processing.chunker import CHUNKING_STRATEGIES
+from logsense_ai.src.processing.processor import LogProcessor
+from logsense_ai.src.models.sharded_store import open_vector_store
+from logsense_ai.src.models.embedding_cache import default_cache_path
+from logsense_ai.src.models.tier_policy import INFO_TIERS
+from logsense_ai.src.models.versions import IndexLockedError, WriterLock
+from logsense_ai.src.utils.metrics import REGISTRY, format_stage_totals
+from logsense_ai.src.utils.timeutils import parse_duration, to_epoch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class IndexerMetrics:
+    """
+    Thread-safe counters describing how far the index is behind the logs.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.entries_read = 0
+        self.entries_indexed = 0
+        self.chunks_indexed = 0
+        self.batches = 0
+        self.flushes = 0
+        self.backpressure_waits = 0
+        self.last_flush_at = None
+        self.queue_lag_seconds = 0.0   # enqueue -> indexed, last batch
+        self.event_lag_seconds = None  # log timestamp -> indexed, last batch
+
+    def record_read(self):
+        with self._lock:
+            self.entries_read += 1
+
+    def record_backpressure(self):
+        with self._lock:
+            self.backpressure_waits += 1
+
+    def record_batch(self, entries, chunks, queue_lag, event_lag):
+        with self._lock:
+            self.entries_indexed += entries
+            self.chunks_indexed += chunks
+            self.batches += 1
+            self.queue_lag_seconds = queue_lag
+            if event_lag is not None:
+                self.event_lag_seconds = event_lag
+
+    def record_flush(self):
+        with self._lock:
+            self.flushes += 1
+            self.last_flush_at = time.time()
+
+    def snapshot(self, queue_depth=0):
+        with self._lock:
+            elapsed = max(time.time() - self.started_at, 1e-9)
+            return {
+                "entries_read": self.entries_read,
+                "entries_indexed": self.entries_indexed,
+                "chunks_indexed": self.chunks_indexed,
+                "batches": self.batches,
+                "flushes": self.flushes,
+                "queue_depth": queue_depth,
+                "backpressure_waits": self.backpressure_waits,
+                "queue_lag_seconds": round(self.queue_lag_seconds, 3),
+                "event_lag_seconds": None if self.event_lag_seconds is None else round(self.event_lag_seconds, 3),
+                "seconds_since_flush": None if self.last_flush_at is None else round(time.time() - self.last_flush_at, 1),
+                "entries_per_second": round(self.entries_indexed / elapsed, 2),
+            }
+
+
+class StreamingIndexer:
+    """
+    Long-running indexer: tails log files, micro-batches new entries and keeps
+    the FAISS index seconds behind production.
+
+    One reader thread per file feeds a bounded queue (readers block when the
+    indexer falls behind), the main loop embeds a batch whenever `batch_size`
+    entries are queued or `batch_interval` seconds have passed, and the index
+    plus checkpoints are published as a new index version every `flush_interval`
+    seconds. The index's writer lock is held from `catch_up` until `close`.
+    """
+    def __init__(self, log_files, index_path, batch_size=256, batch_interval=2.0,
+                 flush_interval=30.0, queue_size=10000, poll_interval=1.0, metrics_interval=60.0,
+                 use_embedding_cache=True, dedupe=False, index_type="auto", shard_by=None, retention=None,
+                 chunking="grouped", info_tier=None, info_sample_rate=None, metrics_file=None,
+                 log_format="auto", log_pattern=None, timestamp_format=None, lock_timeout=0.0):
+        self.logger = logging.getLogger(__name__)
+        self.log_files = list(log_files)
+        self.index_path = index_path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.metrics_interval = metrics_interval
+        self.metrics_file = metrics_file
+
+        self.ingestor = LogIngestor(log_format=log_format, log_pattern=log_pattern, timestamp_format=timestamp_format)
+        # Grouped chunks never span two micro-batches.
+        self.processor = LogProcessor(chunking=chunking)
+        self.vector_store = open_vector_store(
+            index_path,
+            shard_by=shard_by,
+            retention=retention,
+            embedding_cache_path=default_cache_path(index_path) if use_embedding_cache else None,
+            dedupe=dedupe,
+            index_type=index_type,
+            info_tier=info_tier,
+            info_sample_rate=info_sample_rate,
+        )
+        self.checkpoints = CheckpointStore(index_path)
+        self.lock = WriterLock(index_path, timeout=lock_timeout)
+        self._locked = False
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.metrics = IndexerMetrics()
+        self._readers = []
+        self._dirty = False
+
+    def catch_up(self):
+        """
+        Indexes everything written since the last checkpoint.
+        If any file's checkpoint is stale the whole index is rebuilt.
+        """
+        if not self._locked:
+            self.lock.acquire()
+            self._locked = True
+        self.checkpoints.load()
+        stale = any(
+            not self.ingestor.validate_checkpoint(path, self.checkpoints.get(path))
+            for path in self.log_files
+        )
+        if not stale:
+            self.vector_store.load()
+            stale = self.vector_store.empty
+        if stale:
+            self.logger.info("No usable checkpoint for all files. Rebuilding index from scratch.")
+            self.checkpoints.clear()
+
+        for path in self.log_files:
+            checkpoint = None if stale else self.checkpoints.get(path)
+            entries, new_checkpoint, _ = self.ingestor.iter_appended(path, checkpoint)
+            added = self.vector_store.add_documents_batched(self.processor.iter_documents(entries), batch_size=self.batch_size)
+            if added:
+                self._dirty = True
+                self.logger.info(f"Caught up {added} chunks from {path}.")
+            if new_checkpoint is not None:
+                self.checkpoints.update(new_checkpoint)
+        self.flush(force=True)
+
+    def _reader(self, path):
+        checkpoint = self.checkpoints.get(path)
+        start_offset = checkpoint.offset if checkpoint else 0
+        stream = self.ingestor.monitor_stream(
+            path,
+            poll_interval=self.poll_interval,
+            start_offset=start_offset,
+            stop_event=self.stop_event,
+            with_offsets=True,
+        )
+        for entry, line_offset, raw, inode in stream:
+            self.metrics.record_read()
+            item = (path, entry, line_offset, raw, inode, time.time())
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=self.poll_interval)
+                    break
+                except queue.Full:
+                    self.metrics.record_backpressure()
+
+    def _next_batch(self):
+        """
+        Collects up to `batch_size` queued entries, waiting at most `batch_interval`.
+        """
+        batch = []
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def index_batch(self, batch):
+        """
+        Normalises, chunks and embeds one micro-batch and advances the in-memory checkpoints.
+        """
+        if not batch:
+            return
+        logs = [entry for _, entry, _, _, _, _ in batch]
+        documents = list(self.processor.iter_documents(logs))
+        if documents:
+            chunks, metadatas = zip(*documents)
+            self.vector_store.add_texts(list(chunks), metadatas=list(metadatas))
+        self._dirty = True
+
+        # The inode the line was read from: by now `path` may name a rotated-in file.
+        last_lines = {}
+        for path, _, line_offset, raw, inode, _ in batch:
+            last_lines[path] = (line_offset, raw, inode)
+        for path, (line_offset, raw, inode) in last_lines.items():
+            self.checkpoints.update(FileCheckpoint(
+                path,
+                inode=inode,
+                offset=line_offset + len(raw),
+                last_line_offset=line_offset,
+                last_line_hash=hash_line(raw),
+            ))
+
+        now = time.time()
+        queue_lag = now - min(enqueued_at for _, _, _, _, _, enqueued_at in batch)
+        timestamps = [to_epoch(entry.get("timestamp")) for entry in logs]
+        timestamps = [ts for ts in timestamps if ts is not None]
+        event_lag = now - min(timestamps) if timestamps else None
+        self.metrics.record_batch(len(batch), len(documents), queue_lag, event_lag)
+
+    def flush(self, force=False):
+        """
+        Atomically publishes the index and checkpoints if anything changed.
+        """
+        if not (self._dirty or force) or self.vector_store.empty:
+            return
+        self.vector_store.save(sidecars=[self.checkpoints])
+        self._dirty = False
+        self.metrics.record_flush()
+
+    def run(self):
+        """
+        Catches up, then follows all files until `stop()` is called.
+        """
+        self.catch_up()
+        for path in self.log_files:
+            thread = threading.Thread(target=self._reader, args=(path,), name=f"tail:{path}", daemon=True)
+            thread.start()
+            self._readers.append(thread)
+        self.logger.info(f"Following {len(self.log_files)} file(s). Press Ctrl+C to stop.")
+
+        last_flush = time.monotonic()
+        last_report = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                self.index_batch(self._next_batch())
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    self.flush()
+                    last_flush = time.monotonic()
+                if time.monotonic() - last_report >= self.metrics_interval:
+                    self.report_metrics()
+                    last_report = time.monotonic()
+        finally:
+            self.stop_event.set()
+            for thread in self._readers:
+                thread.join(timeout=self.poll_interval * 2)
+            # Drain whatever the readers managed to enqueue before stopping.
+            remaining = []
+            while not self.queue.empty():
+                remaining.append(self.queue.get_nowait())
+            self.index_batch(remaining)
+            self.flush()
+            self.close()
+            self.report_metrics(final=True)
+
+    def report_metrics(self, final=False):
+        """
+        Logs the lag metrics and stage times, and writes them to `metrics_file`
+        (lag metrics as `indexer_*` gauges) if one was given.
+        """
+        snapshot = self.metrics.snapshot(0 if final else self.queue.qsize())
+        self.logger.info(f"{'Indexer stopped. Final' if final else 'Indexer'} metrics: {snapshot}")
+        self.logger.info(f"Stage times: {format_stage_totals(REGISTRY.stage_totals())}")
+        if not self.metrics_file:
+            return
+        for key, value in snapshot.items():
+            if value is not None:
+                REGISTRY.gauge(f"indexer_{key}").set(value)
+        REGISTRY.write(self.metrics_file, extra={"log_files": self.log_files, "index_path": self.index_path})
+
+    def stop(self):
+        self.stop_event.set()
+
+    def close(self):
+        self.vector_store.close()
+        if self._locked:
+            self.lock.release()
+            self._locked = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogSense-AI Streaming Indexer")
+    parser.add_argument("--log_file", type=str, nargs="+", default=["logsense_ai/data/raw/app.log"], help="Log files, directories or glob patterns to index")
+    parser.add_argument("--log_format", type=str, default="auto", choices=log_formats(), help="Log line format (auto detects it per file)")
+    parser.add_argument("--log_pattern", type=str, help="Regex with named groups (timestamp, level, service, message) for --log_format regex")
+    parser.add_argument("--timestamp_format", type=str, help="strptime format for timestamps that are not ISO 8601")
+    parser.add_argument("--index_path", type=str, default="logsense_ai/data/processed/faiss_index", help="Path to save FAISS index")
+    parser.add_argument("--follow", action="store_true", help="Keep running and index new lines as they are written")
+    parser.add_argument("--batch_size", type=int, default=256, help="Max entries per micro-batch")
+    parser.add_argument("--batch_interval", type=float, default=2.0, help="Max seconds to wait before embedding a partial batch")
+    parser.add_argument("--flush_interval", type=float, default=30.0, help="Seconds between index flushes to disk")
+    parser.add_argument("--queue_size", type=int, default=10000, help="Max queued entries before readers block")
+    parser.add_argument("--poll_interval", type=float, default=1.0, help="Fallback polling interval when inotify is unavailable")
+    parser.add_argument("--metrics_interval", type=float, default=60.0, help="Seconds between lag metric reports")
+    parser.add_argument("--metrics_file", type=str, help="Rewrite lag metrics and stage timings here at every report (.prom = Prometheus text, else JSON)")
+    parser.add_argument("--no_embedding_cache", action="store_true", help="Disable the on-disk embedding cache")
+    parser.add_argument("--dedupe", action="store_true", help="Store identical chunks once with an occurrence count")
+    parser.add_argument("--chunking", type=str, default="grouped", choices=CHUNKING_STRATEGIES, help="Pack consecutive entries of a service into shared chunks, or chunk every entry on its own")
+    parser.add_argument("--shard_by", type=str, choices=["hour", "day"], help="Partition the index into hourly or daily shards")
+    parser.add_argument("--retention", type=str, help="Drop shards older than this, e.g. 7d (sharded indexes only)")
+    parser.add_argument("--info_tier", type=str, choices=INFO_TIERS, help="How chunks below WARN are indexed: embedded, sampled, as templates or lexical-only (default: keep the index's policy, else embed)")
+    parser.add_argument("--info_sample_rate", type=float, help="Share of INFO chunks embedded with --info_tier sample (default 0.1)")
+    parser.add_argument("--lock_timeout", type=float, default=0.0, help="Seconds to wait for another writer of the index to finish (default: fail at once)")
+    parser.add_argument("--index_type", type=str, default="auto", choices=["auto", "flat", "hnsw", "ivf_flat", "ivf_pq"], help="FAISS index structure (auto picks by corpus size)")
+
+    args = parser.parse_args()
+    try:
+        retention = parse_duration(args.retention) if args.retention else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.log_format == "regex" and not args.log_pattern:
+        parser.error("--log_format regex requires --log_pattern")
+    log_files = expand_sources(args.log_file)
+    if not log_files:
+        parser.error(f"No log files match {' '.join(args.log_file)}")
+
+    os.makedirs(os.path.dirname(args.index_path), exist_ok=True)
+
+    indexer = StreamingIndexer(
+        log_files,
+        args.index_path,
+        batch_size=args.batch_size,
+        batch_interval=args.batch_interval,
+        flush_interval=args.flush_interval,
+        queue_size=args.queue_size,
+        poll_interval=args.poll_interval,
+        metrics_interval=args.metrics_interval,
+        metrics_file=args.metrics_file,
+        use_embedding_cache=not args.no_embedding_cache,
+        dedupe=args.dedupe,
+        chunking=args.chunking,
+        info_tier=args.info_tier,
+        info_sample_rate=args.info_sample_rate,
+        index_type=args.index_type,
+        shard_by=args.shard_by,
+        retention=retention,
+        log_format=args.log_format,
+        log_pattern=args.log_pattern,
+        timestamp_format=args.timestamp_format,
+        lock_timeout=args.lock_timeout,
+    )
+
+    try:
+        if not args.follow:
+            try:
+                indexer.catch_up()
+            finally:
+                indexer.close()
+            return
+
+        signal.signal(signal.SIGTERM, lambda *_: indexer.stop())
+        try:
+            indexer.run()
+        except KeyboardInterrupt:
+            indexer.stop()
+    except IndexLockedError as e:
+        indexer.close()
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import os
+
+CHECKPOINT_FILENAME = "ingest_checkpoint.json"
+
+
+def hash_line(raw_line):
+    """
+    Returns a stable content hash for a raw log line (bytes or str).
+    Trailing whitespace is ignored so the hash does not depend on line endings.
+    """
+    if isinstance(raw_line, str):
+        raw_line = raw_line.encode("utf-8")
+    return hashlib.sha256(raw_line.rstrip()).hexdigest()
+
+
+class FileCheckpoint:
+    """
+    Position of the ingestion pipeline inside a single log file.
+
+    `offset` is the byte offset just past the last consumed line.
+    `last_line_offset` / `last_line_hash` identify that last line so a
+    rewritten file of the same (or larger) size can be detected.
+    """
+    def __init__(self, path, inode=None, offset=0, last_line_offset=None, last_line_hash=None):
+        self.path = path
+        self.inode = inode
+        self.offset = offset
+        self.last_line_offset = last_line_offset
+        self.last_line_hash = last_line_hash
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "inode": self.inode,
+            "offset": self.offset,
+            "last_line_offset": self.last_line_offset,
+            "last_line_hash": self.last_line_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            path=data["path"],
+            inode=data.get("inode"),
+            offset=data.get("offset", 0),
+            last_line_offset=data.get("last_line_offset"),
+            last_line_hash=data.get("last_line_hash"),
+        )
+
+    def __repr__(self):
+        return f"FileCheckpoint(path={self.path!r}, inode={self.inode}, offset={self.offset})"
+
+
+class CheckpointStore:
+    """
+    Persists per-file ingestion checkpoints as a small JSON file that lives
+    next to the vector index it describes.
+    """
+    def __init__(self, index_path):
+        self.logger = logging.getLogger(__name__)
+        self.path = os.path.join(index_path, CHECKPOINT_FILENAME)
+        self.checkpoints = {}
+
+    @staticmethod
+    def _key(filepath):
+        return os.path.abspath(filepath)
+
+    def load(self):
+        """
+        Loads checkpoints from disk. A missing or unreadable file yields an empty store.
+        """
+        self.checkpoints = {}
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            for entry in data.get("files", []):
+                cp = FileCheckpoint.from_dict(entry)
+                self.checkpoints[self._key(cp.path)] = cp
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint file {self.path}: {e}")
+            self.checkpoints = {}
+        return self
+
+    def save(self, directory=None):
+        """
+        Writes checkpoints to disk (write-then-rename so readers never see a partial file).
+        `directory` overrides the index directory, e.g. when staging a new index version.
+        """
+        path = os.path.join(directory, CHECKPOINT_FILENAME) if directory else self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": [cp.to_dict() for cp in self.checkpoints.values()]}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def get(self, filepath):
+        return self.checkpoints.get(self._key(filepath))
+
+    def update(self, checkpoint):
+        self.checkpoints[self._key(checkpoint.path)] = checkpoint
+
+    def clear(self):
+        self.checkpoints = {}
@@ -1,64 +1,367 @@
-import json
+import gzip
+import io
+import itertools
 import logging
 import os
-import time
+from logsense_ai.src.ingestion.checkpoint import FileCheckpoint, hash_line
+from logsense_ai.src.ingestion.parsers import (DETECT_SAMPLE_LINES, append_continuation, detect_format, get_parser,
+                                               iter_entries, source_service)
+from logsense_ai.src.ingestion.watcher import FileWatcher
+
+COMPRESSED_SUFFIXES = (".gz", ".zst", ".zstd")
+# Bytes decompressed per read when skipping ahead in a non-seekable stream.
+SKIP_CHUNK_SIZE = 1 << 20
+
+
+def seek_forward(f, offset):
+    """
+    Positions `f` at byte `offset` (from the start). Streams that cannot seek,
+    like zstd decompressors, are read forward to it; they must be at 0.
+    Returns False if the stream ends before `offset`.
+    """
+    if offset == 0:
+        return True
+    if f.seekable():
+        f.seek(offset)
+        return True
+    remaining = offset
+    while remaining:
+        chunk = f.read(min(remaining, SKIP_CHUNK_SIZE))
+        if not chunk:
+            return False
+        remaining -= len(chunk)
+    return True
+
 
 class LogIngestor:
     """
     Handles ingestion of logs from files and simulated streams.
+
+    Lines are parsed by the parser registered for `log_format` (see
+    `parsers.py`); "auto" detects the format of every file from its first
+    lines. `log_pattern` / `timestamp_format` configure the "regex" format.
+    Entries without a service are attributed to their file's name.
     """
     
-    def __init__(self):
+    def __init__(self, log_format="auto", log_pattern=None, timestamp_format=None):
         self.logger = logging.getLogger(__name__)
+        self.log_format = log_format
+        self.log_pattern = log_pattern
+        self.timestamp_format = timestamp_format
+        self._parsers = {}
+        if log_format != "auto":
+            # Fail on a bad format or pattern before any file is opened.
+            self._parser = get_parser(log_format, log_pattern, timestamp_format)
 
-    def load_file(self, filepath):
+    @staticmethod
+    def is_compressed(filepath):
+        return filepath.endswith(COMPRESSED_SUFFIXES)
+
+    def format_for(self, filepath):
         """
-        Reads a static log file and returns a list of log entries (dicts).
-        Supports JSON format.
+        The log format of `filepath`: `log_format`, or the detected one for "auto".
+        """
+        return self._resolve(filepath)[0]
+
+    def parser_for(self, filepath):
+        """
+        The parser used for `filepath`.
+        """
+        return self._resolve(filepath)[1]
+
+    def _resolve(self, filepath):
+        """
+        (log_format, parser) for `filepath`; with "auto" the format is
+        detected once per file from its first lines.
+        """
+        if self.log_format != "auto":
+            return self.log_format, self._parser
+        resolved = self._parsers.get(filepath)
+        if resolved is None:
+            try:
+                with self._open_binary(filepath) as f:
+                    sample = list(itertools.islice((line for line in f if line.strip()), DETECT_SAMPLE_LINES))
+            except OSError:
+                sample = []
+            log_format = detect_format(sample)
+            if log_format != "json":
+                self.logger.info(f"Detected {log_format} log format for {filepath}")
+            resolved = self._parsers[filepath] = (log_format, get_parser(log_format, self.log_pattern, self.timestamp_format))
+        return resolved
+
+    def _warn_malformed(self, raw):
+        self.logger.warning(f"Skipping malformed line: {raw.strip().decode(errors='replace')}")
+
+    def _entries(self, filepath, lines):
+        return iter_entries(self.parser_for(filepath), lines, service=source_service(filepath),
+                            on_malformed=self._warn_malformed)
+
+    def _open_binary(self, filepath):
+        """
+        Opens a log file for binary line iteration, transparently decompressing
+        gzip (.gz) and zstandard (.zst) rotated files as streams.
+        """
+        if filepath.endswith(".gz"):
+            return gzip.open(filepath, 'rb')
+        if filepath.endswith((".zst", ".zstd")):
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError("Reading .zst logs requires the 'zstandard' package (pip install zstandard).") from e
+            raw = open(filepath, 'rb')
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+        return open(filepath, 'rb')
+
+    def iter_file(self, filepath):
+        """
+        Lazily yields log entries (dicts) from a static log file, one line at a time,
+        so memory use is independent of file size. Supports JSON format, optionally
+        gzip/zstd compressed. Lines are parsed in the file's log format.
         """
-        logs = []
         if not os.path.exists(filepath):
             self.logger.error(f"File not found: {filepath}")
-            return logs
-        
+            return
+
         try:
-            with open(filepath, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        try:
-                            log_entry = json.loads(line)
-                            logs.append(log_entry)
-                        except json.JSONDecodeError:
-                            self.logger.warning(f"Skipping malformed line: {line.strip()}")
+            with self._open_binary(filepath) as f:
+                for entry, _, _ in self._entries(filepath, ((0, line) for line in f)):
+                    yield entry
         except Exception as e:
             self.logger.error(f"Error reading file {filepath}: {e}")
-            
-        return logs
 
-    def monitor_stream(self, filepath, poll_interval=1.0):
+    def load_file(self, filepath):
+        """
+        Reads a static log file and returns a list of log entries (dicts).
+        Prefer `iter_file` for large files.
+        """
+        return list(self.iter_file(filepath))
+
+    def _iter_raw_lines(self, filepath, start_offset=0):
+        """
+        Yields (line_offset, raw_bytes) for every complete line from `start_offset`.
+        A trailing line without a newline is only yielded if it already parses
+        in the file's format; otherwise it is assumed to still be in the middle
+        of being written. Offsets of compressed files refer to the decompressed stream.
+        """
+        parser = self.parser_for(filepath)
+        with self._open_binary(filepath) as f:
+            if not seek_forward(f, start_offset):
+                return
+            offset = start_offset
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    if parser.parse(raw) is None:
+                        return
+                yield offset, raw
+                offset += len(raw)
+
+    def validate_checkpoint(self, filepath, checkpoint):
+        """
+        Returns True if `checkpoint` still describes a prefix of `filepath`.
+        Detects rotation (inode change), truncation (file shorter than the
+        offset) and in-place rewrites (last consumed line no longer matches).
+        """
+        if checkpoint is None:
+            return False
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+
+        if checkpoint.inode is not None and stat.st_ino != checkpoint.inode:
+            self.logger.info(f"{filepath} was rotated (inode changed).")
+            return False
+        if stat.st_size < checkpoint.offset and not self.is_compressed(filepath):
+            self.logger.info(f"{filepath} was truncated ({stat.st_size} < {checkpoint.offset} bytes).")
+            return False
+        if checkpoint.last_line_hash is not None:
+            with self._open_binary(filepath) as f:
+                found = seek_forward(f, checkpoint.last_line_offset)
+                last_line = f.read(checkpoint.offset - checkpoint.last_line_offset) if found else b""
+            if hash_line(last_line) != checkpoint.last_line_hash:
+                self.logger.info(f"{filepath} was rewritten (last checkpointed line changed).")
+                return False
+        return True
+
+    def iter_appended(self, filepath, checkpoint=None):
+        """
+        Streaming counterpart of `load_appended`.
+        Returns (entries, new_checkpoint, resumed) where `entries` is a generator;
+        `new_checkpoint` advances as the generator is consumed.
+        """
+        if not os.path.exists(filepath):
+            self.logger.error(f"File not found: {filepath}")
+            return iter(()), checkpoint, False
+
+        new_checkpoint, resumed = self._resume_from(filepath, checkpoint)
+
+        def entries():
+            try:
+                lines = self._iter_raw_lines(filepath, new_checkpoint.offset)
+                # A multi-line entry is checkpointed after its last line.
+                for entry, line_offset, raw in self._entries(filepath, lines):
+                    new_checkpoint.offset = line_offset + len(raw)
+                    new_checkpoint.last_line_offset = line_offset
+                    new_checkpoint.last_line_hash = hash_line(raw)
+                    yield entry
+            except Exception as e:
+                self.logger.error(f"Error reading file {filepath}: {e}")
+
+        return entries(), new_checkpoint, resumed
+
+    def _resume_from(self, filepath, checkpoint):
+        """
+        Returns (new_checkpoint, resumed): a copy of `checkpoint` if it is still
+        valid for `filepath`, else a checkpoint at the start of the file.
+        """
+        if self.validate_checkpoint(filepath, checkpoint):
+            return FileCheckpoint(
+                filepath,
+                inode=checkpoint.inode,
+                offset=checkpoint.offset,
+                last_line_offset=checkpoint.last_line_offset,
+                last_line_hash=checkpoint.last_line_hash,
+            ), True
+        return FileCheckpoint(filepath, inode=os.stat(filepath).st_ino), False
+
+    def iter_appended_parallel(self, filepath, parser, checkpoint=None, documents=True):
+        """
+        Multi-process counterpart of `iter_appended` for uncompressed files in
+        a single-line format: `parser` (a `ParallelParser`) parses, normalises
+        and chunks byte ranges of the file in worker processes. Yields (chunk, metadata) pairs, or
+        entries if `documents` is False, in file order.
+        Returns (items, new_checkpoint, resumed).
+        """
+        if not os.path.exists(filepath):
+            self.logger.error(f"File not found: {filepath}")
+            return iter(()), checkpoint, False
+
+        new_checkpoint, resumed = self._resume_from(filepath, checkpoint)
+
+        def items():
+            try:
+                for result in parser.iter_ranges(filepath, new_checkpoint.offset, documents=documents,
+                                                 log_format=self.format_for(filepath)):
+                    for line in result["malformed"]:
+                        self.logger.warning(f"Skipping malformed line: {line}")
+                    yield from result["items"]
+                    new_checkpoint.offset = result["end"]
+                    if result["last_line_offset"] is not None:
+                        new_checkpoint.last_line_offset = result["last_line_offset"]
+                        new_checkpoint.last_line_hash = result["last_line_hash"]
+            except Exception as e:
+                self.logger.error(f"Error reading file {filepath}: {e}")
+
+        return items(), new_checkpoint, resumed
+
+    def load_appended(self, filepath, checkpoint=None):
+        """
+        Reads only the entries appended to `filepath` since `checkpoint`.
+        Returns (logs, new_checkpoint, resumed). `resumed` is False when the
+        checkpoint could not be trusted and the file was read from the start.
+        """
+        entries, new_checkpoint, resumed = self.iter_appended(filepath, checkpoint)
+        return list(entries), new_checkpoint, resumed
+
+    def _file_replaced(self, filepath, inode, position):
+        """
+        Returns True if the file at `filepath` is no longer the one being tailed
+        (rotated to a new inode) or was truncated below the current position.
+        """
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            return False  # Mid-rotation: wait for the new file to appear
+        if stat.st_ino != inode:
+            self.logger.info(f"{filepath} was rotated. Following the new file.")
+            return True
+        if stat.st_size < position:
+            self.logger.info(f"{filepath} was truncated. Restarting from the beginning.")
+            return True
+        return False
+
+    def monitor_stream(self, filepath, poll_interval=1.0, start_offset=None, stop_event=None, with_offsets=False):
         """
         Generator that yields new log lines as they are written to the file.
         Simulates 'tail -f'.
+
+        Wakes up on inotify events where available and polls every
+        `poll_interval` seconds otherwise. Starts at the end of the file unless
+        `start_offset` is given, follows rotation/truncation, and stops once
+        `stop_event` (a threading.Event) is set. With `with_offsets=True` yields
+        (entry, line_offset, raw_line, inode) tuples so callers can checkpoint;
+        `inode` is that of the file the line was read from, which after a
+        rotation is no longer the one `filepath` names.
+        In a multi-line format an entry is held until its next line starts a
+        new entry or the file goes quiet; its offset is that of its last line.
         """
         if not os.path.exists(filepath):
             self.logger.error(f"File not found: {filepath}")
             return
 
+        parser = self.parser_for(filepath)
+        service = source_service(filepath)
+        held = None  # [entry, line_offset, raw_line, inode] still collecting continuation lines
+
+        def emit(item):
+            return tuple(item) if with_offsets else item[0]
+
+        watcher = FileWatcher(filepath)
+        f = None
         try:
-            with open(filepath, 'r') as f:
-                # Move to the end of the file
-                f.seek(0, os.SEEK_END)
-                
-                while True:
-                    line = f.readline()
-                    if not line:
-                        time.sleep(poll_interval)
+            f = open(filepath, 'rb')
+            inode = os.fstat(f.fileno()).st_ino
+            if start_offset is None:
+                offset = f.seek(0, os.SEEK_END)
+            else:
+                offset = f.seek(start_offset)
+            pending = b""
+
+            while stop_event is None or not stop_event.is_set():
+                raw = f.readline()
+                if raw:
+                    if not raw.endswith(b"\n"):
+                        # Writer is mid-line; keep the fragment until the rest arrives.
+                        pending += raw
                         continue
-                    
+                    line = pending + raw
+                    pending = b""
+                    line_offset = offset
+                    offset += len(line)
+
                     if line.strip():
-                        try:
-                            yield json.loads(line)
-                        except json.JSONDecodeError:
-                            pass # Skip malformed in stream
+                        entry = parser.parse(line)
+                        if entry is None:
+                            if parser.multiline and held is not None:
+                                append_continuation(held[0], line)
+                                held[1], held[2] = line_offset, line
+                            continue  # Skip malformed in stream
+                        entry.setdefault("service", service)
+                        if held is not None:
+                            yield emit(held)
+                            held = None
+                        if parser.multiline:
+                            held = [entry, line_offset, line, inode]
+                        else:
+                            yield emit((entry, line_offset, line, inode))
+                    continue
+
+                # Caught up: nothing more will be joined to the held entry.
+                if held is not None:
+                    yield emit(held)
+                    held = None
+                if self._file_replaced(filepath, inode, offset + len(pending)):
+                    f.close()
+                    f = open(filepath, 'rb')
+                    inode = os.fstat(f.fileno()).st_ino
+                    offset = 0
+                    pending = b""
+                    continue
+
+                watcher.wait(poll_interval)
         except Exception as e:
             self.logger.error(f"Error monitoring stream {filepath}: {e}")
+        finally:
+            watcher.close()
+            if f is not None:
+                f.close()
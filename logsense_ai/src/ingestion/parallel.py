@@ -0,0 +1,169 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from logsense_ai.src.ingestion.checkpoint import hash_line
+from logsense_ai.src.ingestion.parsers import get_parser, source_service
+from logsense_ai.src.processing.chunker import ENTRY_FIELDS
+from logsense_ai.src.processing.processor import LogProcessor, METADATA_FIELDS
+
+# Bytes of log parsed per task: large enough to amortise inter-process
+# transfer, small enough that results stream into the embedding stage.
+DEFAULT_RANGE_BYTES = 4 * 1024 * 1024
+MAX_MALFORMED_REPORTED = 20
+# Metadata fields a chunk can carry, transferred column by column.
+CHUNK_FIELDS = METADATA_FIELDS + ("first_seen", "last_seen", "entries") + ENTRY_FIELDS
+
+_processor = None
+_parsers = {}
+
+
+def line_ranges(filepath, start=0, range_bytes=DEFAULT_RANGE_BYTES):
+    """
+    Splits `filepath` from byte `start` to its current end into consecutive
+    (start, end) ranges of about `range_bytes`, each ending just after a
+    newline (the last one at end of file).
+    """
+    size = os.path.getsize(filepath)
+    ranges = []
+    with open(filepath, "rb") as f:
+        while start < size:
+            end = start + range_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()
+                end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _init_worker(chunk_size, chunk_overlap, chunking):
+    global _processor
+    _processor = LogProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunking=chunking)
+
+
+def parse_range(task):
+    """
+    Worker: parses the lines of one byte range in `log_format` (a
+    single-line format: multi-line entries could span two ranges). Entries
+    without a service get the file's name. With `documents` set, entries
+    are also normalised and chunked; chunks travel back as columns (texts
+    plus one list per metadata field), which pickle much faster than dicts.
+    Grouped chunks never span two ranges.
+    A final line without a newline is kept only if it already parses (the
+    writer may still be in the middle of it).
+    """
+    filepath, start, end, documents, log_format = task
+    processor = _processor or LogProcessor()
+    parser = _parsers.get(log_format)
+    if parser is None:
+        parser = _parsers[log_format] = get_parser(log_format)
+    service = source_service(filepath)
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    items, malformed = [], []
+    entries = 0
+    offset = start
+    last_line_offset = last_line_hash = None
+    position = 0
+    while position < len(data):
+        newline = data.find(b"\n", position)
+        line_end = len(data) if newline == -1 else newline + 1
+        raw = data[position:line_end]
+        position = line_end
+        line_offset = offset
+        if not raw.strip():
+            offset += len(raw)
+            continue
+        entry = parser.parse(raw)
+        if entry is None:
+            if not raw.endswith(b"\n"):
+                break
+            if len(malformed) < MAX_MALFORMED_REPORTED:
+                malformed.append(raw.strip().decode(errors="replace"))
+        offset += len(raw)
+        last_line_offset, last_line_hash = line_offset, hash_line(raw)
+        if entry is None:
+            continue
+        entry.setdefault("service", service)
+        entries += 1
+        items.append(entry)
+
+    columns = None
+    if documents:
+        texts, columns = [], [[] for _ in CHUNK_FIELDS]
+        for chunk, metadata in processor.iter_documents(items):
+            texts.append(chunk)
+            for column, field in zip(columns, CHUNK_FIELDS):
+                column.append(metadata.get(field))
+        items = texts
+    return {
+        "items": items,
+        "columns": columns,
+        "entries": entries,
+        "malformed": malformed,
+        "end": offset,
+        "last_line_offset": last_line_offset,
+        "last_line_hash": last_line_hash,
+    }
+
+
+def _documents(texts, columns):
+    """
+    Rebuilds (chunk, metadata) pairs from a worker's columnar result.
+    """
+    for text, *values in zip(texts, *columns):
+        if None in values:
+            yield text, {field: value for field, value in zip(CHUNK_FIELDS, values) if value is not None}
+        else:
+            yield text, dict(zip(CHUNK_FIELDS, values))
+
+
+class ParallelParser:
+    """
+    Parses, normalises and chunks a log file on several cores.
+
+    The file is cut into newline-aligned byte ranges that worker processes
+    read and parse independently (with orjson when installed); results are
+    yielded in file order. At most `2 * workers` ranges are in flight, so a
+    slower consumer (the embedding stage) bounds memory use.
+    """
+    def __init__(self, workers=0, range_bytes=DEFAULT_RANGE_BYTES, chunk_size=1000, chunk_overlap=100, chunking="grouped"):
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.range_bytes = range_bytes
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.chunking = chunking
+        self.entries = 0
+
+    def iter_ranges(self, filepath, start=0, documents=True, log_format="json"):
+        """
+        Yields one `parse_range` result per byte range of `filepath` from `start`, in order.
+        """
+        ranges = line_ranges(filepath, start, self.range_bytes)
+        if not ranges:
+            return
+        self.logger.info(f"Parsing {len(ranges)} ranges of {filepath} with {self.workers} workers")
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.chunk_size, self.chunk_overlap, self.chunking)) as pool:
+            pending = deque()
+            tasks = iter(ranges)
+            for range_start, range_end in tasks:
+                pending.append(pool.submit(parse_range, (filepath, range_start, range_end, documents, log_format)))
+                if len(pending) >= 2 * self.workers:
+                    break
+            while pending:
+                result = pending.popleft().result()
+                next_range = next(tasks, None)
+                if next_range is not None:
+                    pending.append(pool.submit(parse_range, (filepath, *next_range, documents, log_format)))
+                self.entries += result["entries"]
+                if result["columns"] is not None:
+                    result["items"] = _documents(result.pop("items"), result.pop("columns"))
+                yield result
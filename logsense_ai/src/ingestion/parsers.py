@@ -0,0 +1,430 @@
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Non-empty lines sampled from the start of a file to detect its format.
+DETECT_SAMPLE_LINES = 20
+# Formats tried by detection, most specific first; "plain" accepts anything.
+DETECT_ORDER = ("json", "syslog", "nginx", "logfmt")
+
+# Canonical entry fields and the keys other formats use for them.
+FIELD_ALIASES = {
+    "timestamp": ("timestamp", "ts", "time", "@timestamp", "datetime", "date", "t"),
+    "level": ("level", "lvl", "severity", "loglevel", "log_level"),
+    "service": ("service", "svc", "app", "application", "component"),
+    "correlation_id": ("correlation_id", "trace_id", "traceid", "request_id", "req_id", "requestid"),
+    "message": ("message", "msg"),
+    "stack_trace": ("stack_trace", "stacktrace", "exception", "exc_info", "error_stack"),
+}
+LEVEL_ALIASES = {
+    "ERR": "ERROR", "CRIT": "CRITICAL", "EMERG": "FATAL", "EMERGENCY": "FATAL", "ALERT": "FATAL",
+    "NOTICE": "INFO", "INFORMATION": "INFO", "INFORMATIONAL": "INFO", "TRACE": "DEBUG", "WARNING": "WARN",
+}
+# Syslog severities 0-7 (RFC 5424) as LogSense levels.
+SYSLOG_LEVELS = ("FATAL", "FATAL", "CRITICAL", "ERROR", "WARN", "INFO", "INFO", "DEBUG")
+# Numeric levels of pino/bunyan JSON logs.
+NUMERIC_LEVELS = {10: "DEBUG", 20: "DEBUG", 30: "INFO", 40: "WARN", 50: "ERROR", 60: "FATAL"}
+
+_LEVEL_WORDS = r"(FATAL|CRITICAL|ERROR|ERR|WARN|WARNING|INFO|DEBUG|TRACE)"
+# Upper-case anywhere, or any case as the message prefix ("error: ...").
+_LEVEL_WORD = re.compile(rf"\b{_LEVEL_WORDS}\b")
+_LEADING_LEVEL = re.compile(rf"^\W*{_LEVEL_WORDS}\b", re.IGNORECASE)
+_LOGFMT_PAIR = re.compile(r'([^\s=]+)=("(?:[^"\\]|\\.)*"|\S*)')
+_SYSLOG_5424 = re.compile(r"^<(\d{1,3})>1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]\\]|\\.)*\])+) ?(.*)$")
+_SYSLOG_3164 = re.compile(r"^(?:<(\d{1,3})>)?([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (\S+) ([^:\[\s]+)(?:\[(\d+)\])?: ?(.*)$")
+_ACCESS_LOG = re.compile(r'^(\S+) \S+ (\S+) \[([^\]]+)\] "([^"]*)" (\d{3}) (\d+|-)(?: "([^"]*)" "([^"]*)")?(?: (.*))?$')
+_LEADING_TIMESTAMP = re.compile(r"^\[?(\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d(?:[.,]\d+)?(?:Z|[+-]\d\d:?\d\d)?)\]?\s*")
+# Lines that continue the previous entry of a plain-text log: indented
+# stack frames and the header/footer lines of Python and Java traces.
+_CONTINUATION = re.compile(
+    r"^(?:\s|Traceback \(most recent call last\)|Caused by:|During handling of|The above exception"
+    r"|\.\.\. \d+ more|[\w.$]+(?:Error|Exception|Exit|Interrupt)\b)"
+)
+
+PARSERS = {}
+
+
+def loads(raw):
+    """
+    Parses one JSON log line (bytes or str), with orjson when it is installed.
+    Raises json.JSONDecodeError for malformed lines either way.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (e.g. NaN, integers beyond 64 bits); let json decide.
+            pass
+    return json.loads(raw)
+
+
+def register_parser(*names):
+    """
+    Class decorator adding a parser to the registry under `names`, so it can
+    be selected with `get_parser` / `--log_format`.
+    """
+    def decorator(cls):
+        for name in names:
+            PARSERS[name] = cls
+        return cls
+    return decorator
+
+
+def log_formats():
+    """
+    Every selectable format, "auto" (detect per file) first.
+    """
+    return ("auto",) + tuple(PARSERS)
+
+
+def get_parser(log_format="json", log_pattern=None, timestamp_format=None):
+    """
+    Returns a parser instance for `log_format` (not "auto"; see `detect_format`).
+    """
+    if log_format not in PARSERS:
+        raise ValueError(f"Unknown log format '{log_format}'; expected one of {', '.join(log_formats())}")
+    if log_format == "regex":
+        if not log_pattern:
+            raise ValueError("The regex log format needs a pattern with named groups (--log_pattern)")
+        return PARSERS[log_format](log_pattern, timestamp_format=timestamp_format)
+    return PARSERS[log_format]()
+
+
+def detect_format(lines):
+    """
+    Picks the format that parses the most of the sample `lines` (raw bytes),
+    falling back to "plain" when no structured format parses at least half.
+    """
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return "json"
+    best, best_count = "plain", len(lines) / 2
+    for name in DETECT_ORDER:
+        parser = PARSERS[name]()
+        count = sum(1 for line in lines if parser.parse(line) is not None)
+        if count > best_count:
+            best, best_count = name, count
+    return best
+
+
+def source_service(path):
+    """
+    Service name for entries of `path` that do not name one: the file name
+    up to its first dot ("payments.log.1.gz" -> "payments").
+    """
+    return os.path.basename(path).split(".", 1)[0] or None
+
+
+def normalize_level(value):
+    if value is None:
+        return None
+    if isinstance(value, int) or str(value).isdigit():
+        return NUMERIC_LEVELS.get(int(value), str(value))
+    level = str(value).strip().upper()
+    return LEVEL_ALIASES.get(level, level)
+
+
+def guess_level(message):
+    """
+    The first level keyword in `message`, else INFO.
+    """
+    match = _LEADING_LEVEL.match(message) or _LEVEL_WORD.search(message)
+    return normalize_level(match.group(1)) if match else "INFO"
+
+
+def normalize_timestamp(value, timestamp_format=None):
+    """
+    Converts a log timestamp to the ISO-8601 string entries carry. Accepts
+    ISO-8601 (also with a space or a comma before the fraction), epoch
+    seconds or milliseconds, or `timestamp_format` (strptime). Anything
+    else is returned unchanged.
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat()
+    text = str(value).strip()
+    if timestamp_format:
+        try:
+            return datetime.strptime(text, timestamp_format).isoformat()
+        except ValueError:
+            return text
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00").replace(",", ".")).isoformat()
+    except ValueError:
+        pass
+    if re.fullmatch(r"\d{10}(?:\.\d+)?|\d{13}", text):
+        return normalize_timestamp(float(text))
+    return text
+
+
+def canonical_entry(fields, timestamp_format=None):
+    """
+    Maps a dict of parsed fields onto the entry fields LogSense uses
+    (timestamp, level, service, correlation_id, message, stack_trace).
+    Fields without a canonical name are kept.
+    """
+    entry = {}
+    for canonical, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = fields.pop(alias, None)
+            if value not in (None, ""):
+                entry[canonical] = value
+                break
+    if "timestamp" in entry:
+        entry["timestamp"] = normalize_timestamp(entry["timestamp"], timestamp_format)
+    if "level" in entry:
+        entry["level"] = normalize_level(entry["level"])
+    entry.update((key, value) for key, value in fields.items() if value not in (None, ""))
+    return entry
+
+
+def _text(raw):
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    return raw.rstrip("\r\n")
+
+
+class LineParser:
+    """
+    Turns one raw log line (bytes) into an entry dict, or None if the line
+    is not in this format. With `multiline` set, a line that does not parse
+    continues the previous entry (see `iter_entries`).
+    """
+    multiline = False
+
+    def parse(self, raw):
+        raise NotImplementedError
+
+
+@register_parser("json")
+class JsonParser(LineParser):
+    """
+    Newline-delimited JSON, one object per line (orjson when installed).
+    Objects with a timestamp and a message are kept as they are; others
+    (e.g. pino's `time`/`msg`, zap's `ts`/`level`) are mapped with `FIELD_ALIASES`.
+    """
+    def parse(self, raw):
+        try:
+            entry = loads(raw)
+        except ValueError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+        if "timestamp" in entry and "message" in entry:
+            return entry
+        return canonical_entry(dict(entry))
+
+
+@register_parser("logfmt")
+class LogfmtParser(LineParser):
+    """
+    `key=value` pairs (values optionally double-quoted), as written by
+    Heroku, Go's slog and many others. Keys are mapped with `FIELD_ALIASES`;
+    pairs without a canonical field are appended to the message so they
+    stay searchable.
+    """
+    def parse(self, raw):
+        text = _text(raw)
+        pairs = _LOGFMT_PAIR.findall(text)
+        # One pair could be any line with an "=" in it.
+        if len(pairs) < 2 or _LOGFMT_PAIR.sub("", text).strip():
+            return None
+        fields = {}
+        for key, value in pairs:
+            if value.startswith('"'):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    value = value[1:-1]
+            fields[key.lower()] = value
+        extra = {key: value for key, value in fields.items()
+                 if not any(key in aliases for aliases in FIELD_ALIASES.values())}
+        entry = canonical_entry({key: fields[key] for key in fields if key not in extra})
+        details = " ".join(f"{key}={value}" for key, value in extra.items())
+        entry["message"] = " ".join(part for part in (entry.get("message", ""), details) if part)
+        entry.setdefault("level", guess_level(entry["message"]))
+        return entry
+
+
+@register_parser("syslog")
+class SyslogParser(LineParser):
+    """
+    RFC 5424 and RFC 3164 (BSD, as written to /var/log by rsyslog) syslog
+    lines, with or without the <PRI> prefix. The app name becomes the
+    service; the level comes from PRI, else from a level word in the message.
+    RFC 3164 timestamps carry no year, so the most recent past one is assumed.
+    """
+    def parse(self, raw):
+        text = _text(raw)
+        match = _SYSLOG_5424.match(text)
+        if match:
+            pri, timestamp, host, app, pid, msgid, _, message = match.groups()
+            entry = {"timestamp": normalize_timestamp(timestamp), "host": host, "service": app}
+            if pid != "-":
+                entry["pid"] = pid
+            if msgid != "-":
+                entry["msgid"] = msgid
+        else:
+            match = _SYSLOG_3164.match(text)
+            if not match:
+                return None
+            pri, timestamp, host, app, pid, message = match.groups()
+            entry = {"timestamp": self._bsd_timestamp(timestamp), "host": host, "service": app}
+            if pid:
+                entry["pid"] = pid
+        entry["level"] = SYSLOG_LEVELS[int(pri) % 8] if pri else guess_level(message)
+        entry["message"] = message
+        return entry
+
+    @staticmethod
+    def _bsd_timestamp(value):
+        now = datetime.now()
+        try:
+            parsed = datetime.strptime(f"{now.year} {' '.join(value.split())}", "%Y %b %d %H:%M:%S")
+        except ValueError:
+            return value
+        if parsed > now + timedelta(days=1):
+            parsed = parsed.replace(year=now.year - 1)
+        return parsed.isoformat()
+
+
+@register_parser("nginx", "apache")
+class AccessLogParser(LineParser):
+    """
+    Common and combined access log format (nginx, Apache httpd), plus any
+    fields appended after the user agent (e.g. request time). 5xx responses
+    are ERROR, 4xx WARN, the rest INFO.
+    """
+    def parse(self, raw):
+        match = _ACCESS_LOG.match(_text(raw))
+        if not match:
+            return None
+        client, user, timestamp, request, status, size, referer, agent, extra = match.groups()
+        status = int(status)
+        parts = request.split()
+        method, path = (parts[0], parts[1]) if len(parts) >= 2 else ("-", request)
+        message = f"{method} {path} -> {status} ({size} bytes) from {client}"
+        if agent and agent != "-":
+            message += f' "{agent}"'
+        if extra:
+            message += f" {extra}"
+        try:
+            timestamp = datetime.strptime(timestamp, "%d/%b/%Y:%H:%M:%S %z").isoformat()
+        except ValueError:
+            pass
+        entry = {
+            "timestamp": timestamp,
+            "level": "ERROR" if status >= 500 else "WARN" if status >= 400 else "INFO",
+            "message": message,
+            "client": client,
+            "method": method,
+            "path": path,
+            "status": status,
+        }
+        if user != "-":
+            entry["user"] = user
+        if referer and referer != "-":
+            entry["referer"] = referer
+        return entry
+
+
+@register_parser("regex")
+class RegexParser(LineParser):
+    """
+    A format defined by a regular expression with named groups, matched at
+    the start of each line; groups are mapped with `FIELD_ALIASES` (e.g.
+    `(?P<timestamp>\\S+ \\S+) (?P<level>\\w+) \\[(?P<service>[^\\]]+)\\] (?P<message>.*)`).
+    Lines that do not match continue the previous entry, so multi-line
+    stack traces stay with the entry that logged them.
+    """
+    multiline = True
+
+    def __init__(self, pattern, timestamp_format=None):
+        self.pattern = re.compile(pattern)
+        if not self.pattern.groupindex:
+            raise ValueError("The log pattern needs named groups, e.g. (?P<message>.*)")
+        self.timestamp_format = timestamp_format
+
+    def parse(self, raw):
+        match = self.pattern.match(_text(raw))
+        if not match:
+            return None
+        entry = canonical_entry(match.groupdict(), self.timestamp_format)
+        entry.setdefault("message", "")
+        entry.setdefault("level", guess_level(entry["message"]))
+        return entry
+
+
+@register_parser("plain")
+class PlainTextParser(LineParser):
+    """
+    Free-form text: each line is an entry with an optional leading ISO
+    timestamp and a level guessed from its words. Indented lines and stack
+    trace headers continue the previous entry.
+    """
+    multiline = True
+
+    def parse(self, raw):
+        text = _text(raw)
+        if not text.strip() or _CONTINUATION.match(text):
+            return None
+        entry = {}
+        match = _LEADING_TIMESTAMP.match(text)
+        if match:
+            entry["timestamp"] = normalize_timestamp(match.group(1))
+            text = text[match.end():]
+        entry["level"] = guess_level(text)
+        entry["message"] = text
+        return entry
+
+
+def append_continuation(entry, raw):
+    """
+    Adds a continuation line (a stack frame) to a multi-line entry.
+    """
+    line = _text(raw)
+    trace = entry.get("stack_trace")
+    entry["stack_trace"] = f"{trace}\n{line}" if trace else line
+
+
+def iter_entries(parser, lines, service=None, on_malformed=None):
+    """
+    Parses (line_offset, raw_bytes) pairs into entries. Yields
+    (entry, last_line_offset, last_raw) where the last line is the final
+    line the entry was built from (a multi-line entry ends at its last
+    continuation line), so callers can checkpoint after it.
+
+    Entries without a service get `service`. Lines that neither parse nor
+    continue an entry go to `on_malformed`.
+    """
+    pending = None
+    for line_offset, raw in lines:
+        if not raw.strip():
+            continue
+        entry = parser.parse(raw)
+        if entry is None:
+            if parser.multiline and pending is not None:
+                append_continuation(pending[0], raw)
+                pending[1], pending[2] = line_offset, raw
+            elif on_malformed is not None:
+                on_malformed(raw)
+            continue
+        if service is not None:
+            entry.setdefault("service", service)
+        if not parser.multiline:
+            yield entry, line_offset, raw
+            continue
+        if pending is not None:
+            yield tuple(pending)
+        pending = [entry, line_offset, raw]
+    if pending is not None:
+        yield tuple(pending)
+
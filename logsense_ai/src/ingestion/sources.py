@@ -0,0 +1,159 @@
+import fnmatch
+import glob
+import heapq
+import itertools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from logsense_ai.src.utils.timeutils import to_epoch
+
+# Files picked up when a source is a directory: logs, rotated logs and their compressed forms.
+LOG_FILE_PATTERNS = ("*.log", "*.log.*", "*.jsonl", "*.json", "*.txt", "*.out", "*.gz", "*.zst", "*.zstd")
+DEFAULT_READ_THREADS = 4
+# Entries read from one file per thread-pool task.
+DEFAULT_READ_BATCH = 2048
+
+
+def _is_log_file(name):
+    return not name.startswith(".") and any(fnmatch.fnmatch(name, pattern) for pattern in LOG_FILE_PATTERNS)
+
+
+def expand_sources(sources):
+    """
+    Expands log sources into a sorted, de-duplicated list of files. A source
+    is a file, a directory (searched recursively for `LOG_FILE_PATTERNS`) or
+    a glob pattern (`**` matches any depth). Missing plain paths are kept so
+    the reader can report them.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                paths.extend(os.path.join(root, name) for name in sorted(files) if _is_log_file(name))
+        elif glob.has_magic(source):
+            paths.extend(sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path)))
+        else:
+            paths.append(source)
+    seen = set()
+    unique = []
+    for path in paths:
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+class _FileReader:
+    """
+    One file's entries with their sort keys. Only one pool task reads a
+    given file at a time, so the underlying generator is never shared.
+    """
+    def __init__(self, index, entries):
+        self.index = index
+        self.entries = entries
+        self.sequence = itertools.count()
+        # Entries without a parseable timestamp sort with the entry before them.
+        self.last_epoch = float("-inf")
+
+    def read_batch(self, size):
+        batch = []
+        for entry in itertools.islice(self.entries, size):
+            epoch = to_epoch(entry.get("timestamp"))
+            if epoch is not None:
+                self.last_epoch = epoch
+            batch.append((self.last_epoch, self.index, next(self.sequence), entry))
+        return batch
+
+
+class MultiFileSource:
+    """
+    Reads many log files concurrently and merges their entries into one
+    timestamp-ordered stream, so dozens of per-service files can be
+    ingested without concatenating them first.
+
+    Files are read (and parsed) in batches of `batch_size` entries by a pool
+    of `workers` threads, with one batch per file read ahead while the
+    current one is merged. A k-way heap merge then interleaves the files by
+    timestamp; each file is assumed to be in time order already, as log
+    files are, and ties keep file order. Compressed files decompress in the
+    reader threads, outside the GIL.
+    """
+    def __init__(self, ingestor, paths, workers=DEFAULT_READ_THREADS, batch_size=DEFAULT_READ_BATCH):
+        self.logger = logging.getLogger(__name__)
+        self.ingestor = ingestor
+        self.paths = list(paths)
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.entries = 0
+
+    def iter_appended(self, checkpoints=None):
+        """
+        Returns (entries, new_checkpoints, resumed) like `LogIngestor.iter_appended`,
+        for all files: `entries` is the merged generator, `new_checkpoints`
+        has one checkpoint per file (advancing as entries are read) and
+        `resumed` is True if every file with a checkpoint (a `CheckpointStore`)
+        could be resumed; files without one are read from the start.
+        """
+        streams, new_checkpoints = [], []
+        resumed = checkpoints is not None
+        any_resumed = False
+        for path in self.paths:
+            checkpoint = checkpoints.get(path) if checkpoints is not None else None
+            entries, new_checkpoint, file_resumed = self.ingestor.iter_appended(path, checkpoint)
+            if checkpoint is not None and not file_resumed:
+                resumed = False
+            any_resumed = any_resumed or file_resumed
+            streams.append(entries)
+            if new_checkpoint is not None:
+                new_checkpoints.append(new_checkpoint)
+        return self._merge(streams), new_checkpoints, resumed and any_resumed
+
+    def iter_files(self):
+        """
+        Every entry of every file, merged into timestamp order.
+        """
+        return self._merge([self.ingestor.iter_file(path) for path in self.paths])
+
+    def _merge(self, streams):
+        readers = [_FileReader(index, entries) for index, entries in enumerate(streams)]
+        if not readers:
+            return
+        self.logger.info(f"Merging {len(readers)} files with {min(self.workers, len(readers))} reader threads")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="log-reader") as pool:
+            ahead = {reader.index: pool.submit(reader.read_batch, self.batch_size) for reader in readers}
+            buffers = {}
+            heap = []
+
+            def refill(reader):
+                # Take the batch read ahead and start reading the next one.
+                batch = ahead.pop(reader.index).result()
+                if not batch:
+                    return None
+                ahead[reader.index] = pool.submit(reader.read_batch, self.batch_size)
+                buffers[reader.index] = iter(batch)
+                return next(buffers[reader.index])
+
+            try:
+                for reader in readers:
+                    head = refill(reader)
+                    if head is not None:
+                        heap.append(head)
+                heapq.heapify(heap)
+                while heap:
+                    _, index, _, entry = heap[0]
+                    self.entries += 1
+                    yield entry
+                    head = next(buffers[index], None)
+                    if head is None:
+                        head = refill(readers[index])
+                    if head is None:
+                        heapq.heappop(heap)
+                    else:
+                        heapq.heapreplace(heap, head)
+            finally:
+                for future in ahead.values():
+                    future.cancel()
@@ -0,0 +1,113 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class FileWatcher:
+    """
+    Blocks until a file changes, instead of sleeping for a fixed interval.
+
+    Uses inotify on Linux (watching the parent directory so rotations and
+    re-creations are seen too) and falls back to plain polling elsewhere.
+    """
+    def __init__(self, filepath):
+        self.logger = logging.getLogger(__name__)
+        self.filepath = os.path.abspath(filepath)
+        self.filename = os.path.basename(self.filepath).encode()
+        self._fd = None
+
+        libc = _load_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            self.logger.debug(f"inotify_init1 failed (errno {ctypes.get_errno()}); falling back to polling.")
+            return
+        wd = libc.inotify_add_watch(fd, os.path.dirname(self.filepath).encode(), _WATCH_MASK)
+        if wd < 0:
+            self.logger.debug(f"inotify_add_watch failed (errno {ctypes.get_errno()}); falling back to polling.")
+            os.close(fd)
+            return
+        self._fd = fd
+
+    @property
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def _drain(self):
+        """
+        Reads pending events and returns True if any of them concern the watched file.
+        """
+        relevant = False
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            if not buf:
+                return relevant
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(buf):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(buf, pos)
+                name = buf[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + name_len].rstrip(b"\0")
+                if name == self.filename:
+                    relevant = True
+                pos += _EVENT_HEADER.size + name_len
+
+    def wait(self, timeout):
+        """
+        Waits up to `timeout` seconds for the file to change.
+        Returns True if a change was observed, False on timeout (or when polling).
+        """
+        if self._fd is None:
+            time.sleep(timeout)
+            return False
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if ready and self._drain():
+                return True
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,221 @@
+import argparse
+import json
+import logging
+import math
+import time
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Corpus sizes (vectors) at which `auto` switches to the next index type.
+AUTO_THRESHOLDS = [
+    (100_000, "flat"),
+    (2_000_000, "hnsw"),
+    (20_000_000, "ivf_flat"),
+]
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+# Below this many vectors IVF/PQ quantizers cannot be trained meaningfully.
+MIN_TRAIN_VECTORS = 1_000
+# Filtered queries with at most this many candidates are scored exactly.
+EXACT_CANDIDATE_LIMIT = 20_000
+
+
+def choose_index_type(n_vectors):
+    """
+    Picks an index type for a corpus of `n_vectors`: exact search while it is
+    cheap, then HNSW, then IVF, then IVF-PQ once raw vectors no longer fit in RAM.
+    """
+    for limit, index_type in AUTO_THRESHOLDS:
+        if n_vectors < limit:
+            return index_type
+    return "ivf_pq"
+
+
+def resolve_index_type(index_type, n_vectors):
+    """
+    Maps "auto" to a concrete type; IVF types fall back to flat while the
+    corpus is too small to train them.
+    """
+    if index_type in (None, "auto"):
+        return choose_index_type(n_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)} or auto")
+    if index_type.startswith("ivf") and n_vectors < MIN_TRAIN_VECTORS:
+        return "flat"
+    return index_type
+
+
+def default_nlist(n_vectors):
+    """
+    Number of IVF lists: ~4*sqrt(N), keeping at least ~39 training points per list.
+    """
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // 39 or 1, 65536))
+
+
+def default_pq_m(dimension):
+    """
+    Largest sub-quantizer count <= dimension / 4 that divides `dimension`.
+    """
+    for m in range(max(1, dimension // 4), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def factory_string(index_type, dimension, n_vectors, nlist=None, pq_m=None):
+    """
+    The `faiss.index_factory` description for `index_type`.
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M}"
+    nlist = nlist or default_nlist(n_vectors)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m or default_pq_m(dimension)}x8"
+    raise ValueError(f"Unknown index type {index_type!r}")
+
+
+def index_type_of(index):
+    """
+    Reverse of `factory_string`: which of INDEX_TYPES `index` is.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def build_index(vectors, index_type="auto", train_size=100_000, nlist=None, pq_m=None, seed=42):
+    """
+    Builds a FAISS index of `index_type` over `vectors` (float32, shape (N, d)).
+    Quantizers are trained on a random sample of at most `train_size` vectors
+    (never fewer than IVF needs); the whole set is then added in order, so
+    positions match the input rows.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dimension = vectors.shape
+    index_type = resolve_index_type(index_type, n_vectors)
+    spec = factory_string(index_type, dimension, n_vectors, nlist=nlist, pq_m=pq_m)
+    index = faiss.index_factory(dimension, spec, faiss.METRIC_L2)
+
+    if not index.is_trained:
+        ivf = faiss.extract_index_ivf(index)
+        sample_size = min(n_vectors, max(train_size, 39 * ivf.nlist, 256))
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(n_vectors, size=sample_size, replace=False))] if sample_size < n_vectors else vectors
+        index.train(sample)
+    index.add(vectors)
+    prepare_index(index)
+    return index
+
+
+def prepare_index(index, nprobe=None, ef_search=None):
+    """
+    Applies query-time knobs and enables `reconstruct` on IVF indexes, which
+    exact scoring of small filtered candidate sets relies on.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe or DEFAULT_NPROBE, index.nlist)
+        if index.direct_map.type == faiss.DirectMap.NoMap:
+            index.make_direct_map()
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search or DEFAULT_EF_SEARCH
+    return index
+
+
+def search_parameters(index, selector):
+    """
+    SearchParameters of the right subclass for `index`, restricted to `selector`.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def exact_search(index, query_vectors, candidates, k):
+    """
+    Scores `candidates` (FAISS positions) against `query_vectors` by brute
+    force using the stored (possibly quantised) vectors. Returns (distances,
+    positions) like `index.search`.
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    stored = index.reconstruct_batch(candidates)
+    distances = ((query_vectors[:, None, :] - stored[None, :, :]) ** 2).sum(axis=2)
+    top = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(distances, top, axis=1), candidates[top]
+
+
+def recall_at_k(vectors, index_types=INDEX_TYPES, k=10, n_queries=200, seed=42, **build_kwargs):
+    """
+    Builds each index type over `vectors` and measures recall@k against exact
+    (flat) search, using `n_queries` of the vectors as queries.
+    Returns one dict per index type with recall, build time and query latency.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type=index_type, seed=seed, **build_kwargs)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        query_seconds = time.perf_counter() - start
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        built_type = index_type_of(index)
+        report.append({
+            "index_type": index_type,
+            "factory": factory_string(built_type, vectors.shape[1], len(vectors),
+                                      nlist=build_kwargs.get("nlist"), pq_m=build_kwargs.get("pq_m")),
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+            "build_seconds": round(build_seconds, 3),
+            "query_ms": round(1000 * query_seconds / len(queries), 4),
+        })
+    return report
+
+
+def main():
+    from logsense_ai.src.models.vector_store import LogVectorStore
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Compare ANN index types against exact search on an existing index")
+    parser.add_argument("--index_path", type=str, default="logsense_ai/data/processed/faiss_index", help="Path to FAISS index")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall@k")
+    parser.add_argument("--queries", type=int, default=200, help="Number of stored vectors used as queries")
+    parser.add_argument("--index_type", type=str, action="append", choices=INDEX_TYPES, help="Index types to compare (repeatable; default all)")
+    parser.add_argument("--train_size", type=int, default=100_000, help="Vectors sampled to train IVF/PQ quantizers")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default ~4*sqrt(N))")
+    args = parser.parse_args()
+
+    vector_store = LogVectorStore(index_path=args.index_path)
+    vector_store.load(read_only=True)
+    if vector_store.empty:
+        parser.error(f"No index found at {args.index_path}")
+    index = vector_store.index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    report = recall_at_k(vectors, index_types=args.index_type or INDEX_TYPES, k=args.k, n_queries=args.queries,
+                         train_size=args.train_size, nlist=args.nlist)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from logsense_ai.src.models.embedding_cache import content_hash
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_TTL = 900.0
+DEFAULT_MAX_ENTRIES = 512
+
+
+def evidence_key(documents):
+    """
+    Order-independent id of a retrieved evidence set: the content hashes of
+    its chunks (computed from the text for chunks stored without one).
+    """
+    return frozenset(doc.metadata.get("content_hash") or content_hash(doc.page_content) for doc in documents)
+
+
+class AnswerCache:
+    """
+    In-memory cache of LLM answers for semantically equivalent questions.
+
+    An entry is reused when a new question retrieves exactly the same chunks
+    from the same index version and its embedding has cosine similarity of
+    at least `similarity_threshold` with the cached question. A question may
+    instead be keyed by a string (e.g. the normalised terms of an identifier
+    lookup, which never runs the embedding model), matched exactly.
+    Ingesting logs publishes a new index version, so affected answers are
+    never served stale; entries also expire after `ttl` seconds, and the
+    least recently used ones are evicted beyond `max_entries`.
+    """
+    def __init__(self, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.logger = logging.getLogger(__name__)
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # entry id -> (version, evidence, unit query vector or str, answer, created)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        if isinstance(vector, str):
+            return vector
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, query_vector, evidence, version):
+        """
+        Returns the cached answer for this question and evidence, or None.
+        Entries of other index versions are skipped but kept: during a hot
+        reload, requests for the previous and the new version interleave.
+        They age out by TTL and LRU eviction.
+        """
+        query = self._unit(query_vector)
+        now = time.time()
+        with self._lock:
+            best, best_score = None, self.similarity_threshold
+            for entry_id, (entry_version, entry_evidence, entry_query, _, created) in list(self._entries.items()):
+                if self._expired(created, now):
+                    del self._entries[entry_id]
+                    continue
+                if entry_version != version or entry_evidence != evidence:
+                    continue
+                if isinstance(query, str) or isinstance(entry_query, str):
+                    if isinstance(query, str) and query == entry_query:
+                        best = entry_id
+                        break
+                    continue
+                score = float(np.dot(query, entry_query))
+                if score >= best_score:
+                    best, best_score = entry_id, score
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best][3]
+
+    def put(self, query_vector, evidence, version, answer):
+        with self._lock:
+            self._entries[self._next_id] = (version, evidence, self._unit(query_vector), answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
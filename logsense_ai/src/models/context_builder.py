@@ -0,0 +1,237 @@
+import logging
+import re
+from logsense_ai.src.processing.templates import mask_message
+from logsense_ai.src.utils.timeutils import to_epoch
+
+DEFAULT_TOKEN_BUDGET = 3000
+NEAR_DUPLICATE_THRESHOLD = 0.9
+TIKTOKEN_ENCODING = "cl100k_base"
+# Shortest shared prefix/suffix treated as splitter overlap between two chunks.
+MIN_OVERLAP = 20
+
+# A log entry starts with "[<timestamp>]" (see LogProcessor.normalize) or "RAW LOG:".
+_ENTRY_START = re.compile(r"^(?:\[([0-9T:\-\.\+Z ]+)\]|RAW LOG:)")
+_WHITESPACE = re.compile(r"\s+")
+# Tag added by RAGEngine to entries of an expanded trace; kept out of masking.
+_TRACE_TAG = re.compile(r" \(correlation_id=([^)\s]+)\)")
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text):
+    """
+    Number of tokens in `text` under the tiktoken `cl100k_base` encoding.
+    Falls back to ~4 characters per token if the encoding cannot be loaded
+    (it is downloaded on first use).
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception as e:
+            _encoding_failed = True
+            logging.getLogger(__name__).warning(f"tiktoken unavailable ({e}); estimating tokens from length.")
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _overlap(left, right):
+    """
+    Length of the longest suffix of `left` that is a prefix of `right` (0 if
+    shorter than MIN_OVERLAP).
+    """
+    head = right[:MIN_OVERLAP]
+    if len(head) < MIN_OVERLAP:
+        return 0
+    start = left.find(head, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(head, start + 1)
+    return 0
+
+
+def merge_overlapping(texts):
+    """
+    Joins chunks that the text splitter cut from the same entry with an
+    overlapping window, and drops exact duplicates. Keeps first-seen order.
+    """
+    merged = []
+    for text in dict.fromkeys(text.strip() for text in texts if text.strip()):
+        for i, other in enumerate(merged):
+            if text in other:
+                break
+            if other in text:
+                merged[i] = text
+                break
+            size = _overlap(other, text)
+            if size:
+                merged[i] = other + text[size:]
+                break
+            size = _overlap(text, other)
+            if size:
+                merged[i] = text + other[size:]
+                break
+        else:
+            merged.append(text)
+    return merged
+
+
+def split_entries(text):
+    """
+    Splits a chunk into log entries (an entry line plus its continuation lines).
+    """
+    entries = []
+    for line in text.splitlines():
+        if not entries or _ENTRY_START.match(line):
+            entries.append([line])
+        else:
+            entries[-1].append(line)
+    return ["\n".join(lines) for lines in entries]
+
+
+def collapse_repeated_lines(text):
+    """
+    Replaces runs of identical lines (e.g. recursive stack frames) with one line and "(xN)".
+    """
+    lines = []
+    for line in text.splitlines():
+        if lines and lines[-1][0] == line:
+            lines[-1][1] += 1
+        else:
+            lines.append([line, 1])
+    return "\n".join(line if count == 1 else f"{line} (x{count})" for line, count in lines)
+
+
+def entry_timestamp(entry):
+    """
+    The entry's leading timestamp as (POSIX seconds, original string), or (None, None).
+    """
+    match = _ENTRY_START.match(entry)
+    if not match or not match.group(1):
+        return None, None
+    return to_epoch(match.group(1)), match.group(1)
+
+
+def entry_signature(entry):
+    """
+    The entry with its timestamp dropped and variable values masked, so
+    repeats of the same event compare equal. Entries from different traces
+    never do, which keeps each request's chain intact.
+    """
+    entry = _ENTRY_START.sub("", entry, count=1)
+    tag = _TRACE_TAG.search(entry)
+    signature = _WHITESPACE.sub(" ", mask_message(_TRACE_TAG.sub("", entry))).strip()
+    return f"{signature} #{tag.group(1)}" if tag else signature
+
+
+class _EntryGroup:
+    def __init__(self, text, signature, timestamp, raw_timestamp, rank, order):
+        self.text = text
+        self.signature = signature
+        self.tokens = set(signature.split())
+        self.count = 1
+        self.first, self.first_raw = timestamp, raw_timestamp
+        self.last, self.last_raw = timestamp, raw_timestamp
+        self.rank = rank
+        self.order = order
+
+    def add(self, timestamp, raw_timestamp, rank):
+        self.count += 1
+        self.rank = min(self.rank, rank)
+        if timestamp is not None:
+            if self.first is None or timestamp < self.first:
+                self.first, self.first_raw = timestamp, raw_timestamp
+            if self.last is None or timestamp >= self.last:
+                self.last, self.last_raw = timestamp, raw_timestamp
+
+    def render(self):
+        if self.count == 1:
+            return self.text
+        first_line, _, rest = self.text.partition("\n")
+        if self.first_raw and self.first_raw != self.last_raw:
+            summary = f" (x{self.count}, {self.first_raw} to {self.last_raw})"
+        else:
+            summary = f" (x{self.count})"
+        return first_line + summary + ("\n" + rest if rest else "")
+
+
+class ContextBuilder:
+    """
+    Assembles the "Logs" section of the RAG prompt from retrieved chunks
+    within a token budget.
+
+    Chunks split from the same entry are stitched back together, exact and
+    near-duplicate entries (same event with different ids/numbers, Jaccard
+    similarity of masked tokens >= `near_duplicate_threshold`) are collapsed
+    into one line annotated "(xN, <first> to <last>)", and repeated lines inside
+    an entry become "(xN)". Entries are admitted in retrieval-rank order
+    until `token_budget` is reached, then emitted in time order.
+    """
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.logger = logging.getLogger(__name__)
+        self.token_budget = token_budget
+        self.near_duplicate_threshold = near_duplicate_threshold
+
+    def _find_group(self, groups, by_signature, signature):
+        group = by_signature.get(signature)
+        if group is not None or self.near_duplicate_threshold >= 1:
+            return group
+        tokens = set(signature.split())
+        for group in groups:
+            union = len(tokens | group.tokens)
+            if union and len(tokens & group.tokens) / union >= self.near_duplicate_threshold:
+                return group
+        return None
+
+    def group_entries(self, texts):
+        """
+        Returns the deduplicated entry groups of `texts` (ranked best first).
+        """
+        groups, by_signature = [], {}
+        for rank, text in enumerate(merge_overlapping(texts)):
+            for entry in split_entries(text):
+                timestamp, raw_timestamp = entry_timestamp(entry)
+                signature = entry_signature(entry)
+                group = self._find_group(groups, by_signature, signature)
+                if group is None:
+                    group = _EntryGroup(collapse_repeated_lines(entry), signature, timestamp, raw_timestamp, rank, len(groups))
+                    groups.append(group)
+                    by_signature[signature] = group
+                else:
+                    group.add(timestamp, raw_timestamp, rank)
+        return groups
+
+    def build(self, texts):
+        """
+        Returns (context, stats) for the retrieved chunk `texts` (best first).
+        """
+        groups = self.group_entries(texts)
+        selected, used = [], 0
+        for group in sorted(groups, key=lambda g: (g.rank, g.order)):
+            rendered = group.render()
+            tokens = count_tokens(rendered) + 1
+            if used + tokens > self.token_budget:
+                if selected:
+                    continue
+                # Never send an empty context: keep the head of the best entry.
+                rendered = rendered[:max(1, 4 * self.token_budget)]
+                tokens = count_tokens(rendered)
+            selected.append((group, rendered))
+            used += tokens
+
+        # Time order; undated entries keep retrieval order after the dated ones.
+        selected.sort(key=lambda item: (item[0].first is None, item[0].first or 0, item[0].order))
+        context = "\n".join(rendered for _, rendered in selected)
+        stats = {
+            "chunks": len(texts),
+            "entries": sum(group.count for group in groups),
+            "unique_entries": len(groups),
+            "included_entries": len(selected),
+            "tokens": count_tokens(context),
+            "token_budget": self.token_budget,
+        }
+        return context, stats
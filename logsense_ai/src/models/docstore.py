@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from langchain_core.documents import Document
+
+DOCSTORE_FILENAME = "docs.sqlite"
+DOCS_COLUMNS = "position INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL, content_hash TEXT"
+STAGING_PREFIX = "logsense-docs-"
+# Staged rows copied per statement by `save`.
+SAVE_BATCH_SIZE = 10_000
+
+
+class DocStore:
+    """
+    Chunk texts and metadata keyed by FAISS position, stored in SQLite.
+
+    Published index directories are never modified in place, so the live
+    database is opened read-only and immutable (no locking, shared page cache
+    across processes) and rows are fetched only for search hits. Rows added
+    and metadata changed since the last save are written as they arrive to
+    a private staging database in the temp directory ($TMPDIR), so memory
+    stays flat however much is indexed before `save` merges them into a copy
+    of the database. Only the content hashes of staged rows are kept in memory.
+    """
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.conn = None
+        self._lock = threading.Lock()
+        self._stored = 0
+        self._staged = 0  # rows at positions >= _stored, held in the staging database
+        self._staging = None
+        self._pending_hashes = {}  # content hash -> position, for staged rows
+        self._has_updates = False  # metadata of stored rows changed in the staging database
+        if path and os.path.exists(path):
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            self._stored = self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def __len__(self):
+        return self._stored + self._staged
+
+    def _staging_conn(self):
+        if self._staging is None:
+            fd, path = tempfile.mkstemp(prefix=STAGING_PREFIX, suffix=".sqlite")
+            os.close(fd)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            # Disposable, so no journal; created, then unlinked while open so it never outlives the store.
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(f"CREATE TABLE docs ({DOCS_COLUMNS})")
+            conn.execute("CREATE TABLE updates (position INTEGER PRIMARY KEY, metadata TEXT NOT NULL)")
+            conn.commit()
+            os.remove(path)
+            self._staging = conn
+        return self._staging
+
+    def add(self, texts, metadatas=None):
+        """
+        Appends documents at the next positions, in order.
+        """
+        rows = []
+        for i, text in enumerate(texts):
+            metadata = metadatas[i] if metadatas and metadatas[i] else {}
+            key = metadata.get("content_hash")
+            position = len(self) + i
+            if key:
+                self._pending_hashes[key] = position
+            rows.append((position, text, json.dumps(metadata), key))
+        if not rows:
+            return
+        with self._lock:
+            conn = self._staging_conn()
+            conn.executemany("INSERT INTO docs (position, text, metadata, content_hash) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+            self._staged += len(rows)
+
+    @staticmethod
+    def _select(conn, query, positions):
+        placeholders = ",".join("?" * len(positions))
+        return conn.execute(query.format(placeholders=placeholders), positions).fetchall()
+
+    def get_many(self, positions):
+        """
+        Returns the `Document`s at `positions`, in the given order.
+        """
+        staged = [position for position in positions if position >= self._stored]
+        stored = [position for position in positions if position < self._stored]
+        rows = []
+        with self._lock:
+            if staged:
+                rows += self._select(self._staging, "SELECT position, text, metadata FROM docs WHERE position IN ({placeholders})", staged)
+            if stored:
+                rows += self._select(self.conn, "SELECT position, text, metadata FROM docs WHERE position IN ({placeholders})", stored)
+                if self._has_updates:
+                    updates = dict(self._select(self._staging, "SELECT position, metadata FROM updates WHERE position IN ({placeholders})", stored))
+                    rows = [(position, text, updates.get(position, metadata)) for position, text, metadata in rows]
+        found = {position: Document(page_content=text, metadata=json.loads(metadata)) for position, text, metadata in rows}
+        return [found[position] for position in positions]
+
+    def get(self, position):
+        return self.get_many([position])[0]
+
+    def update_metadata(self, position, metadata):
+        """
+        Replaces the metadata of the document at `position` (applied on save).
+        """
+        with self._lock:
+            conn = self._staging_conn()
+            if position >= self._stored:
+                conn.execute("UPDATE docs SET metadata = ? WHERE position = ?", (json.dumps(metadata), position))
+            else:
+                conn.execute("INSERT OR REPLACE INTO updates (position, metadata) VALUES (?, ?)", (position, json.dumps(metadata)))
+                self._has_updates = True
+            conn.commit()
+
+    def find_hashes(self, keys):
+        """
+        Returns {content_hash: position} for the given hashes that are stored.
+        """
+        found = {key: self._pending_hashes[key] for key in keys if key in self._pending_hashes}
+        missing = [key for key in keys if key not in found]
+        if self.conn is not None:
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                with self._lock:
+                    rows = self.conn.execute(
+                        f"SELECT content_hash, position FROM docs WHERE content_hash IN ({placeholders})", batch
+                    ).fetchall()
+                found.update(rows)
+        return found
+
+    def save(self, directory):
+        """
+        Writes a copy of the database with staged rows and updates applied.
+        Rows are streamed from the staging database in batches.
+        """
+        if self._staged and self._staging is None:
+            raise RuntimeError("DocStore was closed before its staged rows were saved.")
+        path = os.path.join(directory, DOCSTORE_FILENAME)
+        if self._stored:
+            shutil.copyfile(self.path, path)
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS docs ({DOCS_COLUMNS})")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_content_hash ON docs(content_hash)")
+            if self._staging is not None:
+                with self._lock:
+                    rows = self._staging.execute("SELECT position, text, metadata, content_hash FROM docs ORDER BY position")
+                    for batch in iter(lambda: rows.fetchmany(SAVE_BATCH_SIZE), []):
+                        conn.executemany("INSERT INTO docs (position, text, metadata, content_hash) VALUES (?, ?, ?, ?)", batch)
+                    updates = self._staging.execute("SELECT metadata, position FROM updates")
+                    for batch in iter(lambda: updates.fetchmany(SAVE_BATCH_SIZE), []):
+                        conn.executemany("UPDATE docs SET metadata = ? WHERE position = ?", batch)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self._staging is not None:
+            self._staging.close()
+            self._staging = None
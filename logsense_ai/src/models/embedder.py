@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from logsense_ai.src.utils.metrics import REGISTRY, timer
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+# Recent query embeddings kept in memory (retrieval and the answer cache embed the same query).
+QUERY_CACHE_SIZE = 256
+
+
+class EmbeddingStats:
+    """
+    Running totals for the embedding stage.
+    """
+    def __init__(self):
+        self.texts = 0
+        self.encoded = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        return self.texts / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            "texts": self.texts,
+            "encoded": self.encoded,
+            "cache_hits": self.cache_hits,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.throughput, 1),
+        }
+
+
+class BatchEmbedder(Embeddings):
+    """
+    Sentence-transformers embedding stage with explicit control over batching
+    and parallelism, usable anywhere LangChain expects an `Embeddings` object.
+
+    - `batch_size`: texts per forward pass.
+    - `workers`: >1 starts a multi-process CPU encoding pool.
+    - Texts are sorted by length before batching (and restored afterwards)
+      so each batch pads to a similar length, which wastes less compute.
+    - `cache`: optional `EmbeddingCache`; repeated texts (and texts already
+      seen in earlier runs) are looked up instead of re-encoded.
+    """
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, batch_size=64, workers=1, cache=None, log_progress=True):
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.cache = cache
+        self.log_progress = log_progress
+        self.stats = EmbeddingStats()
+        self._model = None
+        self._pool = None
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    @property
+    def model(self):
+        # sentence-transformers pulls in torch; load it only when first needed.
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self.logger.info(f"Starting embedding pool with {self.workers} CPU workers...")
+            self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+        return self._pool
+
+    def _encode_unique(self, texts):
+        """
+        Runs the model over `texts` (no caching) and returns vectors in input order.
+        """
+        # Length-bucketed batching: neighbouring texts have similar lengths.
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        ordered = [texts[i] for i in order]
+
+        if self.workers > 1 and len(texts) > self.batch_size:
+            vectors = self.model.encode(ordered, pool=self._get_pool(), batch_size=self.batch_size, convert_to_numpy=True)
+        else:
+            vectors = self.model.encode(ordered, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+        result = np.empty_like(vectors, dtype=np.float32)
+        result[order] = vectors
+        return result
+
+    def encode(self, texts):
+        """
+        Embeds `texts` and returns a float32 array of shape (len(texts), dim),
+        in the original input order.
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        start = time.perf_counter()
+        with timer("embed"):
+            if self.cache is None:
+                result = self._encode_unique(texts)
+                encoded = len(texts)
+            else:
+                keys = [self.cache.key(t) for t in texts]
+                known = self.cache.get_many(keys)
+                # Encode each missing key once, even if it repeats within the batch.
+                missing = {}
+                for key, text in zip(keys, texts):
+                    if key not in known and key not in missing:
+                        missing[key] = text
+                if missing:
+                    fresh = self._encode_unique(list(missing.values()))
+                    new_items = list(zip(missing.keys(), fresh))
+                    self.cache.put_many(new_items)
+                    known.update(new_items)
+                result = np.stack([known[key] for key in keys]).astype(np.float32, copy=False)
+                encoded = len(missing)
+        elapsed = time.perf_counter() - start
+
+        self.stats.texts += len(texts)
+        self.stats.encoded += encoded
+        self.stats.cache_hits += len(texts) - encoded
+        self.stats.seconds += elapsed
+        REGISTRY.counter("embedded_texts_total", "Texts embedded (cached or encoded)").inc(len(texts))
+        REGISTRY.counter("embedding_cache_hits_total", "Texts served from the embedding cache").inc(len(texts) - encoded)
+        if self.log_progress:
+            self.logger.info(
+                f"Embedded {len(texts)} chunks ({encoded} encoded, {len(texts) - encoded} cached) in {elapsed:.2f}s "
+                f"({len(texts) / max(elapsed, 1e-9):.1f} chunks/sec; "
+                f"{self.stats.texts} total at {self.stats.throughput:.1f} chunks/sec)"
+            )
+        return result
+
+    def embed_documents(self, texts):
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        with self._queries_lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                return list(vector)
+        with timer("query_embed"):
+            vector = self.model.encode([text], convert_to_numpy=True, show_progress_bar=False)[0]
+        vector = vector.astype(np.float32).tolist()
+        with self._queries_lock:
+            self._queries[text] = vector
+            if len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return list(vector)
+
+    def close(self):
+        """
+        Stops the multi-process pool, if one was started, and closes the cache.
+        """
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+import numpy as np
+
+# Leading "[2024-01-01T12:00:00.123456]" written by LogProcessor.normalize
+_LEADING_TIMESTAMP = re.compile(r"^\[[0-9T:\-\.\+Z ]+\]\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+CACHE_FILENAME = "embedding_cache.sqlite"
+
+
+def default_cache_path(index_path):
+    """
+    The cache lives beside (not inside) the index directory so it survives index rebuilds.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(index_path)), CACHE_FILENAME)
+
+
+def normalize_text(text):
+    """
+    Canonical form used for cache keys and de-duplication: the leading
+    timestamp is dropped and whitespace collapsed, so repeated log lines that
+    differ only in when they were written share one embedding.
+    """
+    return _WHITESPACE.sub(" ", _LEADING_TIMESTAMP.sub("", text)).strip()
+
+
+def content_hash(text, namespace=""):
+    """
+    Returns the hex digest identifying `text` (after normalisation) within `namespace`.
+    """
+    return hashlib.sha256(f"{namespace}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed cache of embedding vectors backed by SQLite.
+
+    Keys are hashes of the normalised text plus the model name, so switching
+    models never returns stale vectors. Least-recently-used entries are
+    evicted once the cache grows past `max_entries`.
+    """
+    def __init__(self, path, model_name, max_entries=1_000_000):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self.conn.commit()
+        self._approx_count = len(self)
+
+    def key(self, text):
+        return content_hash(text, namespace=self.model_name)
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for every key present in the cache.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # SQLite limits the number of bound parameters per statement.
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        if found:
+            now = time.time()
+            self.conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self.conn.commit()
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores (key, vector) pairs and evicts the least recently used entries if needed.
+        """
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items],
+        )
+        self.conn.commit()
+        # Only misses are inserted, so this rarely over-counts; recount before evicting.
+        self._approx_count += len(items)
+        if self._approx_count > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        count = len(self)
+        excess = count - self.max_entries
+        self._approx_count = min(count, self.max_entries)
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            self.conn.commit()
+            self.logger.info(f"Evicted {excess} least recently used embeddings from cache.")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
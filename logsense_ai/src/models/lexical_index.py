@@ -0,0 +1,193 @@
+import json
+import logging
+import math
+import os
+import re
+from array import array
+import numpy as np
+from logsense_ai.src.models.embedding_cache import normalize_text
+
+LEXICAL_DIRNAME = "lexical"
+
+# Words, numbers and identifiers; hyphen/dot-joined ids (UUIDs, versions) stay whole.
+_TOKEN = re.compile(r"[a-z0-9_]+(?:[-.][a-z0-9_]+)*")
+# Queries that look like an identifier rather than a question.
+_EXACT_QUERY = re.compile(r"^(?:\S*\d\S*|\S*_\S*|[A-Z][a-z0-9]+(?:[A-Z][A-Za-z0-9]*)+)$")
+
+
+def tokenize(text):
+    """
+    Lower-cased lexical tokens of a chunk, ignoring its leading timestamp.
+    """
+    return _TOKEN.findall(normalize_text(text).lower())
+
+
+def exact_query_terms(query):
+    """
+    Returns the index terms for an identifier-style query ("504",
+    "ConnectionRefusedError", a transaction id), or None for free text.
+    """
+    query = query.strip()
+    if not _EXACT_QUERY.match(query):
+        return None
+    terms = tokenize(query)
+    return terms or None
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk texts, aligned with FAISS vector positions.
+
+    Postings loaded from disk stay as contiguous numpy arrays; postings added
+    since the last save live in growable arrays and are merged at query time.
+    """
+    def __init__(self, k1=1.2, b=0.75):
+        self.logger = logging.getLogger(__name__)
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = array("I")
+        # Saved postings: term -> (start, end) into _positions/_tfs
+        self._frozen = {}
+        self._positions = np.empty(0, dtype=np.uint32)
+        self._tfs = np.empty(0, dtype=np.uint16)
+        # Postings added since load: term -> (array of positions, array of tfs)
+        self._fresh = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, texts):
+        """
+        Indexes `texts`, assigning them the next positions in insertion order.
+        """
+        for text in texts:
+            position = len(self.doc_lengths)
+            counts = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings = self._fresh.get(token)
+                if postings is None:
+                    postings = self._fresh[token] = (array("I"), array("H"))
+                postings[0].append(position)
+                postings[1].append(min(tf, 65535))
+            self.doc_lengths.append(len(tokens))
+            self._total_length += len(tokens)
+
+    def postings(self, term):
+        """
+        Returns (positions, term_frequencies) arrays for `term`, in position order.
+        """
+        parts_pos, parts_tf = [], []
+        span = self._frozen.get(term)
+        if span is not None:
+            parts_pos.append(self._positions[span[0]:span[1]])
+            parts_tf.append(self._tfs[span[0]:span[1]])
+        fresh = self._fresh.get(term)
+        if fresh is not None:
+            # Copies, so callers never pin the growable arrays' buffers.
+            parts_pos.append(np.array(fresh[0], dtype=np.uint32))
+            parts_tf.append(np.array(fresh[1], dtype=np.uint16))
+        if not parts_pos:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint16)
+        if len(parts_pos) == 1:
+            return parts_pos[0], parts_tf[0]
+        return np.concatenate(parts_pos), np.concatenate(parts_tf)
+
+    def lookup(self, terms, candidates=None):
+        """
+        Positions containing every term in `terms` (optionally within `candidates`).
+        Answers identifier queries without scoring or embedding anything.
+        """
+        result = None
+        for term in terms:
+            positions, _ = self.postings(term)
+            result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+            if len(result) == 0:
+                break
+        if result is None:
+            return np.empty(0, dtype=np.int64)
+        result = result.astype(np.int64)
+        if candidates is not None:
+            result = result[np.isin(result, candidates, assume_unique=True)]
+        return result
+
+    def search(self, query, k=5, candidates=None):
+        """
+        Returns (positions, scores) of the top-k chunks by BM25, best first.
+        """
+        n_docs = len(self.doc_lengths)
+        terms = set(tokenize(query))
+        if not n_docs or not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        avg_length = self._total_length / n_docs if n_docs else 1.0
+        all_positions, all_scores = [], []
+        for term in terms:
+            positions, tfs = self.postings(term)
+            df = len(positions)
+            if df == 0:
+                continue
+            if candidates is not None:
+                keep = np.isin(positions, candidates, assume_unique=True)
+                positions, tfs = positions[keep], tfs[keep]
+                if len(positions) == 0:
+                    continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[positions] / avg_length)
+            all_positions.append(positions.astype(np.int64))
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if not all_positions:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        positions, inverse = np.unique(np.concatenate(all_positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        top = np.argsort(-scores, kind="stable")[:k]
+        return positions[top], scores[top]
+
+    def save(self, directory):
+        """
+        Writes postings as contiguous .npy arrays with a JSON term dictionary.
+        """
+        path = os.path.join(directory, LEXICAL_DIRNAME)
+        os.makedirs(path, exist_ok=True)
+        terms = sorted(set(self._frozen) | set(self._fresh))
+        offsets = [0]
+        positions, tfs = [], []
+        for term in terms:
+            term_positions, term_tfs = self.postings(term)
+            positions.append(term_positions)
+            tfs.append(term_tfs)
+            offsets.append(offsets[-1] + len(term_positions))
+        np.save(os.path.join(path, "positions.npy"), np.concatenate(positions) if positions else np.empty(0, np.uint32))
+        np.save(os.path.join(path, "tfs.npy"), np.concatenate(tfs) if tfs else np.empty(0, np.uint16))
+        np.save(os.path.join(path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        np.save(os.path.join(path, "doc_lengths.npy"), np.frombuffer(self.doc_lengths, dtype=np.uint32) if len(self) else np.empty(0, np.uint32))
+        with open(os.path.join(path, "terms.json"), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=False):
+        """
+        Loads a saved index, or returns an empty one if none exists.
+        `mmap=True` maps the posting arrays instead of reading them.
+        """
+        path = os.path.join(directory, LEXICAL_DIRNAME)
+        if not os.path.exists(os.path.join(path, "terms.json")):
+            return cls()
+        with open(os.path.join(path, "terms.json"), "r") as f:
+            meta = json.load(f)
+        index = cls(k1=meta.get("k1", 1.2), b=meta.get("b", 0.75))
+        offsets = np.load(os.path.join(path, "offsets.npy"))
+        mmap_mode = "r" if mmap else None
+        index._positions = np.load(os.path.join(path, "positions.npy"), mmap_mode=mmap_mode)
+        index._tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode=mmap_mode)
+        index._frozen = {term: (int(offsets[i]), int(offsets[i + 1])) for i, term in enumerate(meta["terms"])}
+        doc_lengths = np.load(os.path.join(path, "doc_lengths.npy")).astype(np.uint32)
+        index.doc_lengths = array("I", doc_lengths.tobytes())
+        index._total_length = int(doc_lengths.sum())
+        return index
@@ -0,0 +1,205 @@
+import json
+import logging
+import math
+import os
+from array import array
+import numpy as np
+from logsense_ai.src.utils.timeutils import to_epoch
+
+METADATA_DIRNAME = "metadata"
+UNKNOWN = ""
+# Level codes below this get a bit in a row's level mask; rarer ones match by the row's own level.
+LEVEL_MASK_BITS = 64
+
+
+def _level_bit(code):
+    return 1 << code if code < LEVEL_MASK_BITS else 0
+
+
+class MetadataIndex:
+    """
+    Columnar side index aligned with FAISS vector positions.
+
+    Row `i` describes the document stored at FAISS position `i`:
+    - `service` / `level`: dictionary-encoded columns; `codes == value` is the
+      per-value bitmap used for filtering. `level` is the document's (most
+      severe) level.
+    - `level_mask`: one bit per level code present among the document's
+      entries (`entry_levels` of a grouped chunk), so a level filter matches
+      a chunk if any of its entries has that level.
+    - `ts_start` / `ts_end`: time range covered by the document (equal for a
+      single log entry, first/last seen for a template), NaN if unknown.
+    A permutation sorting `ts_end` is kept so "since" filters are a binary
+    search instead of a scan.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.service_values = [UNKNOWN]
+        self.level_values = [UNKNOWN]
+        self._service_codes = {UNKNOWN: 0}
+        self._level_codes = {UNKNOWN: 0}
+        # Appended during ingestion; converted to numpy lazily for queries.
+        self._services = array("H")
+        self._levels = array("B")
+        self._level_masks = array("Q")
+        self._ts_start = array("d")
+        self._ts_end = array("d")
+        self._columns = None
+
+    def __len__(self):
+        return len(self._services)
+
+    @staticmethod
+    def _encode(value, values, codes):
+        value = value or UNKNOWN
+        code = codes.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            codes[value] = code
+        return code
+
+    def add(self, metadatas):
+        """
+        Appends one row per metadata dict, in FAISS insertion order.
+        """
+        # Drop numpy views first: an array with exported buffers cannot grow.
+        self._columns = None
+        for metadata in metadatas:
+            metadata = metadata or {}
+            self._services.append(self._encode(metadata.get("service"), self.service_values, self._service_codes))
+            level = self._encode(metadata.get("level"), self.level_values, self._level_codes)
+            self._levels.append(level)
+            mask = _level_bit(level)
+            for entry_level in metadata.get("entry_levels") or ():
+                if entry_level is not None:
+                    mask |= _level_bit(self._encode(entry_level, self.level_values, self._level_codes))
+            self._level_masks.append(mask)
+            start = to_epoch(metadata.get("first_seen") or metadata.get("timestamp"))
+            end = to_epoch(metadata.get("last_seen") or metadata.get("timestamp"))
+            self._ts_start.append(math.nan if start is None else start)
+            self._ts_end.append(math.nan if end is None else end)
+
+    def widen(self, position, start=None, end=None):
+        """
+        Extends row `position`'s time range to cover `start`..`end` (POSIX
+        seconds), e.g. when a deduplicated chunk is seen again.
+        """
+        # Drop numpy views and the ts_end sort order; both are rebuilt on the next query.
+        self._columns = None
+        # NaN (unknown) compares False, so a known bound always replaces it.
+        if start is not None and not self._ts_start[position] <= start:
+            self._ts_start[position] = start
+        if end is not None and not self._ts_end[position] >= end:
+            self._ts_end[position] = end
+
+    def _get_columns(self):
+        if self._columns is None:
+            ts_end = np.frombuffer(self._ts_end, dtype=np.float64) if len(self) else np.empty(0)
+            # NaNs sort last, so they never satisfy a lower time bound.
+            self._columns = {
+                "service": np.frombuffer(self._services, dtype=np.uint16) if len(self) else np.empty(0, np.uint16),
+                "level": np.frombuffer(self._levels, dtype=np.uint8) if len(self) else np.empty(0, np.uint8),
+                "level_mask": np.frombuffer(self._level_masks, dtype=np.uint64) if len(self) else np.empty(0, np.uint64),
+                "ts_start": np.frombuffer(self._ts_start, dtype=np.float64) if len(self) else np.empty(0),
+                "ts_end": ts_end,
+                "ts_end_order": np.argsort(ts_end, kind="stable"),
+            }
+        return self._columns
+
+    def _codes_for(self, values, codes):
+        if isinstance(values, str):
+            values = [values]
+        return [codes[v] for v in values if v in codes]
+
+    def candidates(self, service=None, level=None, since=None, until=None):
+        """
+        Returns the sorted FAISS positions matching every given filter.
+        `service` / `level` may be a value or a list of values; a grouped
+        chunk matches `level` if any of its entries does. `since` / `until`
+        are POSIX timestamps bounding the document's time range.
+        """
+        cols = self._get_columns()
+        ids = None
+
+        if since is not None:
+            order = cols["ts_end_order"]
+            start = np.searchsorted(cols["ts_end"][order], since, side="left")
+            ids = order[start:]
+            ids = ids[~np.isnan(cols["ts_end"][ids])]
+
+        for column, values, codes in (("service", service, self._service_codes), ("level", level, self._level_codes)):
+            if not values:
+                continue
+            wanted = self._codes_for(values, codes)
+            if not wanted:
+                return np.empty(0, dtype=np.int64)
+            if ids is None:
+                ids = np.nonzero(self._matches(cols, column, wanted))[0]
+            else:
+                ids = ids[self._matches(cols, column, wanted, ids)]
+
+        if until is not None:
+            if ids is None:
+                ids = np.nonzero(cols["ts_start"] <= until)[0]
+            else:
+                ids = ids[cols["ts_start"][ids] <= until]
+
+        if ids is None:
+            return np.arange(len(self), dtype=np.int64)
+        return np.sort(ids).astype(np.int64)
+
+    @staticmethod
+    def _matches(cols, column, wanted, ids=None):
+        """
+        Boolean mask over `ids` (all rows if None) of rows whose `column` has one of the `wanted` codes.
+        """
+        values = cols[column] if ids is None else cols[column][ids]
+        if column != "level":
+            return np.isin(values, wanted)
+        masks = cols["level_mask"] if ids is None else cols["level_mask"][ids]
+        matches = (masks & np.uint64(sum(_level_bit(code) for code in wanted))) != 0
+        rare = [code for code in wanted if code >= LEVEL_MASK_BITS]
+        if rare:
+            matches |= np.isin(values, rare)
+        return matches
+
+    def save(self, directory):
+        """
+        Writes the columns as .npy files plus a JSON dictionary of encoded values.
+        """
+        path = os.path.join(directory, METADATA_DIRNAME)
+        os.makedirs(path, exist_ok=True)
+        cols = self._get_columns()
+        for name in ("service", "level", "level_mask", "ts_start", "ts_end"):
+            np.save(os.path.join(path, f"{name}.npy"), cols[name])
+        with open(os.path.join(path, "values.json"), "w") as f:
+            json.dump({"service": self.service_values, "level": self.level_values}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Loads a saved index. Returns an empty index if none exists (e.g. an
+        index built before metadata was recorded).
+        """
+        index = cls()
+        path = os.path.join(directory, METADATA_DIRNAME)
+        if not os.path.exists(os.path.join(path, "values.json")):
+            return index
+        with open(os.path.join(path, "values.json"), "r") as f:
+            values = json.load(f)
+        index.service_values = values["service"]
+        index.level_values = values["level"]
+        index._service_codes = {v: i for i, v in enumerate(index.service_values)}
+        index._level_codes = {v: i for i, v in enumerate(index.level_values)}
+        index._services = array("H", np.load(os.path.join(path, "service.npy")).astype(np.uint16).tobytes())
+        index._levels = array("B", np.load(os.path.join(path, "level.npy")).astype(np.uint8).tobytes())
+        mask_path = os.path.join(path, "level_mask.npy")
+        if os.path.exists(mask_path):
+            index._level_masks = array("Q", np.load(mask_path).astype(np.uint64).tobytes())
+        else:
+            # Saved before level masks: each row has its own level only.
+            index._level_masks = array("Q", (_level_bit(code) for code in index._levels))
+        index._ts_start = array("d", np.load(os.path.join(path, "ts_start.npy")).astype(np.float64).tobytes())
+        index._ts_end = array("d", np.load(os.path.join(path, "ts_end.npy")).astype(np.float64).tobytes())
+        return index
@@ -1,18 +1,88 @@
+import asyncio
 import logging
 import os
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from logsense_ai.src.models.vector_store import LogVectorStore
+import threading
+import time
+import httpx
+from logsense_ai.src.models.answer_cache import (
+    AnswerCache, DEFAULT_MAX_ENTRIES, DEFAULT_SIMILARITY_THRESHOLD, DEFAULT_TTL, evidence_key,
+)
+from logsense_ai.src.models.context_builder import ContextBuilder, DEFAULT_TOKEN_BUDGET
+from logsense_ai.src.models.lexical_index import exact_query_terms, tokenize
+from logsense_ai.src.models.sharded_store import index_version, open_vector_store
+from logsense_ai.src.models.trace_index import TRACE_FIELD
+from logsense_ai.src.processing.chunker import covered_entries
+from logsense_ai.src.utils.metrics import REGISTRY, time_iter, timer
+
+DEFAULT_LLM_BASE_URL = "https://openrouter.ai/api/v1"
+# Points the engine at another OpenAI-compatible endpoint, e.g. a local stub.
+LLM_BASE_URL_ENV = "LOGSENSE_LLM_BASE_URL"
+NO_LOGS_ANSWER = "No relevant logs found to analyze this issue."
+LLM_ERROR_ANSWER = "Error generating explanation. Please check your API Key."
+PROMPT_TEMPLATE = """You are an expert SRE and Data Engineer assistant. 
+            Analyze the following log entries to answer the user's question.
+            If the logs do not contain enough information, state that clearly.
+            
+            Logs:
+            {logs}
+            
+            Question: 
+            {question}
+            
+            Analysis (Root Cause & Explanation):"""
+
+def _record_analysis(start, outcome):
+    """
+    End-to-end latency of one analysis, labelled by how it ended
+    ("answered", "cached", "no_logs", "llm_error", "timeout").
+    """
+    REGISTRY.histogram("analyze_seconds", "End-to-end incident analysis latency").observe(
+        time.perf_counter() - start, outcome=outcome)
+
+def _tag_trace(text, trace_id):
+    if not trace_id:
+        return text
+    first_line, newline, rest = text.partition("\n")
+    return f"{first_line} (correlation_id={trace_id}){newline}{rest}"
 
 class RAGEngine:
     """
     Handles Semantic Search and Retrieval Augmented Generation (RAG).
+
+    LLM calls go through pooled HTTP clients with a per-call `llm_timeout`
+    and `max_retries`. The async API (`aanalyze_incident`, `analyze_many`)
+    runs retrieval in worker threads and caps in-flight LLM calls at
+    `max_concurrency`; `stream_incident` / `astream_incident` yield tokens
+    as they arrive.
+
+    Answers are cached (`AnswerCache`) for questions similar to an earlier
+    one that retrieve the same chunks from the same index version;
+    `answer_cache_size=0` disables the cache.
+
+    Retrieved chunks reach the prompt through a `ContextBuilder`, which
+    deduplicates and compresses them into at most `context_tokens` tokens.
+    With `expand_traces`, every hit carrying a correlation id brings along
+    the rest of its request's entries (up to `max_trace_entries`) from other
+    services, so the LLM sees the causal chain rather than isolated lines.
+    For a grouped chunk, the traces of its most severe entries are expanded.
     """
-    def __init__(self, index_path="logsense_ai/data/processed/faiss_index"):
+    def __init__(self, index_path="logsense_ai/data/processed/faiss_index", nprobe=None, ef_search=None,
+                 llm_timeout=60.0, max_retries=2, max_concurrency=8, llm_base_url=None,
+                 answer_cache_size=DEFAULT_MAX_ENTRIES, answer_cache_ttl=DEFAULT_TTL,
+                 answer_cache_threshold=DEFAULT_SIMILARITY_THRESHOLD, context_tokens=DEFAULT_TOKEN_BUDGET,
+                 expand_traces=True, max_trace_entries=50):
         self.logger = logging.getLogger(__name__)
-        self.vector_store = LogVectorStore(index_path=index_path)
-        # Load the index (must exist)
-        self.vector_store.load()
+        self.index_path = index_path
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.index_version = index_version(index_path)
+        self.vector_store = open_vector_store(index_path, nprobe=nprobe, ef_search=ef_search)
+        # Load the index (must exist); memory-mapped, since the engine never writes it
+        self.vector_store.load(read_only=True)
+        self.context_builder = ContextBuilder(token_budget=context_tokens)
+        self.expand_traces = expand_traces
+        self.max_trace_entries = max_trace_entries
+        self.answer_cache = AnswerCache(answer_cache_threshold, answer_cache_ttl, answer_cache_size) if answer_cache_size else None
         
         # Initialize LLM with OpenRouter
         # Usage depends on OPENROUTER_API_KEY being set
@@ -20,65 +90,354 @@ class RAGEngine:
         if not api_key:
              self.logger.warning("OPENROUTER_API_KEY not found. LLM search will fail.")
         
-        self.llm = ChatOpenAI(
+        self.llm_timeout = llm_timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._llm = None
+        self._llm_overridden = False
+        self._async_llm = None
+        self._async_client = None
+        self._async_llm_loop = None
+        self._llm_lock = threading.Lock()
+        self._llm_kwargs = dict(
             model_name="mistralai/mistral-7b-instruct:free", # Using a free model on OpenRouter
             temperature=0,
             openai_api_key=api_key,
-            openai_api_base="https://openrouter.ai/api/v1"
+            openai_api_base=llm_base_url or os.getenv(LLM_BASE_URL_ENV) or DEFAULT_LLM_BASE_URL,
+            timeout=llm_timeout,
+            max_retries=max_retries,
         )
         
-        self.prompt_template = PromptTemplate(
-            input_variables=["logs", "question"],
-            template="""You are an expert SRE and Data Engineer assistant. 
-            Analyze the following log entries to answer the user's question.
-            If the logs do not contain enough information, state that clearly.
-            
-            Logs:
-            {logs}
-            
-            Question: 
-            {question}
-            
-            Analysis (Root Cause & Explanation):"""
-        )
+        # Plain str.format template (LangChain's PromptTemplate costs ~0.7s to import).
+        self.prompt_template = PROMPT_TEMPLATE
+
+    @property
+    def llm(self):
+        """
+        The chat model client, created on first use: importing the OpenAI
+        client costs ~2s, which searches that never reach the LLM (no logs
+        found, cached answers) should not pay.
+        """
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    # Keep-alive connection pool shared by all sync calls
+                    self._llm = self._new_llm(http_client=httpx.Client(limits=self._http_limits(), timeout=self.llm_timeout))
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm):
+        # A replacement model (e.g. a test double) serves async calls too.
+        self._llm = llm
+        self._llm_overridden = True
+
+    def _http_limits(self):
+        return httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
 
-    def search(self, query, k=5):
+    def _new_llm(self, **clients):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(**clients, **self._llm_kwargs)
+
+    def _get_async_llm(self):
+        """
+        The chat model for async calls on the running event loop. An
+        `httpx.AsyncClient`'s pooled connections belong to the loop that
+        opened them, and `analyze_many` runs a new loop per call, so each
+        loop gets its own client, like `_get_semaphore`.
+        """
+        if self._llm_overridden:
+            return self._llm
+        loop = asyncio.get_running_loop()
+        if self._async_llm_loop is not loop:
+            self._async_client = httpx.AsyncClient(limits=self._http_limits(), timeout=self.llm_timeout)
+            self._async_llm = self._new_llm(http_async_client=self._async_client)
+            self._async_llm_loop = loop
+        return self._async_llm
+
+    async def _close_async_llm(self):
+        """
+        Closes the running loop's async client before the loop itself goes away.
+        """
+        if self._async_llm_loop is asyncio.get_running_loop():
+            client = self._async_client
+            self._async_llm = self._async_client = self._async_llm_loop = None
+            await client.aclose()
+
+    def reload_if_changed(self):
+        """
+        Re-opens the index if a new version was published since it was loaded.
+        The embedding model stays loaded; in-flight searches finish on the old
+        index. Returns True if the index was reloaded.
+        """
+        version = index_version(self.index_path)
+        if version == self.index_version:
+            return False
+        vector_store = open_vector_store(self.index_path, nprobe=self.nprobe, ef_search=self.ef_search,
+                                         embeddings=self.vector_store.embeddings)
+        vector_store.load(read_only=True)
+        self.vector_store = vector_store
+        self.index_version = version
+        self.logger.info(f"Reloaded index from {self.index_path}")
+        return True
+
+    def search_documents(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Same as `search`, returning the `Document`s (text and metadata).
+        """
+        self.logger.info(f"Searching for: {query} (filters: {filters or 'none'}, mode: {mode})")
+        REGISTRY.counter("queries_total", "Retrieval queries by mode").inc(mode=mode)
+        with timer("retrieve"):
+            return self.vector_store.search(query, k=k, filters=filters, mode=mode)
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
         """
         Retrieves top-k relevant log chunks for the query.
+        `filters` (service, level, since, until) narrow the candidates before ranking;
+        `mode` is "hybrid" (BM25 + vector), "vector" or "lexical". On a sharded
+        index only shards overlapping the `since`/`until` window are searched.
+        """
+        return [doc.page_content for doc in self.search_documents(query, k=k, filters=filters, mode=mode)]
+
+    def _retrieve(self, query, k, filters, mode):
+        """
+        Returns (source_logs, cache_key, cached_answer); the answer is None on a cache miss.
+        """
+        version = self.index_version
+        docs = self.search_documents(query, k=k, filters=filters, mode=mode)
+        with timer("trace_expand"):
+            retrieved_logs = self._expand(docs) if self.expand_traces else [doc.page_content for doc in docs]
+        if self.answer_cache is None or not docs:
+            return retrieved_logs, None, None
+        cache_key = (self._cache_query(query, mode), evidence_key(docs), version)
+        with timer("answer_cache"):
+            return retrieved_logs, cache_key, self.answer_cache.get(*cache_key)
+
+    def _cache_query(self, query, mode):
+        """
+        What the answer cache matches `query` on: its normalised terms when
+        retrieval ran without the embedding model (identifier lookups,
+        "lexical" mode), else the query embedding (already computed by the
+        search, so served from the embedder's query cache).
+        """
+        terms = exact_query_terms(query) if mode != "vector" else None
+        if mode == "lexical" and not terms:
+            terms = tokenize(query)
+        if terms:
+            return " ".join(terms)
+        return self.vector_store.embeddings.embed_query(query)
+
+    def trace(self, trace_id, limit=None):
+        """
+        All entries logged under correlation id `trace_id`, oldest first. No vector search.
         """
-        self.logger.info(f"Searching for: {query}")
-        docs = self.vector_store.similarity_search(query, k=k)
-        return [doc.page_content for doc in docs]
+        return self.vector_store.trace(trace_id, limit=limit)
 
-    def analyze_incident(self, query, k=5):
+    def _expand(self, docs):
+        """
+        Texts of `docs`, each followed by the other entries of its trace;
+        entries are tagged with their correlation id.
+        """
+        texts = {}
+        expanded = set()
+        for doc in docs:
+            entries = covered_entries(doc.page_content, doc.metadata)
+            texts["\n".join(_tag_trace(text, metadata.get(TRACE_FIELD)) for text, metadata in entries)] = None
+            for _, metadata in entries:
+                trace_id = metadata.get(TRACE_FIELD)
+                if not trace_id or trace_id in expanded or metadata.get("level") != doc.metadata.get("level"):
+                    continue
+                expanded.add(trace_id)
+                for entry in self.trace(trace_id, limit=self.max_trace_entries):
+                    texts[_tag_trace(entry.page_content, trace_id)] = None
+        return list(texts)
+
+    def _remember(self, cache_key, answer):
+        if cache_key is not None:
+            self.answer_cache.put(*cache_key, answer)
+
+    def _build_prompt(self, query, retrieved_logs):
+        # Deduplicated, time-ordered evidence within the token budget
+        with timer("context"):
+            context_logs, stats = self.context_builder.build(retrieved_logs)
+        self.logger.info(
+            f"Context: {stats['included_entries']}/{stats['unique_entries']} unique entries "
+            f"from {stats['chunks']} chunks, {stats['tokens']}/{stats['token_budget']} tokens"
+        )
+        return self.prompt_template.format(logs=context_logs, question=query)
+
+    def analyze_incident(self, query, k=5, filters=None, mode="hybrid"):
         """
         Full RAG flow: Search -> Prompt -> Generate.
         Returns a dictionary with 'answer' and 'source_logs'.
         """
-        retrieved_logs = self.search(query, k=k)
+        start = time.perf_counter()
+        retrieved_logs, cache_key, cached = self._retrieve(query, k, filters, mode)
         
         if not retrieved_logs:
+            _record_analysis(start, "no_logs")
             return {
-                "answer": "No relevant logs found to analyze this issue.",
+                "answer": NO_LOGS_ANSWER,
                 "source_logs": []
             }
+        if cached is not None:
+            self.logger.info("Answer served from cache.")
+            _record_analysis(start, "cached")
+            return {"answer": cached, "source_logs": retrieved_logs, "cached": True}
         
-        # Combine logs into a context string
-        context_logs = "\n\n".join(retrieved_logs)
-        
-        # Format prompt
-        prompt = self.prompt_template.format(logs=context_logs, question=query)
+        prompt = self._build_prompt(query, retrieved_logs)
         
         self.logger.info("Generating explanation from LLM...")
         try:
-            response = self.llm.invoke(prompt)
+            with timer("llm_generate"):
+                response = self.llm.invoke(prompt)
+            self._remember(cache_key, response.content)
+            _record_analysis(start, "answered")
             return {
                 "answer": response.content,
                 "source_logs": retrieved_logs
             }
         except Exception as e:
             self.logger.error(f"LLM generation failed: {e}")
+            _record_analysis(start, "llm_error")
             return {
-                "answer": "Error generating explanation. Please check your API Key.",
+                "answer": LLM_ERROR_ANSWER,
                 "source_logs": retrieved_logs
             }
+
+    def stream_incident(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Streaming variant of `analyze_incident`. Yields events:
+        {"type": "sources", "source_logs": [...]}, then one {"type": "token",
+        "text": ...} per generated chunk, then {"type": "done", "answer": ...}.
+        """
+        start = time.perf_counter()
+        retrieved_logs, cache_key, cached = self._retrieve(query, k, filters, mode)
+        yield {"type": "sources", "source_logs": retrieved_logs}
+        if not retrieved_logs:
+            _record_analysis(start, "no_logs")
+            yield {"type": "done", "answer": NO_LOGS_ANSWER}
+            return
+        if cached is not None:
+            _record_analysis(start, "cached")
+            yield {"type": "done", "answer": cached, "cached": True}
+            return
+
+        parts = []
+        outcome = "answered"
+        try:
+            # Only the time spent waiting for tokens counts as generation.
+            for chunk in time_iter(self.llm.stream(self._build_prompt(query, retrieved_logs)), "llm_generate"):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield {"type": "token", "text": chunk.content}
+        except Exception as e:
+            self.logger.error(f"LLM generation failed: {e}")
+            outcome = "llm_error"
+            if not parts:
+                _record_analysis(start, outcome)
+                yield {"type": "done", "answer": LLM_ERROR_ANSWER}
+                return
+            # A partial answer is shown but not cached.
+            cache_key = None
+        self._remember(cache_key, "".join(parts))
+        _record_analysis(start, outcome)
+        yield {"type": "done", "answer": "".join(parts)}
+
+    def _get_semaphore(self):
+        # asyncio primitives belong to one event loop; make one per loop.
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def aanalyze_incident(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Async `analyze_incident`. Retrieval runs in a worker thread, so it
+        overlaps with other incidents' LLM calls; at most `max_concurrency`
+        LLM calls are in flight and each is bounded by `llm_timeout`.
+        """
+        start = time.perf_counter()
+        retrieved_logs, cache_key, cached = await asyncio.to_thread(self._retrieve, query, k, filters, mode)
+        if not retrieved_logs:
+            _record_analysis(start, "no_logs")
+            return {"answer": NO_LOGS_ANSWER, "source_logs": []}
+        if cached is not None:
+            _record_analysis(start, "cached")
+            return {"answer": cached, "source_logs": retrieved_logs, "cached": True}
+
+        prompt = self._build_prompt(query, retrieved_logs)
+        async with self._get_semaphore():
+            # Coroutines interleave on this thread, so no stage timer: record the call's duration.
+            generation_start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(self._get_async_llm().ainvoke(prompt), timeout=self.llm_timeout)
+                answer = response.content
+                self._remember(cache_key, answer)
+                outcome = "answered"
+            except asyncio.TimeoutError:
+                self.logger.error(f"LLM call timed out after {self.llm_timeout}s")
+                answer = f"LLM did not answer within {self.llm_timeout:g}s."
+                outcome = "timeout"
+            except Exception as e:
+                self.logger.error(f"LLM generation failed: {e}")
+                answer = LLM_ERROR_ANSWER
+                outcome = "llm_error"
+            REGISTRY.record_stage("llm_generate", time.perf_counter() - generation_start)
+        _record_analysis(start, outcome)
+        return {"answer": answer, "source_logs": retrieved_logs}
+
+    async def astream_incident(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Async `stream_incident`: same events, yielded as tokens arrive.
+        """
+        start = time.perf_counter()
+        retrieved_logs, cache_key, cached = await asyncio.to_thread(self._retrieve, query, k, filters, mode)
+        yield {"type": "sources", "source_logs": retrieved_logs}
+        if not retrieved_logs:
+            _record_analysis(start, "no_logs")
+            yield {"type": "done", "answer": NO_LOGS_ANSWER}
+            return
+        if cached is not None:
+            _record_analysis(start, "cached")
+            yield {"type": "done", "answer": cached, "cached": True}
+            return
+
+        parts = []
+        outcome = "answered"
+        async with self._get_semaphore():
+            try:
+                async for chunk in self._get_async_llm().astream(self._build_prompt(query, retrieved_logs)):
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield {"type": "token", "text": chunk.content}
+            except Exception as e:
+                self.logger.error(f"LLM generation failed: {e}")
+                outcome = "llm_error"
+                if not parts:
+                    _record_analysis(start, outcome)
+                    yield {"type": "done", "answer": LLM_ERROR_ANSWER}
+                    return
+                cache_key = None
+        self._remember(cache_key, "".join(parts))
+        _record_analysis(start, outcome)
+        yield {"type": "done", "answer": "".join(parts)}
+
+    async def aanalyze_many(self, queries, k=5, filters=None, mode="hybrid"):
+        """
+        Analyzes `queries` concurrently; results are returned in input order.
+        """
+        return await asyncio.gather(*(self.aanalyze_incident(q, k=k, filters=filters, mode=mode) for q in queries))
+
+    def analyze_many(self, queries, k=5, filters=None, mode="hybrid"):
+        """
+        Synchronous entry point for `aanalyze_many`, on an event loop of its own.
+        """
+        async def run():
+            try:
+                return await self.aanalyze_many(queries, k=k, filters=filters, mode=mode)
+            finally:
+                await self._close_async_llm()
+
+        return asyncio.run(run())
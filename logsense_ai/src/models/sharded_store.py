@@ -0,0 +1,352 @@
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logsense_ai.src.models.embedder import BatchEmbedder, DEFAULT_MODEL_NAME
+from logsense_ai.src.models.embedding_cache import EmbeddingCache
+from logsense_ai.src.models.docstore import DocStore, DOCSTORE_FILENAME
+from logsense_ai.src.models.tier_policy import is_tiered
+from logsense_ai.src.models.tiered_store import TieredVectorStore
+from logsense_ai.src.models.trace_index import occurrence_documents
+from logsense_ai.src.models.vector_store import LogVectorStore, merge_hits
+from logsense_ai.src.models.versions import VersionPin, current_version, staged_version
+from logsense_ai.src.utils.batching import batched
+from logsense_ai.src.utils.metrics import timer
+from logsense_ai.src.utils.timeutils import to_epoch
+
+MANIFEST_FILENAME = "shards.json"
+SHARDS_DIRNAME = "shards"
+SHARD_FORMATS = {"hour": "%Y%m%d%H", "day": "%Y%m%d"}
+# Chunks without a parseable timestamp; searched by every query.
+UNDATED_SHARD = "undated"
+
+
+def is_sharded(index_path):
+    return os.path.exists(os.path.join(index_path, MANIFEST_FILENAME))
+
+
+def index_version(index_path):
+    """
+    A value that changes whenever a new index is published at `index_path`:
+    the name of its current version, or for an unversioned directory (written
+    before versioning) its inode and mtime and its shard manifest's.
+    None if there is no index.
+    """
+    name = current_version(index_path)
+    if name is not None:
+        return name
+    version = []
+    for path in (index_path, os.path.join(index_path, MANIFEST_FILENAME)):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        version.append((stat.st_ino, stat.st_mtime_ns))
+    return tuple(version) or None
+
+
+def open_vector_store(index_path, shard_by=None, info_tier=None, info_sample_rate=None, **kwargs):
+    """
+    Returns a `ShardedVectorStore` if `shard_by` is given or `index_path`
+    already holds a sharded index, otherwise a single `LogVectorStore`.
+    It is wrapped in a `TieredVectorStore` if `info_tier` asks for tiering
+    or the index is already tiered (`info_tier=None` keeps its policy).
+    """
+    if shard_by or is_sharded(index_path):
+        store = ShardedVectorStore(index_path, shard_by=shard_by, **kwargs)
+    else:
+        kwargs.pop("retention", None)
+        kwargs.pop("search_workers", None)
+        store = LogVectorStore(index_path=index_path, **kwargs)
+    if info_tier not in (None, "embed") or is_tiered(index_path):
+        return TieredVectorStore(store, info_tier=info_tier, sample_rate=info_sample_rate)
+    return store
+
+
+class ShardedVectorStore:
+    """
+    A set of time-partitioned `LogVectorStore` shards (one per hour or day)
+    behind the same interface as a single store.
+
+    Layout: `index_path/shards.json` lists every shard with the time range it
+    covers, each shard lives in `index_path/shards/<key>/` and is built and
+    deleted independently. Saving publishes a new version that hard-links
+    the unchanged shards of the previous one. Shards are opened lazily, from
+    the version pinned by `load`; a search only opens the shards overlapping
+    its `since`/`until` window and queries them in parallel, merging their
+    top-k. `retention` (seconds) drops whole shards once their newest entry
+    is older than that, without touching the rest.
+    """
+    def __init__(self, index_path, shard_by=None, retention=None, search_workers=4, embedding_batch_size=64,
+                 embedding_workers=1, embedding_cache_path=None, cache_max_entries=1_000_000, embeddings=None,
+                 **store_kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.index_path = index_path
+        self.shard_by = shard_by or self._stored_shard_by() or "day"
+        self.retention = retention
+        self.search_workers = search_workers
+        if embeddings is None:
+            cache = EmbeddingCache(embedding_cache_path, DEFAULT_MODEL_NAME, max_entries=cache_max_entries) if embedding_cache_path else None
+            embeddings = BatchEmbedder(batch_size=embedding_batch_size, workers=embedding_workers, cache=cache)
+        self.embeddings = embeddings
+        self.store_kwargs = store_kwargs
+        self.manifest = {}  # shard key -> {"start", "end", "count"}
+        self._shards = {}  # open shard stores
+        self._dirty = set()
+        # A fresh (not loaded) store replaces everything on disk when saved.
+        self._fresh = True
+        self.read_only = False
+        self.version = VersionPin()
+
+    @property
+    def empty(self):
+        return not self.manifest
+
+    def _stored_shard_by(self):
+        path = os.path.join(self.index_path, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f).get("shard_by")
+
+    def _shard_path(self, key, root=None):
+        return os.path.join(root or self.version.path or self.index_path, SHARDS_DIRNAME, key)
+
+    def shard_key(self, timestamp):
+        """
+        Shard key for a POSIX timestamp (local time, like the log timestamps).
+        """
+        if timestamp is None:
+            return UNDATED_SHARD
+        return datetime.fromtimestamp(timestamp).strftime(SHARD_FORMATS[self.shard_by])
+
+    def _open(self, key):
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = LogVectorStore(index_path=self._shard_path(key), embeddings=self.embeddings, **self.store_kwargs)
+            if key in self.manifest and not self._fresh:
+                shard.load(read_only=self.read_only)
+            self._shards[key] = shard
+        return shard
+
+    def add_texts(self, texts, metadatas=None):
+        """
+        Routes each chunk to the shard of its timestamp and embeds per shard.
+        """
+        groups = {}
+        for i, text in enumerate(texts):
+            metadata = metadatas[i] if metadatas else None
+            timestamp = to_epoch((metadata or {}).get("timestamp"))
+            key = self.shard_key(timestamp)
+            group = groups.setdefault(key, ([], [], []))
+            group[0].append(text)
+            group[1].append(metadata or {})
+            group[2].append(timestamp)
+
+        for key, (shard_texts, shard_metadatas, timestamps) in groups.items():
+            self._open(key).add_texts(shard_texts, metadatas=shard_metadatas)
+            info = self.manifest.setdefault(key, {"start": None, "end": None, "count": 0})
+            known = [ts for ts in timestamps if ts is not None]
+            if known:
+                info["start"] = min(known) if info["start"] is None else min(info["start"], min(known))
+                info["end"] = max(known) if info["end"] is None else max(info["end"], max(known))
+            info["count"] += len(shard_texts)
+            self._dirty.add(key)
+
+    def add_texts_batched(self, texts, batch_size=512, metadatas=None):
+        if metadatas is None:
+            return self.add_documents_batched(((text, None) for text in texts), batch_size=batch_size)
+        return self.add_documents_batched(zip(texts, metadatas), batch_size=batch_size)
+
+    def add_documents_batched(self, documents, batch_size=512):
+        total = 0
+        for batch in batched(documents, batch_size):
+            self.add_texts([text for text, _ in batch], metadatas=[metadata for _, metadata in batch])
+            total += len(batch)
+        return total
+
+    def reset(self):
+        self.manifest = {}
+        self._shards = {}
+        self._dirty = set()
+        self._fresh = True
+
+    def close(self):
+        self.embeddings.close()
+        for shard in self._shards.values():
+            shard.docstore.close()
+
+    def load(self, read_only=False):
+        """
+        Reads the shard manifest; shards themselves are opened on demand
+        (memory-mapped if `read_only`) from the same pinned version.
+        """
+        path = os.path.join(self.version.acquire(self.index_path), MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            self.logger.warning(f"No sharded index at {self.index_path}. Starting fresh.")
+            return
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data["shard_by"] != self.shard_by:
+            self.logger.warning(f"Index is sharded by {data['shard_by']}; ignoring shard_by={self.shard_by}.")
+        self.shard_by = data["shard_by"]
+        self.manifest = data["shards"]
+        self._shards = {}
+        self._dirty = set()
+        self._fresh = False
+        self.read_only = read_only
+        self.logger.info(f"Sharded index loaded from {self.index_path} ({len(self.manifest)} shards)")
+
+    def _write_manifest(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST_FILENAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"shard_by": self.shard_by, "shards": self.manifest}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def drop_before(self, cutoff):
+        """
+        Drops every shard whose newest entry is older than `cutoff` (POSIX
+        seconds); the next `save` publishes a version without them. Nothing
+        else is rebuilt. Returns the dropped shard keys.
+        """
+        expired = [key for key, info in self.manifest.items() if info["end"] is not None and info["end"] < cutoff]
+        for key in expired:
+            self.manifest.pop(key)
+            self._shards.pop(key, None)
+            self._dirty.discard(key)
+        if expired:
+            self.logger.info(f"Retention dropped {len(expired)} shard(s): {', '.join(sorted(expired))}")
+        return expired
+
+    def save(self, sidecars=None):
+        """
+        Saves changed shards with the manifest and `sidecars` as a new version.
+
+        A loaded index is cloned with its shards hard-linked, so only the
+        changed shards are written; shards dropped by retention are left out.
+        A fresh store is written as a whole.
+        """
+        if self.retention:
+            self.drop_before(time.time() - self.retention)
+        if not self.manifest:
+            self.logger.warning("No vector store to save.")
+            return
+
+        keys = sorted(self._shards if self._fresh else self._dirty)
+        clone_from = None if self._fresh else self.version.path
+        with timer("save"):
+            with staged_version(self.index_path, clone_from=clone_from, link_dirs=(SHARDS_DIRNAME,)) as staging_path:
+                shards_path = os.path.join(staging_path, SHARDS_DIRNAME)
+                for key in os.listdir(shards_path) if os.path.isdir(shards_path) else []:
+                    if key not in self.manifest:
+                        shutil.rmtree(os.path.join(shards_path, key))
+                for key in keys:
+                    path = self._shard_path(key, staging_path)
+                    # Unlink the previous version's files rather than write through the hard links.
+                    shutil.rmtree(path, ignore_errors=True)
+                    self._shards[key].write(path)
+                self._write_manifest(staging_path)
+                for sidecar in sidecars or []:
+                    sidecar.save(staging_path)
+            self.version.acquire(self.index_path)
+            for key, shard in self._shards.items():
+                shard.index_path = self._shard_path(key)
+                if key in keys:
+                    shard.docstore.close()
+                    shard.docstore = DocStore(os.path.join(shard.index_path, DOCSTORE_FILENAME))
+        self._fresh = False
+        self._dirty = set()
+        self.logger.info(f"Sharded index saved to {self.index_path} ({len(self.manifest)} shards)")
+
+    def plan(self, filters=None):
+        """
+        Shard keys whose time range overlaps the `since`/`until` filters, newest first.
+        """
+        since = (filters or {}).get("since")
+        until = (filters or {}).get("until")
+        keys = []
+        for key, info in self.manifest.items():
+            if info["end"] is not None and since is not None and info["end"] < since:
+                continue
+            if info["start"] is not None and until is not None and info["start"] > until:
+                continue
+            keys.append(key)
+        # Undated chunks can match any window, so they are always searched (last).
+        dated = sorted((key for key in keys if key != UNDATED_SHARD), reverse=True)
+        return dated + [key for key in keys if key == UNDATED_SHARD]
+
+    def _fan_out(self, keys, fn):
+        """
+        Runs `fn(key, shard)` on each shard in parallel (opening it if needed),
+        returning results in `keys` order.
+        """
+        def run(key):
+            return fn(key, self._open(key))
+
+        if len(keys) <= 1 or self.search_workers <= 1:
+            return [run(key) for key in keys]
+        with ThreadPoolExecutor(max_workers=min(self.search_workers, len(keys))) as pool:
+            return list(pool.map(run, keys))
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Same contract as `LogVectorStore.search`, fanned out over the shards
+        selected by `plan`. The query is embedded once; per-shard rankings are
+        merged globally before fusion (BM25 scores use per-shard statistics,
+        so lexical scores across shards are only approximately comparable).
+        """
+        keys = self.plan(filters)
+        if not keys:
+            return []
+        self.logger.info(f"Searching {len(keys)} of {len(self.manifest)} shards")
+
+        if mode != "vector":
+            docs = self._exact_documents(keys, query, k, filters)
+            if docs:
+                return docs
+
+        query_vector = None
+        if mode != "lexical":
+            query_vector = self._open(keys[0]).embed_query(query)
+        results = self._fan_out(keys, lambda key, shard: shard.scored_hits(query, k, filters, mode, query_vector=query_vector))
+        vector_hits, lexical_hits = [], []
+        for key, (shard_vector, shard_lexical) in zip(keys, results):
+            vector_hits.extend((score, (key, p)) for score, p in shard_vector)
+            lexical_hits.extend((score, (key, p)) for score, p in shard_lexical)
+        vector_hits.sort(key=lambda hit: hit[0], reverse=True)
+        lexical_hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [self._shards[key]._document_at(p) for key, p in merge_hits(vector_hits, lexical_hits, k)]
+
+    def _exact_documents(self, keys, query, k, filters):
+        per_shard = self._fan_out(keys, lambda key, shard: shard.exact_hits(query, filters))
+        exact = [(key, p) for key, hits in zip(keys, per_shard) for p in hits]
+        return [self._shards[key]._document_at(p) for key, p in exact[:k]]
+
+    def exact_documents(self, query, k=5, filters=None):
+        """
+        Same as `LogVectorStore.exact_documents`, over the shards selected by `plan`.
+        """
+        keys = self.plan(filters)
+        return self._exact_documents(keys, query, k, filters) if keys else []
+
+    def similarity_search(self, query, k=5, filters=None):
+        return self.search(query, k=k, filters=filters, mode="vector")
+
+    def trace(self, trace_id, limit=None):
+        """
+        Same as `LogVectorStore.trace`. Correlation ids carry no time, so
+        every shard is looked up (a binary search each).
+        """
+        keys = self.plan()
+        per_shard = self._fan_out(keys, lambda key, shard: shard.trace_hits(trace_id))
+        hits = sorted(
+            ((timestamp, key, p) for key, shard_hits in zip(keys, per_shard) for timestamp, p in shard_hits),
+            key=lambda hit: (hit[0] is None, hit[0] or 0),
+        )[:limit]
+        docs = [self._shards[key]._document_at(p) for _, key, p in hits]
+        return occurrence_documents(trace_id, [(timestamp, (key, p)) for timestamp, key, p in hits], docs)
@@ -0,0 +1,56 @@
+import json
+import os
+import zlib
+
+TIERS_FILENAME = "tiers.json"
+# What happens to chunks below the hot levels (INFO, DEBUG, ...):
+# embedded like the rest, a sample embedded, summarised as embedded
+# templates, or only kept in the lexical/columnar cold tier.
+INFO_TIERS = ("embed", "sample", "templates", "lexical")
+HOT_LEVELS = ("FATAL", "CRITICAL", "ERROR", "WARN", "WARNING")
+DEFAULT_SAMPLE_RATE = 0.1
+
+
+def is_tiered(index_path):
+    return os.path.exists(os.path.join(index_path, TIERS_FILENAME))
+
+
+class TierPolicy:
+    """
+    Decides which tier a chunk is indexed in; saved as `tiers.json`.
+
+    Chunks at `hot_levels` (a grouped chunk counts at its most severe level)
+    and chunks without a level are always embedded. Everything else follows
+    `info_tier`; in every mode but "embed" it is also kept in the cold tier,
+    so no entry is ever dropped.
+    """
+    def __init__(self, info_tier="embed", sample_rate=DEFAULT_SAMPLE_RATE, hot_levels=HOT_LEVELS):
+        if info_tier not in INFO_TIERS:
+            raise ValueError(f"info_tier must be one of {', '.join(INFO_TIERS)}")
+        self.info_tier = info_tier
+        self.sample_rate = sample_rate
+        self.hot_levels = tuple(hot_levels)
+
+    def is_hot(self, text, metadata):
+        level = (metadata or {}).get("level")
+        if self.info_tier == "embed" or level is None or str(level).upper() in self.hot_levels:
+            return True
+        if self.info_tier == "sample":
+            # Hash of the text (timestamp included), so repeated lines are sampled, not all-or-nothing.
+            return zlib.crc32(text.encode("utf-8")) / 2 ** 32 < self.sample_rate
+        return False
+
+    def save(self, directory):
+        path = os.path.join(directory, TIERS_FILENAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"info_tier": self.info_tier, "sample_rate": self.sample_rate, "hot_levels": list(self.hot_levels)}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, index_path):
+        path = os.path.join(index_path, TIERS_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data["info_tier"], data.get("sample_rate", DEFAULT_SAMPLE_RATE), data.get("hot_levels", HOT_LEVELS))
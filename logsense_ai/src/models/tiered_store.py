@@ -0,0 +1,307 @@
+import logging
+import os
+import shutil
+from logsense_ai.src.models.docstore import DocStore, DOCSTORE_FILENAME
+from logsense_ai.src.models.lexical_index import LexicalIndex, exact_query_terms
+from logsense_ai.src.models.metadata_index import MetadataIndex
+from logsense_ai.src.models.tier_policy import TierPolicy
+from logsense_ai.src.models.trace_index import TraceIndex, occurrence_documents
+from logsense_ai.src.models.vector_store import LogVectorStore, publish_directory, reciprocal_rank_fusion
+from logsense_ai.src.models.versions import staged_version
+from logsense_ai.src.processing.chunker import covered_entries
+from logsense_ai.src.processing.processor import LogProcessor
+from logsense_ai.src.processing.templates import TemplateMiner
+from logsense_ai.src.utils.batching import batched
+from logsense_ai.src.utils.metrics import timer
+from logsense_ai.src.utils.timeutils import to_epoch
+
+COLD_DIRNAME = "cold"
+TEMPLATES_DIRNAME = "templates"
+
+
+class ColdStore:
+    """
+    The cheap tier: chunk texts and metadata with their columnar, BM25 and
+    trace indexes, but no vectors. Positions are docstore rows. Saved in
+    `cold/` inside the index directory.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.docstore = DocStore()
+        self.metadata_index = MetadataIndex()
+        self.lexical_index = LexicalIndex()
+        self.trace_index = TraceIndex()
+
+    def __len__(self):
+        return len(self.docstore)
+
+    def add_texts(self, texts, metadatas):
+        positions = range(len(self.docstore), len(self.docstore) + len(texts))
+        with timer("store_add"):
+            self.docstore.add(texts, metadatas)
+            self.metadata_index.add(metadatas)
+            self.lexical_index.add(texts)
+            self.trace_index.add(positions, metadatas)
+
+    def save(self, directory):
+        """
+        Writes `directory/cold`, replacing any previous copy atomically.
+        """
+        path = os.path.join(directory, COLD_DIRNAME)
+        staging_path = f"{path}.tmp-{os.getpid()}"
+        with timer("save"):
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+            self.docstore.save(staging_path)
+            self.metadata_index.save(staging_path)
+            self.lexical_index.save(staging_path)
+            self.trace_index.save(staging_path)
+            publish_directory(staging_path, path)
+
+    def reopen(self, index_path):
+        """
+        Points the docstore at the published database; pending rows are now on disk.
+        """
+        self.docstore.close()
+        self.docstore = DocStore(os.path.join(index_path, COLD_DIRNAME, DOCSTORE_FILENAME))
+
+    @classmethod
+    def load(cls, index_path, mmap=False):
+        store = cls()
+        path = os.path.join(index_path, COLD_DIRNAME)
+        if not os.path.exists(os.path.join(path, DOCSTORE_FILENAME)):
+            return store
+        store.docstore = DocStore(os.path.join(path, DOCSTORE_FILENAME))
+        store.metadata_index = MetadataIndex.load(path)
+        store.lexical_index = LexicalIndex.load(path, mmap=mmap)
+        store.trace_index = TraceIndex.load(path, mmap=mmap)
+        return store
+
+    def close(self):
+        self.docstore.close()
+
+    def _filter_candidates(self, filters):
+        filters = {key: value for key, value in (filters or {}).items() if value not in (None, "", [])}
+        return self.metadata_index.candidates(**filters) if filters else None
+
+    def exact_documents(self, query, k=5, filters=None):
+        terms = exact_query_terms(query)
+        if not terms or not len(self):
+            return []
+        positions = self.lexical_index.lookup(terms, self._filter_candidates(filters))[::-1][:k]
+        return self.docstore.get_many([int(p) for p in positions])
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        BM25 ranking only; there are no vectors to search.
+        """
+        if mode == "vector" or not len(self):
+            return []
+        candidates = self._filter_candidates(filters)
+        if candidates is not None and len(candidates) == 0:
+            return []
+        positions, _ = self.lexical_index.search(query, k=k, candidates=candidates)
+        return self.docstore.get_many([int(p) for p in positions])
+
+    def trace(self, trace_id, limit=None):
+        hits = [(timestamp, position) for position, timestamp in self.trace_index.lookup(trace_id)][:limit]
+        return occurrence_documents(trace_id, hits, self.docstore.get_many([p for _, p in hits]))
+
+
+class _TemplateTier:
+    """
+    Sidecar writing `templates/`: the mined templates of cold-tier entries
+    and a small vector index with one document per template.
+    """
+    def __init__(self, miner, embeddings):
+        self.miner = miner
+        self.embeddings = embeddings
+
+    def save(self, directory):
+        if not len(self.miner):
+            return
+        path = os.path.join(directory, TEMPLATES_DIRNAME)
+        texts, metadatas = LogProcessor().template_documents(self.miner)
+        store = LogVectorStore(index_path=path, embeddings=self.embeddings)
+        store.add_texts(texts, metadatas=metadatas)
+        # May be a copy of the previous version's tier when `directory` is a clone.
+        shutil.rmtree(path, ignore_errors=True)
+        store.write(path, sidecars=[self.miner])
+        store.docstore.close()
+
+
+class TieredVectorStore:
+    """
+    Severity tiers in front of a `LogVectorStore` or `ShardedVectorStore`
+    (the hot tier), following a `TierPolicy`.
+
+    ERROR/WARN chunks are embedded into the hot index. With `info_tier`
+    "sample" a deterministic `sample_rate` share of the remaining chunks is
+    embedded too, "templates" summarises them as mined templates with their
+    own small vector index, and "lexical" embeds none of them. Chunks that
+    are not embedded live in the `ColdStore`, where identifier lookups, BM25
+    search, filters and traces still find them.
+
+    `search` asks every tier for its top `k` and fuses their rankings with
+    reciprocal rank fusion, so INFO evidence in the template and cold tiers
+    competes with hot hits instead of being reached only when the hot tier
+    runs short. Identifier lookups take exact matches in priority order
+    (hot, templates, cold). `trace` merges all tiers. Everything is saved with the hot index, so
+    tiers are always published together.
+    """
+    def __init__(self, hot, info_tier=None, sample_rate=None, hot_levels=None):
+        self.logger = logging.getLogger(__name__)
+        self.hot = hot
+        self.index_path = hot.index_path
+        self.embeddings = hot.embeddings
+        policy = TierPolicy.load(self.index_path) or TierPolicy()
+        self.policy = TierPolicy(
+            info_tier or policy.info_tier,
+            policy.sample_rate if sample_rate is None else sample_rate,
+            hot_levels or policy.hot_levels,
+        )
+        self.cold = ColdStore()
+        self.miner = TemplateMiner() if self.policy.info_tier == "templates" else None
+        self.templates = None
+        self.counts = {"hot": 0, "cold": 0}
+
+    @property
+    def empty(self):
+        return self.hot.empty and not len(self.cold)
+
+    @property
+    def read_only(self):
+        return self.hot.read_only
+
+    def add_texts(self, texts, metadatas=None):
+        """
+        Routes each chunk to its tier.
+        """
+        hot_texts, hot_metadatas, cold_texts, cold_metadatas = [], [], [], []
+        for i, text in enumerate(texts):
+            metadata = metadatas[i] if metadatas else None
+            if self.policy.is_hot(text, metadata):
+                hot_texts.append(text)
+                hot_metadatas.append(metadata or {})
+            else:
+                cold_texts.append(text)
+                cold_metadatas.append(metadata)
+        if hot_texts:
+            self.hot.add_texts(hot_texts, metadatas=hot_metadatas)
+        if cold_texts:
+            if self.read_only:
+                raise RuntimeError("Index was loaded read-only (memory-mapped); load it with read_only=False to add texts.")
+            self.cold.add_texts(cold_texts, cold_metadatas)
+            if self.miner is not None:
+                self._mine(cold_texts, cold_metadatas)
+        self.counts["hot"] += len(hot_texts)
+        self.counts["cold"] += len(cold_texts)
+
+    def _mine(self, texts, metadatas):
+        for text, metadata in zip(texts, metadatas):
+            for entry_text, entry in covered_entries(text, metadata):
+                first_line = entry_text.split("\n", 1)[0]
+                log = {key: entry.get(key) for key in ("service", "level", "timestamp") if entry.get(key) is not None}
+                log["message"] = first_line.partition("]: ")[2] or first_line
+                self.miner.add(log, example=first_line)
+
+    def add_texts_batched(self, texts, batch_size=512, metadatas=None):
+        if metadatas is None:
+            return self.add_documents_batched(((text, None) for text in texts), batch_size=batch_size)
+        return self.add_documents_batched(zip(texts, metadatas), batch_size=batch_size)
+
+    def add_documents_batched(self, documents, batch_size=512):
+        total = 0
+        for batch in batched(documents, batch_size):
+            self.add_texts([text for text, _ in batch], metadatas=[metadata for _, metadata in batch])
+            total += len(batch)
+        return total
+
+    def reset(self):
+        self.hot.reset()
+        self.cold.close()
+        self.cold = ColdStore()
+        self.miner = TemplateMiner() if self.policy.info_tier == "templates" else None
+        self.templates = None
+
+    def close(self):
+        self.hot.close()
+        self.cold.close()
+        if self.templates is not None:
+            self.templates.docstore.close()
+
+    def load(self, read_only=False):
+        """
+        Loads every tier (memory-mapped if `read_only`) from the version the
+        hot tier pinned.
+        """
+        self.hot.load(read_only=read_only)
+        directory = self.hot.version.acquire(self.index_path)
+        self.cold.close()
+        self.cold = ColdStore.load(directory, mmap=read_only)
+        templates_path = os.path.join(directory, TEMPLATES_DIRNAME)
+        self.templates = None
+        if os.path.exists(templates_path):
+            self.templates = LogVectorStore(index_path=templates_path, embeddings=self.embeddings)
+            self.templates.load(read_only=read_only)
+        if self.policy.info_tier == "templates":
+            self.miner = TemplateMiner.load(templates_path) or TemplateMiner()
+        self.logger.info(f"Tiered index: {len(self.cold)} cold chunks, "
+                         f"{'no' if self.templates is None else len(self.templates.docstore)} templates "
+                         f"(INFO tier: {self.policy.info_tier})")
+
+    def save(self, sidecars=None):
+        """
+        Saves the hot index with the cold tier, templates and policy as sidecars.
+        """
+        sidecars = [self.policy, self.cold] + ([_TemplateTier(self.miner, self.embeddings)] if self.miner else []) + list(sidecars or [])
+        if self.hot.empty:
+            if not len(self.cold):
+                self.logger.warning("No vector store to save.")
+                return
+            # Nothing was embedded; publish the other tiers on their own.
+            with staged_version(self.index_path) as staging_path:
+                for sidecar in sidecars:
+                    sidecar.save(staging_path)
+        else:
+            self.hot.save(sidecars=sidecars)
+        self.cold.reopen(self.hot.version.acquire(self.index_path))
+        self.logger.info(f"Tiered index saved: {self.counts['hot']} chunks embedded, {self.counts['cold']} kept "
+                         f"in the cold tier (INFO tier: {self.policy.info_tier})")
+
+    def _tiers(self):
+        tiers = [self.hot] if not self.hot.empty else []
+        if self.templates is not None and not self.templates.empty:
+            tiers.append(self.templates)
+        return tiers + [self.cold]
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Same contract as `LogVectorStore.search`. Exact identifier matches
+        fill up in tier order; otherwise the tiers' rankings are fused (RRF),
+        ties going to the higher tier.
+        """
+        docs = []
+        if mode != "vector":
+            for store in self._tiers():
+                docs += store.exact_documents(query, k - len(docs), filters)
+                if len(docs) >= k:
+                    break
+            if docs:
+                return docs
+        # Tiers share the embedder, whose query cache embeds the query once.
+        rankings = [store.search(query, k, filters, mode) for store in self._tiers()]
+        fused = reciprocal_rank_fusion([[(tier, rank) for rank in range(len(docs))] for tier, docs in enumerate(rankings)])
+        return [rankings[tier][rank] for tier, rank in fused[:k]]
+
+    def similarity_search(self, query, k=5, filters=None):
+        return self.search(query, k=k, filters=filters, mode="vector")
+
+    def trace(self, trace_id, limit=None):
+        """
+        Same as `LogVectorStore.trace`, across the hot and cold tiers.
+        """
+        docs = (self.hot.trace(trace_id, limit=limit) if not self.hot.empty else []) + self.cold.trace(trace_id, limit=limit)
+        epochs = [to_epoch(doc.metadata.get("timestamp")) for doc in docs]
+        order = sorted(range(len(docs)), key=lambda i: (epochs[i] is None, epochs[i] or 0))
+        return [docs[i] for i in order][:limit]
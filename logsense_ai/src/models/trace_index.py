@@ -0,0 +1,167 @@
+import logging
+import math
+import os
+import re
+from array import array
+from datetime import datetime
+import numpy as np
+from langchain_core.documents import Document
+from logsense_ai.src.processing.chunker import covered_entries
+from logsense_ai.src.utils.timeutils import to_epoch
+
+TRACES_DIRNAME = "traces"
+TRACE_FIELD = "correlation_id"
+_LEADING_TIMESTAMP = re.compile(r"^\[[0-9T:\-\.\+Z ]+\]")
+
+
+class TraceIndex:
+    """
+    Correlation-id -> entry index, aligned with FAISS vector positions.
+
+    Every ingested chunk carrying a `correlation_id` records a (position,
+    timestamp) pair under that id, including chunks merged into an existing
+    document by de-duplication; a grouped chunk is recorded once per entry
+    it covers, under that entry's id. So a request's whole journey across services
+    can be rebuilt without a vector search. On disk the ids are one sorted
+    fixed-width array with CSR offsets into the position/timestamp arrays;
+    a lookup is a binary search over memory-mapped files.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        # Saved pairs, grouped by id (sorted), then by timestamp.
+        self._ids = np.empty(0, dtype="S1")
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._positions = np.empty(0, dtype=np.int64)
+        self._timestamps = np.empty(0, dtype=np.float64)
+        # Pairs added since load: id -> (array of positions, array of timestamps)
+        self._fresh = {}
+
+    def __len__(self):
+        return len(self._positions) + sum(len(positions) for positions, _ in self._fresh.values())
+
+    def add(self, positions, metadatas):
+        """
+        Records the entry (or entries) at `positions[i]` under the correlation id(s) of `metadatas[i]`.
+        """
+        for position, metadata in zip(positions, metadatas or []):
+            metadata = metadata or {}
+            trace_ids = metadata.get("entry_correlation_ids")
+            if trace_ids:
+                timestamps = metadata.get("entry_timestamps") or [None] * len(trace_ids)
+                pairs = [(trace_id, timestamp) for trace_id, timestamp in zip(trace_ids, timestamps) if trace_id]
+            elif metadata.get(TRACE_FIELD):
+                pairs = [(metadata[TRACE_FIELD], metadata.get("timestamp"))]
+            else:
+                continue
+            for trace_id, timestamp in pairs:
+                timestamp = to_epoch(timestamp)
+                trace_positions, trace_timestamps = self._fresh.setdefault(str(trace_id), (array("q"), array("d")))
+                trace_positions.append(position)
+                trace_timestamps.append(math.nan if timestamp is None else timestamp)
+
+    def _stored(self, trace_id):
+        key = trace_id.encode("utf-8")
+        i = int(np.searchsorted(self._ids, key))
+        if i >= len(self._ids) or self._ids[i] != key:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return np.asarray(self._positions[start:end]), np.asarray(self._timestamps[start:end])
+
+    def lookup(self, trace_id):
+        """
+        Returns [(position, timestamp)] for `trace_id` in time order (entries
+        without a timestamp last). Timestamps are POSIX seconds or None.
+        """
+        positions, timestamps = self._stored(trace_id)
+        fresh = self._fresh.get(trace_id)
+        if fresh is not None:
+            positions = np.concatenate([positions, np.frombuffer(fresh[0], dtype=np.int64)])
+            timestamps = np.concatenate([timestamps, np.frombuffer(fresh[1], dtype=np.float64)])
+        order = np.lexsort((positions, np.nan_to_num(timestamps, nan=np.inf)))
+        return [(int(positions[i]), None if math.isnan(timestamps[i]) else float(timestamps[i])) for i in order]
+
+    def save(self, directory):
+        """
+        Writes the ids, CSR offsets, positions and timestamps as .npy arrays.
+        """
+        path = os.path.join(directory, TRACES_DIRNAME)
+        os.makedirs(path, exist_ok=True)
+        stored_ids = [trace_id.decode("utf-8") for trace_id in self._ids]
+        ids = np.repeat(np.arange(len(stored_ids), dtype=np.int64), np.diff(self._offsets))
+        positions, timestamps = [np.asarray(self._positions)], [np.asarray(self._timestamps)]
+        names = {trace_id: i for i, trace_id in enumerate(stored_ids)}
+        all_ids = [ids]
+        for trace_id, (trace_positions, trace_timestamps) in self._fresh.items():
+            code = names.setdefault(trace_id, len(names))
+            all_ids.append(np.full(len(trace_positions), code, dtype=np.int64))
+            positions.append(np.frombuffer(trace_positions, dtype=np.int64))
+            timestamps.append(np.frombuffer(trace_timestamps, dtype=np.float64))
+        names = list(names)
+        ids, positions, timestamps = np.concatenate(all_ids), np.concatenate(positions), np.concatenate(timestamps)
+
+        # Sort ids as strings, then each id's entries by time.
+        rank = np.empty(len(names), dtype=np.int64)
+        rank[sorted(range(len(names)), key=names.__getitem__)] = np.arange(len(names))
+        order = np.lexsort((positions, np.nan_to_num(timestamps, nan=np.inf), rank[ids]))
+        counts = np.bincount(rank[ids], minlength=len(names))
+        sorted_names = sorted(names)
+        np.save(os.path.join(path, "ids.npy"), np.array([name.encode("utf-8") for name in sorted_names], dtype=np.bytes_)
+                if sorted_names else np.empty(0, dtype="S1"))
+        np.save(os.path.join(path, "offsets.npy"), np.concatenate([[0], np.cumsum(counts)]).astype(np.int64))
+        np.save(os.path.join(path, "positions.npy"), positions[order].astype(np.int64))
+        np.save(os.path.join(path, "timestamps.npy"), timestamps[order].astype(np.float64))
+
+    @classmethod
+    def load(cls, directory, mmap=False):
+        """
+        Loads a saved index, or returns an empty one if none exists (e.g. an
+        index built before correlation ids were recorded). `mmap=True` maps
+        the arrays instead of reading them.
+        """
+        index = cls()
+        path = os.path.join(directory, TRACES_DIRNAME)
+        if not os.path.exists(os.path.join(path, "offsets.npy")):
+            return index
+        mmap_mode = "r" if mmap else None
+        index._ids = np.load(os.path.join(path, "ids.npy"), mmap_mode=mmap_mode)
+        index._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mmap_mode)
+        index._positions = np.load(os.path.join(path, "positions.npy"), mmap_mode=mmap_mode)
+        index._timestamps = np.load(os.path.join(path, "timestamps.npy"), mmap_mode=mmap_mode)
+        return index
+
+
+def occurrence_document(doc, trace_id, timestamp, occurrence=0):
+    """
+    `doc` as it occurred in trace `trace_id` at `timestamp`: a grouped chunk
+    is cut down to the trace's `occurrence`-th entry in it, and since
+    de-duplicated documents carry the text and timestamp of their first
+    occurrence, the leading timestamp is rewritten when this occurrence is
+    a later one.
+    """
+    text, metadata = doc.page_content, dict(doc.metadata)
+    if metadata.get("entry_offsets"):
+        entries = [(text, metadata) for text, metadata in covered_entries(doc.page_content, doc.metadata)
+                   if metadata.get(TRACE_FIELD) == trace_id]
+        if entries:
+            text, metadata = entries[min(occurrence, len(entries) - 1)]
+    metadata[TRACE_FIELD] = trace_id
+    if timestamp is not None and to_epoch(metadata.get("timestamp")) != timestamp:
+        stamp = datetime.fromtimestamp(timestamp).isoformat()
+        metadata["timestamp"] = stamp
+        text = _LEADING_TIMESTAMP.sub(f"[{stamp}]", text, count=1)
+    return Document(page_content=text, metadata=metadata)
+
+
+def occurrence_documents(trace_id, hits, docs):
+    """
+    `occurrence_document` for each of `hits` [(timestamp, key)] (in time
+    order) and the `docs` they point at; hits sharing a key are a grouped
+    chunk's successive entries.
+    """
+    seen = {}
+    documents = []
+    for (timestamp, key), doc in zip(hits, docs):
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        documents.append(occurrence_document(doc, trace_id, timestamp, occurrence))
+    return documents
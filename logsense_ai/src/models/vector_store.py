@@ -1,19 +1,137 @@
 import os
 import logging
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import shutil
+import faiss
+import numpy as np
+from logsense_ai.src.models.embedder import BatchEmbedder, DEFAULT_MODEL_NAME
+from logsense_ai.src.models.embedding_cache import EmbeddingCache, content_hash
+from logsense_ai.src.models.metadata_index import MetadataIndex
+from logsense_ai.src.models.docstore import DocStore, DOCSTORE_FILENAME
+from logsense_ai.src.models.lexical_index import LexicalIndex, exact_query_terms
+from logsense_ai.src.models.trace_index import TraceIndex, occurrence_documents
+from logsense_ai.src.models.versions import VersionPin, staged_version
+from logsense_ai.src.models.ann_index import (
+    EXACT_CANDIDATE_LIMIT, build_index, exact_search, index_type_of, prepare_index, resolve_index_type, search_parameters,
+)
+from logsense_ai.src.utils.batching import batched
+from logsense_ai.src.utils.metrics import timer
+from logsense_ai.src.utils.timeutils import to_epoch
+
+INDEX_FILENAME = "index.faiss"
+# Docstore of indexes written before the SQLite docstore; never unpickled.
+LEGACY_DOCSTORE_FILENAME = "index.pkl"
+RRF_K = 60
+
+
+def publish_directory(staging_path, target_path):
+    """
+    Replaces directory `target_path` with `staging_path` using renames, so
+    readers see either the old or the new contents, never a mix. Whole
+    indexes are published as versions instead (see `versions`); this swaps
+    parts of one, e.g. the cold tier inside a staging directory.
+    """
+    retired_path = None
+    if os.path.exists(target_path):
+        retired_path = f"{target_path}.old-{os.getpid()}"
+        shutil.rmtree(retired_path, ignore_errors=True)
+        os.rename(target_path, retired_path)
+    os.rename(staging_path, target_path)
+    if retired_path:
+        shutil.rmtree(retired_path, ignore_errors=True)
+
+
+def widen_time_range(metadata, other):
+    """
+    Extends `metadata`'s `first_seen`/`last_seen` to cover the time range of
+    `other` (a repeat of the same chunk). Returns the new range in POSIX seconds.
+    """
+    bounds = []
+    for key, pick in (("first_seen", min), ("last_seen", max)):
+        values = [value for value in (metadata.get(key) or metadata.get("timestamp"), other.get(key) or other.get("timestamp"))
+                  if to_epoch(value) is not None]
+        value = pick(values, key=to_epoch) if values else None
+        if value is not None:
+            metadata[key] = value
+        bounds.append(to_epoch(value))
+    return bounds
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuses several best-first lists of positions: score = sum(1 / (k + rank)).
+    Returns positions ordered by fused score.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            scores[position] = scores.get(position, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def merge_hits(vector_hits, lexical_hits, k):
+    """
+    Combines best-first (score, key) lists from vector and BM25 retrieval:
+    a single non-empty list is used as is, two are fused with RRF.
+    Keys may be positions or, across shards, (shard, position) pairs.
+    """
+    if not lexical_hits:
+        return [key for _, key in vector_hits[:k]]
+    if not vector_hits:
+        return [key for _, key in lexical_hits[:k]]
+    return reciprocal_rank_fusion([[key for _, key in vector_hits], [key for _, key in lexical_hits]])[:k]
 
 class LogVectorStore:
     """
     Manages embedding generation and vector storage using FAISS.
     Uses HuggingFace (Local) embeddings to avoid OpenAI costs.
+
+    On disk an index is `index.faiss` plus a SQLite `DocStore` holding chunk
+    texts and metadata by FAISS position. `load(read_only=True)` memory-maps
+    the vectors and fetches documents only for hits, so opening even a large
+    index is near-instant and nothing is unpickled.
+
+    Optional `embedding_cache_path` enables a persistent embedding cache, and
+    `dedupe=True` stores each distinct chunk once, counting repeats in its
+    `occurrences` metadata instead of adding identical vectors.
+
+    Chunk metadata (service, level, timestamp, ...) is also recorded in a
+    columnar `MetadataIndex` saved alongside the vectors, which lets
+    `similarity_search(filters=...)` restrict the candidate set before scoring.
+    A BM25 `LexicalIndex` over the same chunks backs hybrid retrieval (`search`),
+    and a `TraceIndex` maps correlation ids to their entries (`trace`).
+
+    `index_type` ("auto", "flat", "hnsw", "ivf_flat", "ivf_pq") selects the
+    FAISS structure; vectors are collected in a flat index and converted when
+    the index is saved. `nprobe` / `ef_search` tune IVF / HNSW queries.
+
+    `embeddings` lets several stores (e.g. time shards) share one embedder.
     """
-    def __init__(self, index_path="logsense_ai/data/processed/faiss_index"):
+    def __init__(self, index_path="logsense_ai/data/processed/faiss_index", embedding_batch_size=64, embedding_workers=1,
+                 embedding_cache_path=None, cache_max_entries=1_000_000, dedupe=False,
+                 index_type="auto", nprobe=None, ef_search=None, train_size=100_000, embeddings=None):
         self.logger = logging.getLogger(__name__)
         self.index_path = index_path
-        # Use a lightweight local model
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.vector_store = None
+        self.dedupe = dedupe
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.train_size = train_size
+        if embeddings is None:
+            cache = EmbeddingCache(embedding_cache_path, DEFAULT_MODEL_NAME, max_entries=cache_max_entries) if embedding_cache_path else None
+            # Use a lightweight local model, batched and optionally multi-process
+            embeddings = BatchEmbedder(batch_size=embedding_batch_size, workers=embedding_workers, cache=cache)
+        self.embeddings = embeddings
+        self.index = None
+        self.docstore = DocStore()
+        self.metadata_index = MetadataIndex()
+        self.lexical_index = LexicalIndex()
+        self.trace_index = TraceIndex()
+        self.read_only = False
+        self.version = VersionPin()
+
+    @property
+    def empty(self):
+        return self.index is None
 
     def add_texts(self, texts, metadatas=None):
         """
@@ -22,48 +140,364 @@ class LogVectorStore:
         if not texts:
             self.logger.warning("No texts provided to add_texts.")
             return
+        if self.read_only:
+            raise RuntimeError("Index was loaded read-only (memory-mapped); load it with read_only=False to add texts.")
+
+        entry_metadatas = metadatas
+        if self.dedupe:
+            texts, metadatas, positions = self._merge_duplicates(texts, metadatas)
+            if not texts:
+                self.trace_index.add(positions, entry_metadatas)
+                self.logger.info("All chunks were duplicates; updated occurrence counts only.")
+                return
+        else:
+            positions = range(len(self.docstore), len(self.docstore) + len(texts))
 
         self.logger.info(f"Adding {len(texts)} chunks to vector store...")
         try:
-            if self.vector_store is None:
-                # Initialize new store
-                self.vector_store = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas)
-            else:
-                self.vector_store.add_texts(texts, metadatas=metadatas)
+            vectors = self.embeddings.encode(texts)
+            with timer("faiss_add"):
+                if self.index is None:
+                    # Initialize new store
+                    self.index = faiss.IndexFlatL2(vectors.shape[1])
+                self.index.add(vectors)
+            with timer("store_add"):
+                self.docstore.add(texts, metadatas)
+                self.metadata_index.add(metadatas or [{}] * len(texts))
+                self.lexical_index.add(texts)
+                self.trace_index.add(positions, entry_metadatas)
             self.logger.info("Successfully added texts to FAISS.")
         except Exception as e:
             self.logger.error(f"Error adding texts to vector store: {e}")
             raise
 
-    def save(self):
+    def _merge_duplicates(self, texts, metadatas):
+        """
+        Drops chunks whose normalised content is already indexed (or repeated
+        within this batch), bumping the stored document's occurrence count and
+        widening its first/last seen time range (in the docstore and the
+        metadata index), so time filters find a chunk by its latest repeat.
+        Returns the remaining (texts, metadatas) and the position each input
+        chunk ends up at.
+        """
+        base = len(self.docstore)
+        keys = [content_hash(text) for text in texts]
+        stored = self.docstore.find_hashes(list(set(keys)))
+        new_texts, new_metadatas = [], []
+        pending = {}
+        repeats = {}
+        for i, (text, key) in enumerate(zip(texts, keys)):
+            if key in stored:
+                repeats.setdefault(key, []).append(metadatas[i] if metadatas else {})
+                continue
+            if key in pending:
+                new_metadatas[pending[key]]["occurrences"] += 1
+                if metadatas:
+                    widen_time_range(new_metadatas[pending[key]], metadatas[i] or {})
+                continue
+            metadata = dict(metadatas[i]) if metadatas else {}
+            metadata["content_hash"] = key
+            metadata["occurrences"] = 1
+            pending[key] = len(new_texts)
+            new_texts.append(text)
+            new_metadatas.append(metadata)
+
+        positions = [stored[key] for key in repeats]
+        for key, position, doc in zip(repeats, positions, self.docstore.get_many(positions)):
+            doc.metadata["occurrences"] = doc.metadata.get("occurrences", 1) + len(repeats[key])
+            for metadata in repeats[key]:
+                start, end = widen_time_range(doc.metadata, metadata or {})
+                self.metadata_index.widen(position, start, end)
+            self.docstore.update_metadata(position, doc.metadata)
+        positions = [stored[key] if key in stored else base + pending[key] for key in keys]
+        return new_texts, new_metadatas, positions
+
+    def add_texts_batched(self, texts, batch_size=512, metadatas=None):
+        """
+        Embeds an iterable (e.g. a generator of chunks) in batches of `batch_size`,
+        so only one batch of texts is held in memory at a time. `metadatas`, if
+        given, is an iterable aligned with `texts`.
+        Returns the number of texts added.
+        """
+        if metadatas is None:
+            return self.add_documents_batched(((text, None) for text in texts), batch_size=batch_size)
+        return self.add_documents_batched(zip(texts, metadatas), batch_size=batch_size)
+
+    def add_documents_batched(self, documents, batch_size=512):
+        """
+        Same as `add_texts_batched` for an iterable of (text, metadata) pairs,
+        e.g. `LogProcessor.iter_documents`.
+        """
+        total = 0
+        for batch in batched(documents, batch_size):
+            batch_texts = [text for text, _ in batch]
+            batch_metadatas = [metadata for _, metadata in batch]
+            if all(metadata is None for metadata in batch_metadatas):
+                batch_metadatas = None
+            self.add_texts(batch_texts, metadatas=batch_metadatas)
+            total += len(batch)
+        return total
+
+    def reset(self):
+        """
+        Discards the in-memory index so the next `add_texts` starts a fresh one.
+        """
+        self.index = None
+        self.docstore.close()
+        self.docstore = DocStore()
+        self.metadata_index = MetadataIndex()
+        self.lexical_index = LexicalIndex()
+        self.trace_index = TraceIndex()
+        self.read_only = False
+
+    def close(self):
+        """
+        Releases embedding worker processes, the embedding cache and the docstore.
+        """
+        self.embeddings.close()
+        self.docstore.close()
+
+    def save(self, sidecars=None):
         """
         Persists the FAISS index to disk.
+
+        The index is written to a staging directory together with any
+        `sidecars` (objects with a `save(directory)` method, e.g. ingestion
+        checkpoints) and published as a new version of `index_path` (see
+        `versions.publish_version`), so readers never load a half-written
+        index and sidecars always match the vectors they describe.
         """
-        if self.vector_store:
-            self.vector_store.save_local(self.index_path)
-            self.logger.info(f"FAISS index saved to {self.index_path}")
-        else:
+        if self.index is None:
             self.logger.warning("No vector store to save.")
+            return
+        if self.read_only:
+            raise RuntimeError("Index was loaded read-only (memory-mapped) and cannot be saved.")
+
+        with timer("save"):
+            with staged_version(self.index_path) as staging_path:
+                self.write(staging_path, sidecars=sidecars)
+            self._reopen_docstore()
+        self.logger.info(f"FAISS index saved to {self.index_path}")
+
+    def write(self, directory, sidecars=None):
+        """
+        Writes the index and `sidecars` into `directory`, which must not hold
+        an older copy. Time shards and the template tier are written straight
+        into their parent index's staging directory this way.
+        """
+        with timer("index_convert"):
+            self._convert_index()
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(directory, INDEX_FILENAME))
+        self.docstore.save(directory)
+        self.metadata_index.save(directory)
+        self.lexical_index.save(directory)
+        self.trace_index.save(directory)
+        for sidecar in sidecars or []:
+            sidecar.save(directory)
+
+    def _reopen_docstore(self):
+        """
+        Points the docstore at the published database; pending rows are now on disk.
+        """
+        self.docstore.close()
+        self.docstore = DocStore(os.path.join(self.version.acquire(self.index_path), DOCSTORE_FILENAME))
 
-    def load(self):
+    def _convert_index(self):
+        """
+        Rebuilds the FAISS index as the configured type if it differs, e.g.
+        when a flat index outgrows its "auto" tier. Positions are preserved.
+        """
+        index = self.index
+        current = index_type_of(index)
+        wanted = resolve_index_type(self.index_type, index.ntotal)
+        if wanted == current:
+            return
+        self.logger.info(f"Converting {current} index with {index.ntotal} vectors to {wanted}...")
+        vectors = index.reconstruct_n(0, index.ntotal)
+        new_index = build_index(vectors, index_type=wanted, train_size=self.train_size)
+        self.index = prepare_index(new_index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    def load(self, read_only=False):
         """
         Loads the FAISS index from disk.
+
+        With `read_only=True` the vectors are memory-mapped in place (no copy,
+        page cache shared between processes); such an index cannot be added
+        to or saved. The version loaded stays pinned (see `VersionPin`) while
+        newer ones are published.
         """
-        if os.path.exists(self.index_path):
-            try:
-                self.vector_store = FAISS.load_local(self.index_path, self.embeddings, allow_dangerous_deserialization=True)
-                self.logger.info(f"FAISS index loaded from {self.index_path}")
-            except Exception as e:
-                self.logger.error(f"Error loading FAISS index: {e}")
-        else:
+        directory = self.version.acquire(self.index_path)
+        index_file = os.path.join(directory, INDEX_FILENAME)
+        if not os.path.exists(index_file):
             self.logger.warning(f"Index path {self.index_path} does not exist. Starting fresh.")
+            return
+        if not os.path.exists(os.path.join(directory, DOCSTORE_FILENAME)):
+            if os.path.exists(os.path.join(directory, LEGACY_DOCSTORE_FILENAME)):
+                self.logger.warning(f"Index at {self.index_path} uses the old pickle format, which is no longer loaded. "
+                                    "Rebuild it by running the pipeline without --incremental.")
+            else:
+                self.logger.error(f"Index at {self.index_path} has no docstore. Starting fresh.")
+            return
+        try:
+            index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP_IFC if read_only else 0)
+            docstore = DocStore(os.path.join(directory, DOCSTORE_FILENAME))
+            if len(docstore) != index.ntotal:
+                docstore.close()
+                raise ValueError(f"docstore has {len(docstore)} documents for {index.ntotal} vectors")
+            self.docstore.close()
+            self.index = prepare_index(index, nprobe=self.nprobe, ef_search=self.ef_search)
+            self.docstore = docstore
+            self.metadata_index = MetadataIndex.load(directory)
+            self.lexical_index = LexicalIndex.load(directory, mmap=read_only)
+            self.trace_index = TraceIndex.load(directory, mmap=read_only)
+            self.read_only = read_only
+            version = f" (version {self.version.version})" if self.version.version else ""
+            self.logger.info(f"FAISS index loaded from {self.index_path}{version}")
+        except Exception as e:
+            self.logger.error(f"Error loading FAISS index: {e}")
     
-    def similarity_search(self, query, k=5):
+    def _filter_candidates(self, filters):
+        """
+        Resolves `filters` to FAISS positions. Returns None when nothing needs
+        filtering or this index has no usable metadata (e.g. it was built
+        before metadata was recorded).
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value not in (None, "", [])}
+        if not filters:
+            return None
+        if len(self.metadata_index) != self.index.ntotal:
+            self.logger.warning("Index has no metadata for filtering; rebuild it to enable filters. Ignoring filters.")
+            return None
+        return self.metadata_index.candidates(**filters)
+
+    def _document_at(self, position):
+        return self.docstore.get(position)
+
+    def embed_query(self, query):
+        return np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+
+    def _vector_hits(self, query_vector, k, candidates=None):
+        """
+        Best-first (distance, position) pairs for `query_vector`, restricted
+        to `candidates` if given.
+        """
+        index = self.index
+        limit = min(k, index.ntotal if candidates is None else len(candidates))
+        if limit <= 0:
+            return []
+        if candidates is None:
+            distances, positions = index.search(query_vector, limit)
+        elif index_type_of(index) != "flat" and len(candidates) <= EXACT_CANDIDATE_LIMIT:
+            # Graph/list traversal can miss most of a small candidate set; score it exactly.
+            distances, positions = exact_search(index, query_vector, candidates, limit)
+        else:
+            params = search_parameters(index, faiss.IDSelectorBatch(candidates))
+            distances, positions = index.search(query_vector, limit, params=params)
+        return [(float(d), int(p)) for d, p in zip(distances[0], positions[0]) if p >= 0]
+
+    def similarity_search(self, query, k=5, filters=None):
         """
         Performs semantic search.
+
+        `filters` may contain `service`, `level` (value or list), `since` and
+        `until` (POSIX seconds). They are applied before vector scoring, so the
+        top-k is taken only among matching chunks.
         """
-        if not self.vector_store:
+        if self.index is None:
             self.logger.warning("Vector store not initialized. Returning empty results.")
             return []
-        
-        return self.vector_store.similarity_search(query, k=k)
+
+        candidates = self._filter_candidates(filters)
+        if candidates is not None and len(candidates) == 0:
+            return []
+        hits = self._vector_hits(self.embed_query(query), k, candidates)
+        return self.docstore.get_many([p for _, p in hits])
+
+    def _has_lexical(self):
+        if len(self.lexical_index) == self.index.ntotal:
+            return True
+        self.logger.warning("Index has no lexical data; rebuild it to enable hybrid search. Using vector search.")
+        return False
+
+    def exact_hits(self, query, filters=None):
+        """
+        For identifier-style queries (ids, error codes, exception names),
+        positions of chunks containing every query token, newest first.
+        Returns an empty list for free-text queries; never embeds anything.
+        """
+        terms = exact_query_terms(query)
+        if not terms or self.index is None or not self._has_lexical():
+            return []
+        candidates = self._filter_candidates(filters)
+        return [int(p) for p in self.lexical_index.lookup(terms, candidates)[::-1]]
+
+    def scored_hits(self, query, k=5, filters=None, mode="hybrid", query_vector=None):
+        """
+        Ranked candidates behind `search`: (vector_hits, lexical_hits), each a
+        best-first list of (score, position) where higher is better (vector
+        scores are negated L2 distances). Lists not needed for `mode` are empty.
+        `query_vector` avoids re-embedding the query when searching several stores.
+        """
+        if self.index is None:
+            return [], []
+        candidates = self._filter_candidates(filters)
+        if candidates is not None and len(candidates) == 0:
+            return [], []
+        use_lexical = mode != "vector" and self._has_lexical()
+        use_vector = mode != "lexical" or not use_lexical
+        fetch_k = max(k * 4, 20) if use_lexical and use_vector else k
+
+        vector_hits, lexical_hits = [], []
+        if use_vector:
+            if query_vector is None:
+                query_vector = self.embed_query(query)
+            vector_hits = [(-distance, p) for distance, p in self._vector_hits(query_vector, fetch_k, candidates)]
+        if use_lexical:
+            positions, scores = self.lexical_index.search(query, k=fetch_k, candidates=candidates)
+            lexical_hits = [(float(score), int(p)) for score, p in zip(scores, positions)]
+        return vector_hits, lexical_hits
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
+        """
+        Retrieval entry point combining lexical and semantic search.
+
+        - Identifier-style queries (ids, error codes, exception names) are
+          answered straight from the inverted index, newest first, without
+          running the embedding model.
+        - `mode="hybrid"` fuses BM25 and vector rankings with reciprocal rank
+          fusion; `"vector"` and `"lexical"` use a single ranking.
+        """
+        if self.index is None:
+            self.logger.warning("Vector store not initialized. Returning empty results.")
+            return []
+
+        if mode != "vector":
+            docs = self.exact_documents(query, k, filters)
+            if docs:
+                return docs
+        vector_hits, lexical_hits = self.scored_hits(query, k, filters, mode)
+        return self.docstore.get_many(merge_hits(vector_hits, lexical_hits, k))
+
+    def exact_documents(self, query, k=5, filters=None):
+        """
+        The first `k` documents of `exact_hits`.
+        """
+        return self.docstore.get_many(self.exact_hits(query, filters)[:k])
+
+    def trace_hits(self, trace_id):
+        """
+        (timestamp, position) of every entry logged under correlation id
+        `trace_id`, in time order. Never embeds anything.
+        """
+        if self.index is None:
+            return []
+        return [(timestamp, position) for position, timestamp in self.trace_index.lookup(trace_id)]
+
+    def trace(self, trace_id, limit=None):
+        """
+        The entries of one request across all services, oldest first.
+        """
+        hits = self.trace_hits(trace_id)[:limit]
+        docs = self.docstore.get_many([p for _, p in hits])
+        return occurrence_documents(trace_id, hits, docs)
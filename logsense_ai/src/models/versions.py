@@ -0,0 +1,298 @@
+import fcntl
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+VERSIONS_SUFFIX = ".versions"
+LOCK_SUFFIX = ".lock"
+# Present in every published version; readers hold a shared flock on it.
+LEASE_FILENAME = ".lease"
+STAGING_PREFIX = ".staging-"
+# Published versions kept (newest first) besides any a reader still pins.
+DEFAULT_KEEP_VERSIONS = 2
+_VERSION_NAME = re.compile(r"^v(\d+)$")
+# Attempts to pin the current version while it is being swapped or collected.
+_PIN_ATTEMPTS = 5
+
+# Writer locks held by this process: lock file -> [open file, depth].
+_held_locks = {}
+_held_locks_lock = threading.Lock()
+
+
+class IndexLockedError(RuntimeError):
+    """
+    Another process is writing the index.
+    """
+
+
+def versions_dir(index_path):
+    """
+    Directory holding the published versions of the index at `index_path`.
+    """
+    return os.path.normpath(index_path) + VERSIONS_SUFFIX
+
+
+def current_version(index_path):
+    """
+    Name of the version `index_path` points at (e.g. "v000042"), or None if
+    there is no index or it is an unversioned directory.
+    """
+    try:
+        return os.path.basename(os.readlink(os.path.normpath(index_path)))
+    except OSError:
+        return None
+
+
+def _version_names(directory):
+    """
+    Published version names in `directory`, oldest first.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted((name for name in names if _VERSION_NAME.match(name)), key=lambda name: int(name[1:]))
+
+
+def _next_version_name(directory):
+    names = _version_names(directory)
+    return f"v{int(names[-1][1:]) + 1 if names else 1:06d}"
+
+
+class WriterLock:
+    """
+    Exclusive lock (`fcntl.flock` on `<index_path>.lock`) held by whoever
+    writes the index, from loading it to publishing the result, so two
+    writers never build on the same version and overwrite each other.
+
+    Re-entrant within a process: the pipeline holds it for the whole run and
+    each save takes it again. Another process holding it makes `acquire`
+    wait up to `timeout` seconds, then raise `IndexLockedError`.
+    """
+    def __init__(self, index_path, timeout=0.0, poll_interval=0.1):
+        self.index_path = index_path
+        self.path = os.path.abspath(os.path.normpath(index_path) + LOCK_SUFFIX)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    def acquire(self):
+        with _held_locks_lock:
+            held = _held_locks.get(self.path)
+            if held is not None:
+                held[1] += 1
+                return self
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            f = open(self.path, "a+")
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        f.seek(0)
+                        owner = f.read().strip()
+                        f.close()
+                        raise IndexLockedError(f"Index {self.index_path} is being written by another process"
+                                               f"{f' (pid {owner})' if owner else ''}")
+                    time.sleep(self.poll_interval)
+            # The owner's pid, for the error message of anyone who has to wait.
+            f.seek(0)
+            f.truncate()
+            f.write(str(os.getpid()))
+            f.flush()
+            _held_locks[self.path] = [f, 1]
+        return self
+
+    def release(self):
+        with _held_locks_lock:
+            held = _held_locks.get(self.path)
+            if held is None:
+                return
+            held[1] -= 1
+            if held[1] == 0:
+                del _held_locks[self.path]
+                held[0].truncate(0)
+                fcntl.flock(held[0], fcntl.LOCK_UN)
+                held[0].close()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class VersionPin:
+    """
+    A reader's hold on one published version of an index. `acquire(index_path)`
+    resolves the version `index_path` currently points at and takes a shared
+    lease on it, so `gc_versions` keeps its files (including shards a reader
+    opens lazily, long after loading) until the pin moves on or is released,
+    however many versions are published meanwhile. The lease is dropped with
+    the pin, so a store that is replaced mid-query keeps its version until
+    the last search using it finishes.
+
+    Unversioned paths (older indexes, directories inside an index) pin
+    nothing and resolve to themselves.
+    """
+    def __init__(self):
+        self.path = None
+        self.version = None
+        self._lease = None
+
+    def acquire(self, index_path):
+        """
+        Pins the current version of `index_path` (releasing the previous pin)
+        and returns the directory to read it from.
+        """
+        for _ in range(_PIN_ATTEMPTS):
+            if not os.path.islink(os.path.normpath(index_path)):
+                break
+            path = os.path.realpath(index_path)
+            if path == self.path and self._lease is not None:
+                return path
+            lease_path = os.path.join(path, LEASE_FILENAME)
+            try:
+                lease = open(lease_path, "rb")
+            except FileNotFoundError:
+                # Swapped or collected between resolving and opening; resolve again.
+                continue
+            # Blocks only while a collector is deleting this version.
+            fcntl.flock(lease, fcntl.LOCK_SH)
+            if not os.path.exists(lease_path):
+                lease.close()
+                continue
+            self.release()
+            self._lease = lease
+            self.path = path
+            self.version = os.path.basename(path)
+            return path
+        self.release()
+        self.path = index_path
+        return index_path
+
+    def release(self):
+        if self._lease is not None:
+            self._lease.close()
+        self._lease = None
+        self.path = None
+        self.version = None
+
+    def __del__(self):
+        self.release()
+
+
+def clone_version(source, target, link_dirs=()):
+    """
+    Copies the index directory `source` to `target` as the starting point of
+    the next version. Files under the top-level `link_dirs` are hard-linked
+    instead of copied: their owners must replace them (delete, then write)
+    rather than modify them, since the previous version shares them.
+    """
+    os.makedirs(target)
+    for name in os.listdir(source):
+        if name == LEASE_FILENAME:
+            continue
+        source_path = os.path.join(source, name)
+        target_path = os.path.join(target, name)
+        if os.path.isdir(source_path):
+            shutil.copytree(source_path, target_path, copy_function=os.link if name in link_dirs else shutil.copy2)
+        else:
+            shutil.copy2(source_path, target_path)
+
+
+@contextmanager
+def staged_version(index_path, clone_from=None, link_dirs=(), keep=DEFAULT_KEEP_VERSIONS):
+    """
+    Yields a private staging directory for the next version of the index at
+    `index_path`, published with `publish_version` when the block succeeds
+    and discarded if it raises. The writer lock is held throughout.
+    `clone_from` (a version directory) seeds the staging directory with
+    its contents, see `clone_version`.
+    """
+    with WriterLock(index_path):
+        directory = versions_dir(index_path)
+        os.makedirs(directory, exist_ok=True)
+        staging_path = os.path.join(directory, f"{STAGING_PREFIX}{os.getpid()}")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        if clone_from and os.path.isdir(clone_from):
+            clone_version(clone_from, staging_path, link_dirs=link_dirs)
+        else:
+            os.makedirs(staging_path)
+        try:
+            yield staging_path
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+        publish_version(staging_path, index_path, keep=keep)
+
+
+def publish_version(staging_path, index_path, keep=DEFAULT_KEEP_VERSIONS):
+    """
+    Publishes directory `staging_path` as the next version of the index at
+    `index_path`: it is renamed into `<index_path>.versions/vNNNNNN` and the
+    `index_path` symlink is swapped to it with `os.replace`, so a reader
+    resolves either the old or the new version, never a mix. Old versions
+    are then garbage-collected. Call with the writer lock held.
+    Returns the new version's directory.
+    """
+    logger = logging.getLogger(__name__)
+    index_path = os.path.normpath(index_path)
+    directory = versions_dir(index_path)
+    os.makedirs(directory, exist_ok=True)
+    if os.path.isdir(index_path) and not os.path.islink(index_path):
+        # An index written before versioning becomes the first version.
+        legacy_path = os.path.join(directory, _next_version_name(directory))
+        logger.info(f"Moving unversioned index {index_path} to {legacy_path}")
+        open(os.path.join(index_path, LEASE_FILENAME), "a").close()
+        os.rename(index_path, legacy_path)
+
+    version_path = os.path.join(directory, _next_version_name(directory))
+    open(os.path.join(staging_path, LEASE_FILENAME), "a").close()
+    os.rename(staging_path, version_path)
+    link_path = f"{index_path}.link-{os.getpid()}"
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    # Relative, so the index can be moved or mounted elsewhere.
+    os.symlink(os.path.join(os.path.basename(directory), os.path.basename(version_path)), link_path)
+    os.replace(link_path, index_path)
+    logger.info(f"Published index version {os.path.basename(version_path)} at {index_path}")
+    gc_versions(index_path, keep=keep)
+    return version_path
+
+
+def gc_versions(index_path, keep=DEFAULT_KEEP_VERSIONS):
+    """
+    Deletes published versions older than the newest `keep` (at least the
+    current one is always kept) unless a reader has pinned them, and staging
+    directories left behind by crashed writers. Call with the writer lock
+    held. Returns the names of the deleted versions.
+    """
+    logger = logging.getLogger(__name__)
+    directory = versions_dir(index_path)
+    current = current_version(index_path)
+    names = _version_names(directory)
+    removed = []
+    for name in names[:-max(1, keep)]:
+        if name == current:
+            continue
+        path = os.path.join(directory, name)
+        with open(os.path.join(path, LEASE_FILENAME), "a") as lease:
+            try:
+                fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # still pinned by a reader
+            shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    own_staging = f"{STAGING_PREFIX}{os.getpid()}"
+    for name in os.listdir(directory):
+        if name.startswith(STAGING_PREFIX) and name != own_staging:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    if removed:
+        logger.info(f"Removed {len(removed)} old index version(s): {', '.join(removed)}")
+    return removed
@@ -2,54 +2,260 @@ import os
 import logging
 import argparse
 from logsense_ai.src.ingestion.ingestor import LogIngestor
-from logsense_ai.src.processing.processor import LogProcessor
-from logsense_ai.src.models.vector_store import LogVectorStore
+from logsense_ai.src.ingestion.checkpoint import CheckpointStore
+from logsense_ai.src.ingestion.parsers import log_formats
+from logsense_ai.src.ingestion.sources import DEFAULT_READ_THREADS, MultiFileSource, expand_sources
+from logsense_ai.src.processing.chunker import CHUNKING_STRATEGIES
+from logsense_ai.src.processing.templates import TemplateMiner
+from logsense_ai.src.models.tier_policy import INFO_TIERS
+from logsense_ai.src.models.versions import IndexLockedError, WriterLock
+from logsense_ai.src.utils.metrics import PROFILERS, REGISTRY, format_stage_totals, profile, time_iter
+from logsense_ai.src.utils.timeutils import parse_duration
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_pipeline(log_file, index_path):
+def _count_into(iterable, counts, key):
+    """
+    Passes items through while counting them, without materialising the iterable.
+    """
+    for item in iterable:
+        counts[key] += 1
+        yield item
+
+def _index_templates(entries, processor, vector_store, miner, batch_size):
+    """
+    Mines templates from `entries` and rebuilds the index with one document
+    per template. Unchanged templates are served from the embedding cache.
+    """
+    if processor.mine_templates(entries, miner) == 0:
+        return 0
+    texts, metadatas = processor.template_documents(miner)
+    vector_store.reset()
+    return vector_store.add_texts_batched(texts, batch_size=batch_size, metadatas=metadatas)
+
+def run_pipeline(log_file, index_path, incremental=False, batch_size=512, embed_batch_size=64, embed_workers=1,
+                 use_embedding_cache=True, dedupe=False, templates=False, index_type="auto", shard_by=None, retention=None,
+                 workers=1, chunking="grouped", info_tier=None, info_sample_rate=None, log_format="auto",
+                 log_pattern=None, timestamp_format=None, read_threads=DEFAULT_READ_THREADS, lock_timeout=0.0):
     """
     Runs the full ingestion pipeline: Load -> Process -> Embed -> Store.
+
+    `log_file` is a file, a directory, a glob or a list of them. Several
+    files are read by `read_threads` threads and merged into timestamp order
+    (see `MultiFileSource`). `log_format` names the parser ("auto" detects
+    it per file); `log_pattern` is the named-group regex for "regex" and
+    `timestamp_format` a strptime format for timestamps that are not ISO 8601.
+
+    Entries are streamed from disk, chunked lazily and embedded `batch_size`
+    chunks at a time, so memory use does not grow with the size of the log.
+
+    With `incremental=True` only lines appended since the last run's checkpoint
+    are embedded and appended to the existing index. If the log was rotated,
+    truncated or rewritten, the index is rebuilt from scratch instead.
+
+    `embed_batch_size` / `embed_workers` tune the embedding stage
+    (see `BatchEmbedder`); `embed_workers=0` uses one worker per core.
+    `use_embedding_cache` reuses vectors of previously seen chunks and
+    `dedupe` stores repeated chunks once with an occurrence count.
+    `templates` indexes one representative per mined log template (with
+    counts, time range and sample parameters) instead of every entry.
+    `index_type` selects the FAISS index structure (see `ann_index`).
+    `shard_by` ("hour" or "day") partitions the index into time shards;
+    `retention` (seconds) then drops shards older than that on save.
+    `workers` > 1 parses, normalises and chunks the log in that many
+    processes (0 = one per core); compressed logs, multi-line formats and
+    multi-file sources are always parsed in-process.
+    `chunking="grouped"` packs consecutive entries of a service into shared
+    chunks; `"entry"` gives every entry its own (best with `dedupe`).
+    `info_tier` ("embed", "sample", "templates", "lexical") decides how
+    chunks below WARN are indexed (see `TieredVectorStore`); None keeps the
+    existing index's policy. `info_sample_rate` is the share embedded by "sample".
+
+    Each run publishes a new index version (see `versions`) that readers
+    switch to atomically. Only one writer may run per index: if another
+    holds it for longer than `lock_timeout` seconds, `IndexLockedError`
+    is raised.
     """
+    # Heavy imports (FAISS, NumPy, LangChain) only once there is work to do,
+    # so --help and argument errors return immediately.
+    from logsense_ai.src.ingestion.parallel import ParallelParser
+    from logsense_ai.src.processing.processor import LogProcessor
+    from logsense_ai.src.models.sharded_store import open_vector_store
+    from logsense_ai.src.models.embedding_cache import default_cache_path
+
     logger.info("Starting Ingestion Pipeline...")
     
     # 1. Ingestion
-    ingestor = LogIngestor()
-    logs = ingestor.load_file(log_file)
-    if not logs:
-        logger.warning("No logs found. Exiting pipeline.")
+    paths = expand_sources(log_file)
+    if not paths:
+        logger.warning(f"No log files match {log_file}. Exiting pipeline.")
         return
-    logger.info(f"Loaded {len(logs)} log entries.")
-
-    # 2. Processing
-    processor = LogProcessor()
-    # Normalize first to get full text, then chunk. 
-    # NOTE: processing/processor.py process_logs does both.
-    chunks = processor.process_logs(logs)
-    logger.info(f"Generated {len(chunks)} text chunks.")
-    
-    # 3. Vector Storage
-    vector_store = LogVectorStore(index_path=index_path)
-    
-    # Check for OpenAI Key - No longer needed for Phase 2 as we use Local Embeddings
-    # if not os.getenv("OPENAI_API_KEY"):
-    #    logger.error("OPENAI_API_KEY not found. Cannot generate embeddings.")
-    #    return
+    # Held until the new version is published, so concurrent runs cannot build on the same version.
+    with WriterLock(index_path, timeout=lock_timeout):
+        ingestor = LogIngestor(log_format=log_format, log_pattern=log_pattern, timestamp_format=timestamp_format)
+        checkpoints = CheckpointStore(index_path).load()
+        vector_store = open_vector_store(
+            index_path,
+            shard_by=shard_by,
+            retention=retention,
+            embedding_batch_size=embed_batch_size,
+            embedding_workers=embed_workers,
+            embedding_cache_path=default_cache_path(index_path) if use_embedding_cache else None,
+            dedupe=dedupe,
+            index_type=index_type,
+            # Template mode indexes one document per template, whatever its level.
+            info_tier="embed" if templates else info_tier,
+            info_sample_rate=info_sample_rate,
+        )
+
+        source = MultiFileSource(ingestor, paths, workers=read_threads) if len(paths) > 1 else None
+        parallel = (source is None and workers != 1 and not LogIngestor.is_compressed(paths[0])
+                    and not ingestor.parser_for(paths[0]).multiline)
+        parser = ParallelParser(workers=workers, chunking=chunking) if parallel else None
+
+        def read_from(use_checkpoints):
+            # (entries, [new checkpoints], resumed)
+            if source is not None:
+                return source.iter_appended(checkpoints if use_checkpoints else None)
+            checkpoint = checkpoints.get(paths[0]) if use_checkpoints else None
+            if parallel:
+                entries, new_checkpoint, resumed = ingestor.iter_appended_parallel(
+                    paths[0], parser, checkpoint, documents=not templates)
+            else:
+                entries, new_checkpoint, resumed = ingestor.iter_appended(paths[0], checkpoint)
+            return entries, [new_checkpoint] if new_checkpoint is not None else [], resumed
+
+        entries, new_checkpoints, resumed = read_from(incremental)
+
+        miner = None
+        if resumed:
+            vector_store.load()
+            if templates:
+                miner = TemplateMiner.load(index_path)
+            if vector_store.empty or (templates and miner is None):
+                # Checkpoint survived but the index (or template state) did not: start over.
+                resumed = False
+                entries, new_checkpoints, _ = read_from(False)
+        elif incremental and any(checkpoints.get(path) is not None for path in paths):
+            logger.warning("Checkpoint is stale (rotation/truncation detected). Rebuilding index from scratch.")
+        if templates and miner is None:
+            miner = TemplateMiner()
+
+        # 2. Processing
+        processor = LogProcessor(chunking=chunking)
+        counts = {"entries": 0}
+        counted_entries = _count_into(time_iter(entries, "parse"), counts, "entries")
+
+        # 3. Vector Storage
+        # Check for OpenAI Key - No longer needed for Phase 2 as we use Local Embeddings
+        # if not os.getenv("OPENAI_API_KEY"):
+        #    logger.error("OPENAI_API_KEY not found. Cannot generate embeddings.")
+        #    return
+
+        try:
+            if templates:
+                added = _index_templates(counted_entries, processor, vector_store, miner, batch_size)
+            elif parallel:
+                # Already parsed, normalised and chunked by the worker processes, in file order.
+                # "parse_wait" is the time spent waiting on them, not their CPU time.
+                added = vector_store.add_documents_batched(time_iter(entries, "parse_wait"), batch_size=batch_size)
+                counts["entries"] = parser.entries
+            else:
+                # Normalize first to get full text, then chunk. 
+                # NOTE: processing/processor.py iter_documents does both, lazily,
+                # and attaches service/level/timestamp metadata to every chunk.
+                documents = processor.iter_documents(counted_entries)
+                added = vector_store.add_documents_batched(documents, batch_size=batch_size)
+        finally:
+            # Only the embedding workers: the docstore still stages the rows `save` writes below.
+            vector_store.embeddings.close()
+        if counts["entries"] == 0:
+            if resumed:
+                logger.info("No new log entries since last checkpoint. Index is up to date.")
+            else:
+                logger.warning("No logs found. Exiting pipeline.")
+            return
+        unit = "templates" if templates else "text chunks"
+        logger.info(f"Loaded {counts['entries']} {'new ' if resumed else ''}log entries into {added} {unit}.")
+        logger.info(f"Embedding stats: {vector_store.embeddings.stats.to_dict()}")
 
-    vector_store.add_texts(chunks)
-    vector_store.save()
-    logger.info("Pipeline completed successfully.")
+        # 4. Checkpoint is published together with the index it describes
+        if not resumed:
+            checkpoints.clear()
+        for new_checkpoint in new_checkpoints:
+            checkpoints.update(new_checkpoint)
+        sidecars = [checkpoints, miner] if templates else [checkpoints]
+        vector_store.save(sidecars=sidecars)
+        logger.info(f"Stage times: {format_stage_totals(REGISTRY.stage_totals())}")
+        logger.info("Pipeline completed successfully.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="LogSense-AI Ingestion Pipeline")
-    parser.add_argument("--log_file", type=str, default="logsense_ai/data/raw/app.log", help="Path to raw log file")
+    parser.add_argument("--log_file", type=str, nargs="+", default=["logsense_ai/data/raw/app.log"], help="Log files, directories or glob patterns (several are merged by timestamp)")
+    parser.add_argument("--log_format", type=str, default="auto", choices=log_formats(), help="Log line format (auto detects it per file)")
+    parser.add_argument("--log_pattern", type=str, help="Regex with named groups (timestamp, level, service, message) for --log_format regex")
+    parser.add_argument("--timestamp_format", type=str, help="strptime format for timestamps that are not ISO 8601, e.g. '%%d/%%b/%%Y:%%H:%%M:%%S %%z'")
+    parser.add_argument("--read_threads", type=int, default=DEFAULT_READ_THREADS, help="Threads reading files when several are ingested")
     parser.add_argument("--index_path", type=str, default="logsense_ai/data/processed/faiss_index", help="Path to save FAISS index")
+    parser.add_argument("--incremental", action="store_true", help="Only embed lines appended since the last checkpoint")
+    parser.add_argument("--batch_size", type=int, default=512, help="Chunks held in memory and embedded per batch")
+    parser.add_argument("--embed_batch_size", type=int, default=64, help="Texts per embedding model forward pass")
+    parser.add_argument("--embed_workers", type=int, default=1, help="Embedding worker processes (0 = one per CPU core)")
+    parser.add_argument("--no_embedding_cache", action="store_true", help="Disable the on-disk embedding cache")
+    parser.add_argument("--dedupe", action="store_true", help="Store identical chunks once with an occurrence count")
+    parser.add_argument("--templates", action="store_true", help="Index one representative per mined log template")
+    parser.add_argument("--shard_by", type=str, choices=["hour", "day"], help="Partition the index into hourly or daily shards")
+    parser.add_argument("--retention", type=str, help="Drop shards older than this, e.g. 7d (sharded indexes only)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes parsing and chunking the log (0 = one per CPU core)")
+    parser.add_argument("--chunking", type=str, default="grouped", choices=CHUNKING_STRATEGIES, help="Pack consecutive entries of a service into shared chunks, or chunk every entry on its own")
+    parser.add_argument("--info_tier", type=str, choices=INFO_TIERS, help="How chunks below WARN are indexed: embedded, sampled, as templates or lexical-only (default: keep the index's policy, else embed)")
+    parser.add_argument("--info_sample_rate", type=float, help="Share of INFO chunks embedded with --info_tier sample (default 0.1)")
+    parser.add_argument("--lock_timeout", type=float, default=0.0, help="Seconds to wait for another writer of the index to finish (default: fail at once)")
+    parser.add_argument("--index_type", type=str, default="auto", choices=["auto", "flat", "hnsw", "ivf_flat", "ivf_pq"], help="FAISS index structure (auto picks by corpus size)")
+    parser.add_argument("--metrics_file", type=str, help="Write per-stage timings and counters here after the run (.prom = Prometheus text, else JSON)")
+    parser.add_argument("--profile", type=str, choices=PROFILERS, help="Profile the run with cProfile (CPU) or tracemalloc (allocations)")
+    parser.add_argument("--profile_output", type=str, help="Where to write the profile (pstats file for cprofile, text report for tracemalloc)")
     
     args = parser.parse_args()
+    if args.log_format == "regex" and not args.log_pattern:
+        parser.error("--log_format regex requires --log_pattern")
+    try:
+        retention = parse_duration(args.retention) if args.retention else None
+    except ValueError as e:
+        parser.error(str(e))
     
     # Ensure processed directory exists
     os.makedirs(os.path.dirname(args.index_path), exist_ok=True)
     
-    run_pipeline(args.log_file, args.index_path)
+    with profile(args.profile, args.profile_output):
+        try:
+            run_pipeline(
+                args.log_file,
+                args.index_path,
+                incremental=args.incremental,
+                batch_size=args.batch_size,
+                embed_batch_size=args.embed_batch_size,
+                embed_workers=args.embed_workers,
+                use_embedding_cache=not args.no_embedding_cache,
+                dedupe=args.dedupe,
+                templates=args.templates,
+                index_type=args.index_type,
+                shard_by=args.shard_by,
+                retention=retention,
+                workers=args.workers,
+                chunking=args.chunking,
+                info_tier=args.info_tier,
+                info_sample_rate=args.info_sample_rate,
+                log_format=args.log_format,
+                log_pattern=args.log_pattern,
+                timestamp_format=args.timestamp_format,
+                read_threads=args.read_threads,
+                lock_timeout=args.lock_timeout,
+            )
+        except IndexLockedError as e:
+            parser.exit(1, f"{e}\n")
+    if args.metrics_file:
+        REGISTRY.write(args.metrics_file, extra=vars(args))
+        logger.info(f"Metrics written to {args.metrics_file}")
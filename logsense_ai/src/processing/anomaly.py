@@ -0,0 +1,232 @@
+import logging
+import math
+import re
+import time
+from logsense_ai.src.processing.templates import MASKS
+from logsense_ai.src.utils.timeutils import to_epoch
+
+DEFAULT_WINDOW_SECONDS = 60.0
+DEFAULT_SLOTS = 6
+DEFAULT_SPIKE_FACTOR = 4.0
+DEFAULT_MIN_COUNT = 20
+DEFAULT_BASELINE_ALPHA = 0.05
+ERROR_LEVELS = ("FATAL", "CRITICAL", "ERROR")
+
+# Cheap template key, in one regex pass unlike `mask_message`: any token
+# containing a digit (ids, codes, durations, IPs, numbers) is a variable, and
+# so is whatever else `mask_message` masks (UUIDs, emails, hex ids without
+# digits such as txn-efbbcccabefb). Those masks are only tried where a word
+# starts with a letter, so the pass costs about as much as the digit rule alone.
+_MASK_PATTERNS = dict(MASKS)
+_VARIABLE_TOKEN = re.compile(r"(?<!\S)\S*\d\S*|\b(?=[A-Za-z_])(?:"
+                             + "|".join(_MASK_PATTERNS[name].pattern for name in ("<UUID>", "<EMAIL>", "<HEX>")) + ")")
+_MASK64 = (1 << 64) - 1
+
+
+def template_key(message):
+    return _VARIABLE_TOKEN.sub("<*>", message)
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency table (`depth` rows of `width` counters): an
+    estimate never undercounts and overcounts by at most ~e/width of the
+    total with probability 1 - e^-depth. Counters are a flat Python list,
+    which is faster than numpy for single-element updates.
+    """
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.counts = [0] * (width * depth)
+
+    def cells(self, key_hash):
+        """
+        One counter index per row, from a single 64-bit hash (double hashing).
+        """
+        h1 = key_hash & 0xFFFFFFFF
+        h2 = (key_hash >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, cells, count=1):
+        counts = self.counts
+        for cell in cells:
+            counts[cell] += count
+
+    def estimate(self, cells):
+        counts = self.counts
+        return min(counts[cell] for cell in cells)
+
+
+class BloomFilter:
+    """
+    Fixed-memory set membership with no false negatives; used to remember
+    which templates have been seen.
+    """
+    def __init__(self, bits=1 << 22, hashes=3):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(bits // 8)
+
+    def add(self, key_hash):
+        """
+        Adds `key_hash`; returns True if it was (probably) already present.
+        """
+        h1 = key_hash & 0xFFFFFFFF
+        h2 = (key_hash >> 32) | 1
+        data = self.data
+        present = True
+        for i in range(self.hashes):
+            bit = (h1 + i * h2) % self.bits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not data[byte] & mask:
+                present = False
+                data[byte] |= mask
+        return present
+
+
+class AnomalyDetector:
+    """
+    Online error-burst and new-template detection for a stream of parsed
+    log entries, in constant memory and O(1) work per event.
+
+    Every entry updates its template's count (service, level, message with
+    variable tokens masked) and, for errors, its service's error count.
+    Counts live in count-min sketches: one per `window_seconds / slots`
+    step and a running sum over the last `slots` steps (the sliding window).
+    At each step the window is folded into an EWMA baseline sketch. A key
+    whose window count reaches `min_count` and exceeds `spike_factor` times
+    its baseline raises a "spike" alert (once per window); a template
+    missing from a Bloom filter of seen templates raises "new_template".
+    Alerts are suppressed until the baseline has seen two full windows.
+
+    Event timestamps drive the clock, so replaying an old log works; entries
+    without one use the wall clock. `on_alert` is called with each alert dict.
+    """
+    def __init__(self, window_seconds=DEFAULT_WINDOW_SECONDS, slots=DEFAULT_SLOTS, spike_factor=DEFAULT_SPIKE_FACTOR,
+                 min_count=DEFAULT_MIN_COUNT, baseline_alpha=DEFAULT_BASELINE_ALPHA, width=4096, depth=4, on_alert=None):
+        self.logger = logging.getLogger(__name__)
+        self.window_seconds = window_seconds
+        self.slots = slots
+        self.step = window_seconds / slots
+        self.spike_factor = spike_factor
+        self.min_count = min_count
+        self.baseline_alpha = baseline_alpha
+        self.on_alert = on_alert
+        self.window = CountMinSketch(width, depth)
+        self._ring = [CountMinSketch(width, depth) for _ in range(slots)]
+        self._baseline = [0.0] * (width * depth)
+        self._seen = BloomFilter()
+        self._slot = 0
+        self._step_end = None
+        self._steps = 0  # completed steps
+        self._folds = 0  # full windows folded into the baseline
+        self._alerted = {}  # key hash -> step end of its last spike alert
+        self.events = 0
+        self.alerts = 0
+
+    @property
+    def warming_up(self):
+        return self._folds < self.slots
+
+    def _advance(self, now):
+        """
+        Moves the sliding window forward to cover `now`.
+        """
+        if self._step_end is None:
+            self._step_end = now + self.step
+            return
+        steps = int((now - self._step_end) // self.step) + 1
+        for _ in range(min(steps, self.slots)):
+            self._steps += 1
+            if self._steps >= self.slots:
+                # Only full windows feed the baseline; the first ones are averaged.
+                self._folds += 1
+                alpha = max(self.baseline_alpha, 1.0 / self._folds)
+                self._baseline = [b + alpha * (w - b) for b, w in zip(self._baseline, self.window.counts)]
+            self._slot = (self._slot + 1) % self.slots
+            expired = self._ring[self._slot].counts
+            self.window.counts = [w - e for w, e in zip(self.window.counts, expired)]
+            self._ring[self._slot].counts = [0] * len(expired)
+        if steps > self.slots:
+            # A gap longer than the window: it is empty, the baseline just decays.
+            decay = (1 - self.baseline_alpha) ** (steps - self.slots)
+            self._baseline = [b * decay for b in self._baseline]
+        self._step_end += steps * self.step
+        self._alerted = {key: end for key, end in self._alerted.items() if end > self._step_end - self.window_seconds}
+
+    def _count(self, key_hash, now):
+        """
+        Counts one event of `key_hash`; returns (count, baseline) if it spikes.
+        """
+        cells = self.window.cells(key_hash)
+        self.window.add(cells)
+        self._ring[self._slot].add(cells)
+        count = self.window.estimate(cells)
+        if count < self.min_count or self.warming_up or key_hash in self._alerted:
+            return None
+        baseline = min(self._baseline[cell] for cell in cells)
+        if count <= self.spike_factor * max(baseline, 1.0):
+            return None
+        self._alerted[key_hash] = self._step_end
+        return count, baseline
+
+    def _emit(self, alert):
+        self.alerts += 1
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    def _spike(self, scope, service, level, template, message, count, baseline, now):
+        self._emit({"type": "spike", "scope": scope, "service": service, "level": level, "template": template,
+                    "example": message, "count": count, "baseline": round(baseline, 2),
+                    "window_start": now - self.window_seconds, "window_end": now})
+
+    def observe(self, entry, now=None):
+        """
+        Counts one parsed log entry (a dict); calls `on_alert` for anomalies.
+        """
+        if not isinstance(entry, dict):
+            return
+        self.events += 1
+        if now is None:
+            now = to_epoch(entry.get("timestamp"))
+            if now is None:
+                now = time.time()
+        if self._step_end is None or now >= self._step_end:
+            self._advance(now)
+
+        service = entry.get("service", "UNKNOWN_SERVICE")
+        level = str(entry.get("level", "INFO")).upper()
+        message = str(entry.get("message", ""))
+        template = template_key(message)
+        key_hash = hash((service, level, template)) & _MASK64
+
+        if not self._seen.add(key_hash) and not self.warming_up:
+            self._emit({"type": "new_template", "service": service, "level": level, "template": template,
+                        "example": message, "timestamp": now})
+        spike = self._count(key_hash, now)
+        if spike:
+            self._spike("template", service, level, template, message, *spike, now)
+        if level in ERROR_LEVELS:
+            spike = self._count(hash(("errors", service)) & _MASK64, now)
+            if spike:
+                self._spike("service_errors", service, level, template, message, *spike, now)
+
+    def estimate(self, service, level, message):
+        """
+        Approximate count of `message`'s template in the current window.
+        """
+        key_hash = hash((service, str(level).upper(), template_key(message))) & _MASK64
+        return self.window.estimate(self.window.cells(key_hash))
+
+
+def format_alert(alert):
+    """
+    One-line human-readable description of an alert.
+    """
+    if alert["type"] == "new_template":
+        return f"New template in {alert['service']} [{alert['level']}]: {alert['template']}"
+    scope = "errors" if alert["scope"] == "service_errors" else f"'{alert['template']}'"
+    ratio = alert["count"] / max(alert["baseline"], 1.0)
+    return (f"Spike in {alert['service']} {scope}: {alert['count']} in the last "
+            f"{math.ceil(alert['window_end'] - alert['window_start'])}s (x{ratio:.1f} baseline {alert['baseline']})")
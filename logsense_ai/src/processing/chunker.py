@@ -0,0 +1,192 @@
+import re
+from logsense_ai.src.utils.timeutils import to_epoch
+
+CHUNKING_STRATEGIES = ("grouped", "entry")
+DEFAULT_WINDOW_SECONDS = 60.0
+STACK_TRACE_MARKER = "\nStack Trace:\n"
+CONTINUED_MARKER = "\nStack Trace (continued):\n"
+
+# Per-entry lists recorded on chunks that cover more than one entry.
+# `entry_offsets` are character offsets of each entry within the chunk text.
+ENTRY_FIELDS = ("entry_offsets", "entry_timestamps", "entry_levels", "entry_correlation_ids")
+
+# Lower is more severe; unknown levels sort after DEBUG.
+SEVERITY = {"FATAL": 0, "CRITICAL": 0, "ERROR": 1, "WARN": 2, "WARNING": 2, "INFO": 3, "DEBUG": 4}
+
+# First line of a stack frame (Python, JVM); more deeply indented lines
+# below it (the source line) belong to the same frame.
+_FRAME_START = re.compile(r"^\s*(?:File [\"']|at |Caused by:|Traceback |\.\.\. \d+ more)")
+
+
+def severity(level):
+    return SEVERITY.get(str(level).upper(), len(SEVERITY))
+
+
+def stack_frames(trace):
+    """
+    Splits a stack trace into frames, each a list of lines.
+    """
+    frames = []
+    indent = None
+    for line in trace.splitlines():
+        line_indent = len(line) - len(line.lstrip())
+        if frames and not _FRAME_START.match(line) and indent is not None and line_indent > indent:
+            frames[-1].append(line)
+            continue
+        frames.append([line])
+        indent = line_indent
+    return ["\n".join(lines) for lines in frames]
+
+
+def split_entry(text, chunk_size, fallback):
+    """
+    Splits an entry longer than `chunk_size` into pieces that each repeat
+    the entry line and carry whole stack frames. Entries without a stack
+    trace (or with a very long message) go to `fallback`, a plain text splitter.
+    """
+    head, marker, trace = text.partition(STACK_TRACE_MARKER)
+    budget = chunk_size - len(head) - len(CONTINUED_MARKER)
+    if not marker or budget < chunk_size // 2:
+        return fallback(text)
+
+    parts, current, size = [], [], 0
+    for frame in stack_frames(trace):
+        # A single frame over budget is cut; anything else stays whole.
+        for start in range(0, max(len(frame), 1), budget):
+            piece = frame[start:start + budget]
+            if current and size + 1 + len(piece) > budget:
+                parts.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + (1 if size else 0)
+    if current:
+        parts.append(current)
+    return [head + (STACK_TRACE_MARKER if i == 0 else CONTINUED_MARKER) + "\n".join(frames)
+            for i, frames in enumerate(parts)]
+
+
+class _Group:
+    def __init__(self, order, start):
+        self.order = order
+        self.start = start
+        self.texts = []
+        self.metadatas = []
+        self.size = 0
+
+    def accepts(self, text, epoch, chunk_size, window_seconds):
+        if self.size + 1 + len(text) > chunk_size:
+            return False
+        if epoch is None or self.start is None:
+            return True
+        return 0 <= epoch - self.start <= window_seconds
+
+    def add(self, text, metadata):
+        self.size += len(text) + (1 if self.texts else 0)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+
+    def document(self):
+        if len(self.texts) == 1:
+            return self.texts[0], dict(self.metadatas[0])
+        offsets, position = [], 0
+        for text in self.texts:
+            offsets.append(position)
+            position += len(text) + 1
+        timestamps = [metadata.get("timestamp") for metadata in self.metadatas]
+        levels = [metadata.get("level") for metadata in self.metadatas]
+        trace_ids = [metadata.get("correlation_id") for metadata in self.metadatas]
+        dated = [timestamp for timestamp in timestamps if timestamp]
+
+        metadata = {}
+        if dated:
+            metadata["timestamp"] = dated[0]
+            metadata["first_seen"], metadata["last_seen"] = dated[0], dated[-1]
+        if self.metadatas[0].get("service") is not None:
+            metadata["service"] = self.metadatas[0]["service"]
+        if any(level is not None for level in levels):
+            metadata["level"] = min((level for level in levels if level is not None), key=severity)
+        if trace_ids[0] and len(set(trace_ids)) == 1:
+            metadata["correlation_id"] = trace_ids[0]
+        metadata["entries"] = len(self.texts)
+        metadata["entry_offsets"] = offsets
+        metadata["entry_timestamps"] = timestamps
+        metadata["entry_levels"] = levels
+        if any(trace_ids):
+            metadata["entry_correlation_ids"] = trace_ids
+        return "\n".join(self.texts), metadata
+
+
+class EntryGrouper:
+    """
+    Log-aware chunking: consecutive entries of the same service that fall
+    within `window_seconds` of the group's first entry are packed into one
+    chunk of at most `chunk_size` characters, so short lines no longer cost
+    one embedding each. Entries are never cut, stack traces included; an
+    entry longer than `chunk_size` becomes its own chunk(s), split between
+    stack frames (see `split_entry`).
+
+    A chunk covering several entries records them in `ENTRY_FIELDS`, takes
+    the most severe entry's level and spans `first_seen`..`last_seen`.
+    Level filters match any of its `entry_levels` (see `MetadataIndex`).
+    """
+    def __init__(self, chunk_size=1000, window_seconds=DEFAULT_WINDOW_SECONDS, fallback=None):
+        self.chunk_size = chunk_size
+        self.window_seconds = window_seconds
+        self.fallback = fallback or (lambda text: [text])
+
+    def group(self, documents):
+        """
+        Yields grouped (chunk, metadata) pairs for an iterable of
+        (normalised entry, entry metadata) pairs.
+        """
+        open_groups = {}
+        order = 0
+        for text, metadata in documents:
+            service = metadata.get("service")
+            epoch = to_epoch(metadata.get("timestamp"))
+            if epoch is not None:
+                # Groups whose window has passed are complete.
+                for key in [key for key, group in open_groups.items()
+                            if group.start is not None and epoch - group.start > self.window_seconds]:
+                    yield open_groups.pop(key).document()
+
+            group = open_groups.get(service)
+            if group is not None and not group.accepts(text, epoch, self.chunk_size, self.window_seconds):
+                yield open_groups.pop(service).document()
+                group = None
+            if len(text) > self.chunk_size:
+                for piece in split_entry(text, self.chunk_size, self.fallback):
+                    yield piece, dict(metadata)
+                continue
+            if group is None:
+                group = open_groups[service] = _Group(order, epoch)
+                order += 1
+            group.add(text, metadata)
+        for group in sorted(open_groups.values(), key=lambda group: group.order):
+            yield group.document()
+
+
+def covered_entries(text, metadata):
+    """
+    (entry text, entry metadata) for each log entry a chunk covers; a chunk
+    of one entry (or one piece of it) is returned as is.
+    """
+    offsets = metadata.get("entry_offsets")
+    if not offsets:
+        return [(text, metadata)]
+    base = {key: value for key, value in metadata.items()
+            if key not in ENTRY_FIELDS and key not in ("entries", "first_seen", "last_seen", "correlation_id")}
+    trace_ids = metadata.get("entry_correlation_ids") or [None] * len(offsets)
+    entries = []
+    for i, start in enumerate(offsets):
+        end = offsets[i + 1] - 1 if i + 1 < len(offsets) else len(text)
+        entry = dict(base)
+        for field, value in (("timestamp", metadata["entry_timestamps"][i]),
+                             ("level", metadata["entry_levels"][i]),
+                             ("correlation_id", trace_ids[i])):
+            if value is None:
+                entry.pop(field, None)
+            else:
+                entry[field] = value
+        entries.append((text[start:end], entry))
+    return entries
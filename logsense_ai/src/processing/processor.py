@@ -1,21 +1,41 @@
 import json
 import logging
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from logsense_ai.src.processing.chunker import DEFAULT_WINDOW_SECONDS, EntryGrouper
+from logsense_ai.src.utils.metrics import time_iter
+
+# Entry fields copied into every chunk's metadata.
+METADATA_FIELDS = ("timestamp", "service", "level", "correlation_id")
 
 class LogProcessor:
     """
     Handles preprocessing of raw log entries: normalization, cleaning, and chunking.
+
+    `chunking="grouped"` packs consecutive entries of a service into shared
+    chunks (see `EntryGrouper`); `"entry"` chunks every entry on its own.
     """
-    def __init__(self, chunk_size=1000, chunk_overlap=100):
+    def __init__(self, chunk_size=1000, chunk_overlap=100, chunking="grouped", window_seconds=DEFAULT_WINDOW_SECONDS):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        self.chunking = chunking
+        self._text_splitter = None
+        self.grouper = EntryGrouper(chunk_size=chunk_size, window_seconds=window_seconds, fallback=self.chunk)
         self.logger = logging.getLogger(__name__)
 
+    @property
+    def text_splitter(self):
+        """
+        Created on first use: most entries fit in one chunk and never need it,
+        and importing LangChain's splitters costs ~0.3s of CLI startup.
+        """
+        if self._text_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                separators=["\n\n", "\n", " ", ""]
+            )
+        return self._text_splitter
+
     def normalize(self, log_entry):
         """
         Converts a raw dictionary log entry into a structured text format suitable for embedding.
@@ -44,20 +64,104 @@ class LogProcessor:
             
         return normalized_text
 
+    def entry_metadata(self, log_entry):
+        """
+        Structured fields carried alongside every chunk of `log_entry`, so
+        search can filter on them without re-parsing the text.
+        """
+        if not isinstance(log_entry, dict):
+            return {}
+        metadata = {}
+        for field in METADATA_FIELDS:
+            if log_entry.get(field) is not None:
+                metadata[field] = log_entry[field]
+        return metadata
+
     def chunk(self, text):
         """
         Splits text into chunks of `chunk_size` characters.
         """
+        if len(text) <= self.chunk_size:
+            # What the splitter returns for text that fits, without its overhead.
+            text = text.strip()
+            return [text] if text else []
         return self.text_splitter.split_text(text)
     
+    def iter_chunks(self, logs):
+        """
+        Lazily normalizes and chunks an iterable of log entries,
+        yielding chunk strings one at a time.
+        """
+        for chunk, _ in self.iter_documents(logs):
+            yield chunk
+
+    def iter_documents(self, logs):
+        """
+        Like `iter_chunks`, but yields (chunk, metadata) pairs with the
+        entry's timestamp, service, level and correlation_id (grouped
+        chunks also list the entries they cover).
+        """
+        documents = time_iter(self._entry_documents(logs), "normalize")
+        if self.chunking == "grouped":
+            yield from time_iter(self.grouper.group(documents), "chunk")
+            return
+        yield from time_iter(self._split_documents(documents), "chunk")
+
+    def _split_documents(self, documents):
+        for text, metadata in documents:
+            for chunk in self.chunk(text):
+                yield chunk, dict(metadata)
+
+    def _entry_documents(self, logs):
+        for log in logs:
+            if isinstance(log, str):
+                try:
+                    log = json.loads(log)
+                except json.JSONDecodeError:
+                    pass
+            yield self.normalize(log).strip(), self.entry_metadata(log)
+
+    def mine_templates(self, logs, miner):
+        """
+        Feeds log entries into a `TemplateMiner`, keeping each template's
+        first normalized line as its representative example.
+        Returns the number of entries consumed.
+        """
+        count = 0
+        for log in logs:
+            if isinstance(log, str):
+                try:
+                    log = json.loads(log)
+                except json.JSONDecodeError:
+                    log = {"message": log}
+            miner.add(log, example=self.normalize(log))
+            count += 1
+        return count
+
+    def template_documents(self, miner):
+        """
+        Renders one embeddable text per mined template plus metadata with its
+        occurrence count, time range and sample parameters.
+        Returns (texts, metadatas).
+        """
+        texts, metadatas = [], []
+        for template in miner.templates.values():
+            # Counts stay out of the text so unchanged templates keep hitting the embedding cache.
+            texts.append(f"[{template.service}] [{template.level}]: {template.text}\nExample: {template.example}")
+            metadatas.append({
+                "template_id": template.template_id,
+                "service": template.service,
+                "level": template.level,
+                "count": template.count,
+                "first_seen": template.first_seen,
+                "last_seen": template.last_seen,
+                "sample_params": template.sample_params,
+            })
+        return texts, metadatas
+
     def process_logs(self, logs):
         """
         Batch processes valid log dictionaries into chunked text strings.
         Returns a list of chunks.
         """
-        all_chunks = []
-        for log in logs:
-            norm_text = self.normalize(log)
-            chunks = self.chunk(norm_text)
-            all_chunks.extend(chunks)
-        return all_chunks
+        return list(self.iter_chunks(logs))
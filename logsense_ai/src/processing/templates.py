@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import re
+
+TEMPLATES_FILENAME = "templates.json"
+WILDCARD = "<*>"
+
+# Order matters: more specific patterns must run before the generic number mask.
+MASKS = [
+    ("<UUID>", re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b")),
+    ("<EMAIL>", re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")),
+    ("<IP>", re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b")),
+    # 0x-prefixed values, and bare hex ids of 8+ digits with at least one letter (e.g. txn-efbbcccabefb).
+    ("<HEX>", re.compile(r"\b(?:0x[0-9a-fA-F]+|(?=\d*[a-fA-F])[0-9a-fA-F]{8,})\b")),
+    ("<NUM>", re.compile(r"(?<![\w<])[-+]?\d+(?:\.\d+)?")),
+]
+_PLACEHOLDER = re.compile(r"<[A-Z]+>|<\*>")
+
+
+def mask_message(message):
+    """
+    Replaces variable parts of a log message (ids, emails, IPs, numbers) with placeholders.
+    """
+    for placeholder, pattern in MASKS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+def _is_variable(token):
+    """
+    True for template tokens that (partly) stand for a variable value, e.g. `<*>` or `id=<UUID>`.
+    """
+    return _PLACEHOLDER.search(token) is not None
+
+
+class LogTemplate:
+    """
+    One mined message template with occurrence statistics.
+    """
+    MAX_SAMPLE_PARAMS = 5
+
+    def __init__(self, template_id, service, level, tokens, example):
+        self.template_id = template_id
+        self.service = service
+        self.level = level
+        self.tokens = tokens
+        self.example = example
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.sample_params = []
+
+    @property
+    def text(self):
+        return " ".join(self.tokens)
+
+    def similarity(self, tokens):
+        """
+        Fraction of positions where `tokens` matches this template exactly.
+        Wildcard positions count as neither match nor mismatch.
+        """
+        matches = 0
+        for template_token, token in zip(self.tokens, tokens):
+            if template_token == WILDCARD:
+                continue
+            if template_token == token:
+                matches += 1
+        return matches / len(tokens) if tokens else 1.0
+
+    def merge(self, tokens):
+        self.tokens = [t if t == other else WILDCARD for t, other in zip(self.tokens, tokens)]
+
+    def observe(self, raw_tokens, timestamp):
+        self.count += 1
+        if timestamp:
+            if self.first_seen is None or timestamp < self.first_seen:
+                self.first_seen = timestamp
+            if self.last_seen is None or timestamp > self.last_seen:
+                self.last_seen = timestamp
+        if len(self.sample_params) < self.MAX_SAMPLE_PARAMS:
+            params = [raw for raw, t in zip(raw_tokens, self.tokens) if _is_variable(t)]
+            if params and params not in self.sample_params:
+                self.sample_params.append(params)
+
+    def to_dict(self):
+        return {
+            "template_id": self.template_id,
+            "service": self.service,
+            "level": self.level,
+            "tokens": self.tokens,
+            "example": self.example,
+            "count": self.count,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "sample_params": self.sample_params,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        template = cls(data["template_id"], data["service"], data["level"], data["tokens"], data["example"])
+        template.count = data.get("count", 0)
+        template.first_seen = data.get("first_seen")
+        template.last_seen = data.get("last_seen")
+        template.sample_params = data.get("sample_params", [])
+        return template
+
+
+class TemplateMiner:
+    """
+    Online log template extraction in the spirit of Drain.
+
+    Messages are masked, tokenised and routed to a bucket keyed by
+    (service, level, token count, first token); within a bucket the most
+    similar template absorbs the message if similarity >= `threshold`
+    (differing positions become wildcards), otherwise a new template starts.
+    Memory grows with the number of distinct templates, not with log volume.
+    """
+    def __init__(self, threshold=0.5):
+        self.logger = logging.getLogger(__name__)
+        self.threshold = threshold
+        self.templates = {}
+        self._buckets = {}
+        self._next_id = 1
+
+    def _bucket_key(self, service, level, tokens):
+        first = tokens[0] if tokens else ""
+        return (service, level, len(tokens), first)
+
+    def add(self, log_entry, example=None):
+        """
+        Assigns `log_entry` (a parsed dict) to a template and returns it.
+        `example` is the normalised text kept as the template's representative.
+        """
+        service = log_entry.get("service", "UNKNOWN_SERVICE")
+        level = log_entry.get("level", "INFO")
+        message = str(log_entry.get("message", ""))
+        raw_tokens = message.split()
+        tokens = mask_message(message).split()
+        if len(tokens) != len(raw_tokens):
+            raw_tokens = tokens  # Masking merged tokens; fall back to masked values
+
+        bucket = self._buckets.setdefault(self._bucket_key(service, level, tokens), [])
+        best, best_score = None, -1.0
+        for template in bucket:
+            score = template.similarity(tokens)
+            if score > best_score:
+                best, best_score = template, score
+
+        if best is not None and best_score >= self.threshold:
+            best.merge(tokens)
+            template = best
+        else:
+            template = LogTemplate(f"T{self._next_id}", service, level, tokens, example or message)
+            self._next_id += 1
+            bucket.append(template)
+            self.templates[template.template_id] = template
+
+        template.observe(raw_tokens, log_entry.get("timestamp"))
+        return template
+
+    def __len__(self):
+        return len(self.templates)
+
+    def save(self, directory):
+        """
+        Persists mined templates so incremental runs can keep counting.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, TEMPLATES_FILENAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "threshold": self.threshold,
+                "next_id": self._next_id,
+                "templates": [t.to_dict() for t in self.templates.values()],
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Restores a miner saved with `save`. Returns None if no state exists.
+        """
+        path = os.path.join(directory, TEMPLATES_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            data = json.load(f)
+        miner = cls(threshold=data.get("threshold", 0.5))
+        miner._next_id = data.get("next_id", 1)
+        for item in data.get("templates", []):
+            template = LogTemplate.from_dict(item)
+            miner.templates[template.template_id] = template
+            key = miner._bucket_key(template.service, template.level, template.tokens)
+            miner._buckets.setdefault(key, []).append(template)
+        return miner
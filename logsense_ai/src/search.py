@@ -1,35 +1,161 @@
 import argparse
 import logging
 import os
-from logsense_ai.src.models.rag_engine import RAGEngine
+from logsense_ai.src.client import QueryClient, ServiceUnavailable
+from logsense_ai.src.utils.timeutils import parse_time_bound
 
 # Configure logging
 logging.basicConfig(level=logging.ERROR, format='%(message)s') # Keep clean output
 logger = logging.getLogger(__name__)
 
+DEFAULT_INDEX_PATH = "logsense_ai/data/processed/faiss_index"
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+def server_client(args):
+    """
+    Client for the query server if it can answer this request, else None
+    (search in-process). The server searches its own index with its own
+    tuning, so `--nprobe` / `--ef_search` or an `--index_path` it does not
+    serve are handled in-process rather than silently ignored.
+    """
+    if args.local:
+        return None
+    client = QueryClient(args.server)
+    if args.nprobe is not None or args.ef_search is not None:
+        print("(--nprobe/--ef_search apply to in-process search only; loading the index in-process.)\n")
+        return None
+    if args.index_path is None:
+        return client
+    try:
+        served = client.health()["index_path"]
+    except ServiceUnavailable:
+        print("(Query server not running; loading the index in-process. Start it with `python -m logsense_ai.src.server`.)\n")
+        return None
+    if os.path.abspath(served) != os.path.abspath(args.index_path):
+        print(f"(Query server serves {served}, not {args.index_path}; loading the index in-process.)\n")
+        return None
+    return client
+
+def print_trace(args):
+    """
+    Direct correlation-id lookup: no embedding model, no vector search, no LLM.
+    """
+    entries = None
+    client = server_client(args)
+    if client is not None:
+        try:
+            entries = [entry["text"] for entry in client.trace(args.trace)]
+        except ServiceUnavailable:
+            pass
+    if entries is None:
+        index_path = args.index_path or DEFAULT_INDEX_PATH
+        if not os.path.exists(index_path):
+            print(f"Error: Index not found at {index_path}. Run pipeline first.")
+            return
+        from logsense_ai.src.models.sharded_store import open_vector_store
+        vector_store = open_vector_store(index_path)
+        vector_store.load(read_only=True)
+        entries = [doc.page_content for doc in vector_store.trace(args.trace)]
+
+    if not entries:
+        print(f"No entries found for correlation id {args.trace}.")
+        return
+    print(f"### Trace {args.trace} ({len(entries)} entries):\n")
+    for entry in entries:
+        print(entry.strip())
+
 def main():
     parser = argparse.ArgumentParser(description="LogSense-AI Semantic Search")
-    parser.add_argument("query", type=str, help="Natural language query (e.g., 'Why did payment fail?')")
+    parser.add_argument("query", type=str, nargs="?", help="Natural language query (e.g., 'Why did payment fail?')")
+    parser.add_argument("--trace", type=str, help="Print every entry of this correlation id across services instead of analyzing")
     parser.add_argument("--k", type=int, default=3, help="Number of log chunks to retrieve")
-    parser.add_argument("--index_path", type=str, default="logsense_ai/data/processed/faiss_index", help="Path to FAISS index")
+    parser.add_argument("--index_path", type=str,
+                        help=f"Path to FAISS index (default: the query server's index, else {DEFAULT_INDEX_PATH}); "
+                             "a different index than the server's is searched in-process")
+    parser.add_argument("--service", type=str, action="append", help="Only search logs from this service (repeatable)")
+    parser.add_argument("--level", type=str, action="append", help="Only search logs at this level, e.g. ERROR (repeatable)")
+    parser.add_argument("--since", type=str, help="Only search logs newer than this (e.g. 30m, 1h, 2d or ISO timestamp)")
+    parser.add_argument("--until", type=str, help="Only search logs older than this (duration or ISO timestamp)")
+    parser.add_argument("--nprobe", type=int, help="IVF lists probed per query (higher = better recall, slower); searches in-process")
+    parser.add_argument("--ef_search", type=int, help="HNSW search breadth (higher = better recall, slower); searches in-process")
+    parser.add_argument("--mode", type=str, choices=["hybrid", "vector", "lexical"], default="hybrid", help="Retrieval strategy")
+    parser.add_argument("--server", type=str, help="Query server URL (default $LOGSENSE_SERVER_URL or http://127.0.0.1:8765)")
+    parser.add_argument("--local", action="store_true", help="Load the index in-process instead of using the query server")
+    parser.add_argument("--context_tokens", type=int, default=3000, help="Token budget for the log evidence sent to the LLM (in-process only)")
+    parser.add_argument("--no_stream", action="store_true", help="Print the answer only once it is complete")
     
     args = parser.parse_args()
-    
-    print(f"\n--- Analyzing Incident: '{args.query}' ---\n")
-    
-    if not os.path.exists(args.index_path):
-        print(f"Error: Index not found at {args.index_path}. Run pipeline first.")
+
+    if args.trace:
+        print_trace(args)
         return
+    if not args.query:
+        parser.error("a query (or --trace <correlation_id>) is required")
 
-    rag = RAGEngine(index_path=args.index_path)
-    
-    result = rag.analyze_incident(args.query, k=args.k)
+    try:
+        filters = {
+            "service": args.service,
+            "level": [level.upper() for level in args.level] if args.level else None,
+            "since": parse_time_bound(args.since),
+            "until": parse_time_bound(args.until),
+        }
+    except ValueError as e:
+        parser.error(str(e))
     
+    print(f"\n--- Analyzing Incident: '{args.query}' ---\n")
+
+    events = None
+    client = server_client(args)
+    if client is not None:
+        try:
+            if args.no_stream:
+                result = client.analyze(args.query, k=args.k, filters=filters, mode=args.mode)
+                events = iter([{"type": "sources", "source_logs": result["source_logs"]},
+                               {"type": "done", "answer": result["answer"]}])
+            else:
+                events = client.stream_analyze(args.query, k=args.k, filters=filters, mode=args.mode)
+                # The first event arrives only once the server accepted the request.
+                first = next(events)
+                events = _chain(first, events)
+        except ServiceUnavailable:
+            events = None
+            print("(Query server not running; loading the index in-process. Start it with `python -m logsense_ai.src.server`.)\n")
+
+    if events is None:
+        index_path = args.index_path or DEFAULT_INDEX_PATH
+        if not os.path.exists(index_path):
+            print(f"Error: Index not found at {index_path}. Run pipeline first.")
+            return
+        # Heavy imports (torch, FAISS, LangChain) only when running without the server
+        from logsense_ai.src.models.rag_engine import RAGEngine
+        # One question per process: an answer cache could never hit, and keying it
+        # would load the embedding model even for identifier lookups.
+        rag = RAGEngine(index_path=index_path, nprobe=args.nprobe, ef_search=args.ef_search,
+                        context_tokens=args.context_tokens, answer_cache_size=0)
+        if args.no_stream:
+            result = rag.analyze_incident(args.query, k=args.k, filters=filters, mode=args.mode)
+            events = iter([{"type": "sources", "source_logs": result["source_logs"]},
+                           {"type": "done", "answer": result["answer"]}])
+        else:
+            events = rag.stream_incident(args.query, k=args.k, filters=filters, mode=args.mode)
+
     print("### Root Cause Analysis:\n")
-    print(result["answer"])
+    source_logs = []
+    streamed = False
+    for event in events:
+        if event["type"] == "sources":
+            source_logs = event["source_logs"]
+        elif event["type"] == "token":
+            print(event["text"], end="", flush=True)
+            streamed = True
+        elif event["type"] == "done":
+            print("" if streamed else event["answer"])
     print("\n" + "="*40 + "\n")
     print("### Supporting Log Evidence:\n")
-    for i, log in enumerate(result["source_logs"], 1):
+    for i, log in enumerate(source_logs, 1):
         print(f"--- Log Chunk {i} ---")
         print(log.strip())
         print()
@@ -0,0 +1,259 @@
+import argparse
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logsense_ai.src.models.rag_engine import RAGEngine
+from logsense_ai.src.utils.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODES = ("hybrid", "vector", "lexical")
+
+
+class QueryService:
+    """
+    Holds one warm `RAGEngine` (embedding model, memory-mapped index, LLM
+    client) for the lifetime of the server and hot-reloads the index when
+    the pipeline publishes a new version.
+    """
+    def __init__(self, index_path, nprobe=None, ef_search=None, reload_interval=2.0, **engine_kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.engine = RAGEngine(index_path=index_path, nprobe=nprobe, ef_search=ef_search, **engine_kwargs)
+        self.reload_interval = reload_interval
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
+    def warm_up(self):
+        """
+        Loads the embedding model and the LLM client and runs one query so the first request is fast.
+        """
+        start = time.perf_counter()
+        self.engine.vector_store.embeddings.embed_query("warm up")
+        self.engine.llm
+        self.logger.info(f"Embedding model and LLM client ready in {time.perf_counter() - start:.2f}s")
+
+    def reload(self):
+        with self._reload_lock:
+            return self.engine.reload_if_changed()
+
+    def _watch(self):
+        while not self.stop_event.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                self.logger.error(f"Index reload failed; keeping the current index: {e}")
+
+    def start(self):
+        if self.reload_interval > 0:
+            self._watcher = threading.Thread(target=self._watch, name="index-reloader", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def health(self):
+        vector_store = self.engine.vector_store
+        return {
+            "status": "ok",
+            # Absolute, so clients started elsewhere can tell whether it is their index.
+            "index_path": os.path.abspath(self.engine.index_path),
+            "index_loaded": not vector_store.empty,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "answer_cache": self.engine.answer_cache.stats() if self.engine.answer_cache else None,
+        }
+
+    def search(self, query, k=5, filters=None, mode="hybrid"):
+        docs = self.engine.search_documents(query, k=k, filters=filters, mode=mode)
+        return [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+    def trace(self, trace_id, limit=None):
+        docs = self.engine.trace(trace_id, limit=limit)
+        return [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+    def analyze(self, query, k=5, filters=None, mode="hybrid"):
+        return self.engine.analyze_incident(query, k=k, filters=filters, mode=mode)
+
+    def stream_analyze(self, query, k=5, filters=None, mode="hybrid"):
+        return self.engine.stream_incident(query, k=k, filters=filters, mode=mode)
+
+
+def _parse_request(payload):
+    query = payload.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("'query' must be a non-empty string")
+    k = int(payload.get("k") or 5)
+    if k <= 0:
+        raise ValueError("'k' must be positive")
+    mode = payload.get("mode") or "hybrid"
+    if mode not in MODES:
+        raise ValueError(f"'mode' must be one of {', '.join(MODES)}")
+    filters = payload.get("filters") or None
+    if filters is not None and not isinstance(filters, dict):
+        raise ValueError("'filters' must be an object")
+    return {"query": query, "k": k, "filters": filters, "mode": mode}
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API: GET /health, POST /search, POST /analyze, POST /trace, POST /reload.
+    POST /analyze/stream answers with chunked NDJSON, one event per line
+    (see `RAGEngine.stream_incident`). GET /metrics serves Prometheus text,
+    GET /metrics.json the same metrics as JSON.
+    """
+    service = None  # set by `make_server`
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, payload):
+        self._send_text(status, json.dumps(payload), "application/json")
+
+    def _send_text(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _send_stream(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in events:
+                line = json.dumps(event).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+        except Exception as e:
+            # Headers are already sent; report the failure as the last event.
+            logger.exception(f"Streaming response to {self.path} failed")
+            line = json.dumps({"type": "error", "error": str(e)}).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.service.health())
+        elif self.path == "/metrics":
+            self._send_text(200, REGISTRY.to_prometheus(), PROMETHEUS_CONTENT_TYPE)
+        elif self.path == "/metrics.json":
+            self._send(200, {"stages": REGISTRY.stage_totals(), "metrics": REGISTRY.snapshot()})
+        else:
+            self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        try:
+            payload = self._read_json()
+            if self.path == "/analyze/stream":
+                events = self.service.stream_analyze(**_parse_request(payload))
+            elif self.path == "/search":
+                result = {"results": self.service.search(**_parse_request(payload))}
+            elif self.path == "/analyze":
+                result = self.service.analyze(**_parse_request(payload))
+            elif self.path == "/trace":
+                trace_id = payload.get("trace_id")
+                if not isinstance(trace_id, str) or not trace_id.strip():
+                    raise ValueError("'trace_id' must be a non-empty string")
+                limit = payload.get("limit")
+                result = {"entries": self.service.trace(trace_id.strip(), limit=int(limit) if limit else None)}
+            elif self.path == "/reload":
+                result = {"reloaded": self.service.reload()}
+            else:
+                self._send(404, {"error": f"Unknown endpoint {self.path}"})
+                return
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.exception(f"Request to {self.path} failed")
+            self._send(500, {"error": str(e)})
+            return
+        if self.path == "/analyze/stream":
+            self._send_stream(events)
+            return
+        took = time.perf_counter() - start
+        REGISTRY.histogram("request_seconds", "Query server request latency").observe(took, endpoint=self.path)
+        result["took_ms"] = round(1000 * took, 2)
+        self._send(200, result)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(service, host="127.0.0.1", port=8765, socket_path=None):
+    """
+    Returns a threaded HTTP server bound to `host:port`, or to `socket_path`
+    (a Unix domain socket) if given.
+    """
+    handler = type("BoundQueryRequestHandler", (QueryRequestHandler,), {"service": service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogSense-AI Query Server")
+    parser.add_argument("--index_path", type=str, default="logsense_ai/data/processed/faiss_index", help="Path to FAISS index")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--socket", type=str, help="Listen on this Unix domain socket instead of TCP")
+    parser.add_argument("--reload_interval", type=float, default=2.0, help="Seconds between checks for a newly published index (0 = never)")
+    parser.add_argument("--nprobe", type=int, help="IVF lists probed per query")
+    parser.add_argument("--ef_search", type=int, help="HNSW search breadth")
+    parser.add_argument("--answer_cache_size", type=int, default=512, help="Cached LLM answers (0 = no answer cache)")
+    parser.add_argument("--answer_cache_ttl", type=float, default=900.0, help="Seconds a cached answer stays valid")
+    parser.add_argument("--answer_cache_threshold", type=float, default=0.92, help="Cosine similarity at which two questions count as the same")
+    parser.add_argument("--context_tokens", type=int, default=3000, help="Token budget for the log evidence sent to the LLM")
+    args = parser.parse_args()
+
+    service = QueryService(args.index_path, nprobe=args.nprobe, ef_search=args.ef_search, reload_interval=args.reload_interval,
+                           answer_cache_size=args.answer_cache_size, answer_cache_ttl=args.answer_cache_ttl,
+                           answer_cache_threshold=args.answer_cache_threshold, context_tokens=args.context_tokens)
+    service.warm_up()
+    service.start()
+    server = make_server(service, host=args.host, port=args.port, socket_path=args.socket)
+    address = f"unix://{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    logger.info(f"Query server listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
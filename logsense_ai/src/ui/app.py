@@ -7,6 +7,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 
 from logsense_ai.src.pipeline import run_pipeline
 from logsense_ai.src.models.rag_engine import RAGEngine
+from logsense_ai.src.client import QueryClient, ServiceUnavailable
+from logsense_ai.src.utils.timeutils import parse_time_bound
 
 # Page Config
 st.set_page_config(page_title="LogSense-AI", page_icon="🔍", layout="wide")
@@ -24,6 +26,31 @@ index_path = "logsense_ai/data/processed/faiss_index"
 # Ensure directories exist
 os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
 
+
+@st.cache_resource
+def get_local_engine(path):
+    """
+    In-process engine used when no query server is running; kept warm across reruns.
+    """
+    return RAGEngine(index_path=path)
+
+
+def analyze(query, filters):
+    """
+    Streams analysis events from the resident query server, falling back to a
+    cached in-process engine.
+    """
+    try:
+        events = QueryClient().stream_analyze(query, k=5, filters=filters)
+        first = next(events)
+    except ServiceUnavailable:
+        engine = get_local_engine(index_path)
+        engine.reload_if_changed()
+        events = engine.stream_incident(query, k=5, filters=filters)
+        first = next(events)
+    yield first
+    yield from events
+
 # Helper for generation (simplified version of generate_logs.py)
 def generate_sample_logs(count=100):
     import random
@@ -77,7 +104,7 @@ else:
         with st.spinner("Ingesting and processing logs..."):
             # No API Key needed for ingestion (Local Embeddings)
             try:
-                run_pipeline(log_file_path, index_path)
+                run_pipeline(log_file_path, index_path, incremental=True)
                 st.sidebar.success("Ingestion Complete! specific Index updated.")
             except Exception as e:
                 st.sidebar.error(f"Ingestion failed: {e}")
@@ -94,27 +121,59 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.subheader("🕵️‍♂️ Investigate Incident")
     query = st.text_input("Describe the issue (e.g., 'Why did payment fail?')", placeholder="Type your query here...")
+
+    with st.expander("🔎 Filters"):
+        f_col1, f_col2, f_col3 = st.columns(3)
+        service_filter = f_col1.multiselect(
+            "Service",
+            ["checkout-service", "auth-service", "payment-gateway", "inventory-db", "recommendation-engine"],
+        )
+        level_filter = f_col2.multiselect("Level", ["ERROR", "WARN", "INFO"])
+        since_filter = f_col3.text_input("Since (e.g. 30m, 1h, 2d)", value="")
+
+    try:
+        filters = {
+            "service": service_filter,
+            "level": level_filter,
+            "since": parse_time_bound(since_filter.strip()) if since_filter.strip() else None,
+        }
+    except ValueError as e:
+        filters = None
+        st.error(str(e))
     
     if st.button("Analyze Logs"):
         if not query:
             st.warning("Please enter a query.")
+        elif filters is None:
+            st.warning("Please fix the filters first.")
         elif not os.path.exists(index_path):
             st.error("No index found. Please run ingestion first.")
-        elif not os.getenv("OPENROUTER_API_KEY"):
+        elif not os.getenv("OPENROUTER_API_KEY") and not QueryClient().is_available():
             st.error("Missing OPENROUTER_API_KEY.")
         else:
-            with st.spinner("Analyzing logs with AI..."):
-                rag = RAGEngine(index_path=index_path)
-                result = rag.analyze_incident(query, k=5)
-                
-                st.success("Analysis Complete")
-                st.markdown("### 🤖 root Cause Analysis")
-                st.info(result["answer"])
-                
-                with st.expander("📂 View Retrieved Log Evidence"):
-                    for i, log in enumerate(result["source_logs"]):
-                        st.markdown(f"**Chunk {i+1}**")
-                        st.code(log, language="json")
+            with st.spinner("Retrieving relevant logs..."):
+                events = analyze(query, filters)
+                source_logs = next(events)["source_logs"]
+
+            st.markdown("### 🤖 root Cause Analysis")
+            result = {}
+
+            def answer_tokens():
+                for event in events:
+                    if event["type"] == "token":
+                        yield event["text"]
+                    elif event["type"] == "done":
+                        result["answer"] = event["answer"]
+
+            streamed = st.write_stream(answer_tokens())
+            if not streamed:
+                st.info(result.get("answer", ""))
+            st.success("Analysis Complete")
+
+            with st.expander("📂 View Retrieved Log Evidence"):
+                for i, log in enumerate(source_logs):
+                    st.markdown(f"**Chunk {i+1}**")
+                    st.code(log, language="json")
 
 with col2:
     st.subheader("📁 System Status")
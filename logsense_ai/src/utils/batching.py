@@ -0,0 +1,16 @@
+from itertools import islice
+
+
+def batched(iterable, batch_size):
+    """
+    Yields lists of up to `batch_size` items from `iterable`, holding only
+    one batch in memory at a time.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,370 @@
+import bisect
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+METRIC_PREFIX = "logsense_"
+# Seconds; covers a cached query lookup up to a full index rebuild.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+PROFILERS = ("cprofile", "tracemalloc")
+STAGE_SECONDS = "stage_seconds"
+STAGE_ITEMS = "stage_items_total"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(items):
+    if not items:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in items)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+
+class Counter(_Metric):
+    """
+    Monotonic total per label set.
+    """
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+    def prometheus(self, name):
+        with self._lock:
+            return [f"{name}{_format_labels(key)} {_format_value(value)}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """
+    Last value per label set.
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Distribution per label set: bucket counts, sum, count and max.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last is +Inf), sum, count, max]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, value]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+            state[3] = max(state[3], value)
+
+    def _cumulative(self, counts):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            yield bound, total
+
+    def snapshot(self):
+        with self._lock:
+            return [{
+                "labels": dict(key),
+                "count": count,
+                "sum": round(total, 6),
+                "max": round(peak, 6),
+                "buckets": {_format_value(bound): cumulative for bound, cumulative in self._cumulative(counts)},
+            } for key, (counts, total, count, peak) in self._values.items()]
+
+    def prometheus(self, name):
+        lines = []
+        with self._lock:
+            for key, (counts, total, count, _) in self._values.items():
+                for bound, cumulative in self._cumulative(counts):
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(float(total))}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class StageTimer:
+    """
+    Exclusive wall-clock timer for one stage. Starting a timer pauses the
+    one already running on this thread, so time spent in a nested stage
+    (e.g. embedding inside an index insert) is charged to that stage only
+    and stage times add up to the elapsed time. Can be started and stopped
+    repeatedly; `elapsed` accumulates. Never yield while one is running.
+    """
+    __slots__ = ("registry", "stage", "elapsed", "_resumed")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self.elapsed = 0.0
+        self._resumed = None
+
+    def start(self):
+        now = time.perf_counter()
+        stack = self.registry._stack()
+        if stack:
+            parent = stack[-1]
+            parent.elapsed += now - parent._resumed
+        self._resumed = now
+        stack.append(self)
+
+    def stop(self):
+        now = time.perf_counter()
+        stack = self.registry._stack()
+        stack.pop()
+        self.elapsed += now - self._resumed
+        if stack:
+            stack[-1]._resumed = now
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.registry.record_stage(self.stage, self.elapsed)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: counters, gauges and histograms addressed by name
+    and labels, exported as Prometheus text (`to_prometheus`) or JSON
+    (`snapshot`). Names are prefixed with `prefix` on export.
+
+    Pipeline and query stages are timed with `timer(stage)` (a block) or
+    `time_iter(iterable, stage)` (the time a lazy iterable spends producing
+    items) and recorded in the `stage_seconds` histogram and the
+    `stage_items_total` counter, labelled by stage.
+    """
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help_text, **kwargs)
+        if not isinstance(metric, cls):
+            raise TypeError(f"Metric {name} is a {metric.kind}, not a {cls.kind}")
+        return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record_stage(self, stage, seconds, items=None):
+        self.histogram(STAGE_SECONDS, "Exclusive wall-clock seconds per stage run").observe(seconds, stage=stage)
+        if items:
+            self.counter(STAGE_ITEMS, "Items produced per stage").inc(items, stage=stage)
+
+    def timer(self, stage):
+        return StageTimer(self, stage)
+
+    def time_iter(self, iterable, stage):
+        """
+        Yields from `iterable`, timing only the work of producing each item
+        (not the consumer's). Records one `stage` observation with the total,
+        and the item count, once the iterable is exhausted or closed.
+        """
+        iterator = iter(iterable)
+        timer = StageTimer(self, stage)
+        items = 0
+        try:
+            while True:
+                timer.start()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    timer.stop()
+                items += 1
+                yield item
+        finally:
+            if items or timer.elapsed:
+                self.record_stage(stage, timer.elapsed, items)
+
+    def stage_totals(self):
+        """
+        {stage: total seconds} over all runs so far.
+        """
+        metric = self._metrics.get(STAGE_SECONDS)
+        if metric is None:
+            return {}
+        return {sample["labels"]["stage"]: sample["sum"] for sample in metric.snapshot()}
+
+    def snapshot(self):
+        """
+        JSON-serialisable view of every metric.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            self.prefix + metric.name: {"type": metric.kind, "help": metric.help, "samples": metric.snapshot()}
+            for metric in metrics
+        }
+
+    def to_prometheus(self):
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            name = self.prefix + metric.name
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.prometheus(name))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, extra=None):
+        """
+        Writes the metrics to `path`: Prometheus text if it ends with ".prom"
+        (e.g. for the node_exporter textfile collector), JSON otherwise, with
+        `extra` (e.g. run parameters) under "run".
+        """
+        if path.endswith(".prom"):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps({"run": extra or {}, "stages": self.stage_totals(), "metrics": self.snapshot()}, indent=2) + "\n"
+        # Replaced atomically so a scraper never reads a half-written file.
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+
+# Process-wide registry used by the pipeline, indexer, RAG engine and server.
+REGISTRY = MetricsRegistry()
+
+
+def timer(stage):
+    return REGISTRY.timer(stage)
+
+
+def time_iter(iterable, stage):
+    return REGISTRY.time_iter(iterable, stage)
+
+
+def format_stage_totals(totals):
+    """
+    "embed 12.31s, store_add 1.02s, ..." slowest first.
+    """
+    return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in sorted(totals.items(), key=lambda item: -item[1]))
+
+
+@contextmanager
+def profile(mode, output=None, limit=25):
+    """
+    Profiles the enclosed block. `mode` is "cprofile" (CPU time per
+    function; stats dumped to `output` for snakeviz/pstats) or "tracemalloc"
+    (Python allocations; the top allocation sites are written to `output`).
+    Either way a summary is logged. `None` profiles nothing.
+    """
+    logger = logging.getLogger(__name__)
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILERS:
+        raise ValueError(f"Unknown profiler {mode!r}; expected one of {', '.join(PROFILERS)}")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(limit)
+            logger.info(f"cProfile summary:\n{summary.getvalue()}")
+            if output:
+                profiler.dump_stats(output)
+                logger.info(f"cProfile stats written to {output}")
+        return
+
+    tracemalloc.start(25)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        REGISTRY.gauge("tracemalloc_peak_bytes", "Peak Python heap while profiling").set(peak)
+        lines = [f"Peak traced memory {peak / (1 << 20):.1f} MB, {current / (1 << 20):.1f} MB still allocated. Top allocation sites:"]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+        logger.info("\n".join(lines))
+        if output:
+            with open(output, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            logger.info(f"tracemalloc report written to {output}")
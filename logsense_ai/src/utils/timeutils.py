@@ -0,0 +1,60 @@
+import re
+import time
+from datetime import datetime
+
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_timestamp(value):
+    """
+    Parses an ISO-8601 log timestamp into a datetime.
+    Returns None for missing or unparseable values.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def to_epoch(value):
+    """
+    Converts an ISO-8601 timestamp (or datetime) into POSIX seconds.
+    Naive timestamps are interpreted as local time, matching how
+    `generate_logs.py` writes them. Returns None if unparseable.
+    """
+    if not isinstance(value, datetime):
+        value = parse_timestamp(value)
+    if value is None:
+        return None
+    return value.timestamp()
+
+
+def parse_duration(value):
+    """
+    Parses a duration such as "30m", "12h" or "7d" into seconds.
+    Raises ValueError for anything else.
+    """
+    match = _DURATION.match(value or "")
+    if not match:
+        raise ValueError(f"Invalid duration '{value}': use e.g. 30m, 12h, 7d or 2w")
+    amount, unit = match.groups()
+    return float(amount) * _UNIT_SECONDS[unit]
+
+
+def parse_time_bound(value, now=None):
+    """
+    Parses a CLI time bound into POSIX seconds. Accepts a relative duration
+    ("30m", "1h", "2d" meaning that long ago) or an ISO-8601 timestamp.
+    Raises ValueError for anything else.
+    """
+    if value is None:
+        return None
+    if _DURATION.match(value):
+        return (time.time() if now is None else now) - parse_duration(value)
+    epoch = to_epoch(value)
+    if epoch is None:
+        raise ValueError(f"Invalid time '{value}': use a duration like 30m/1h/2d or an ISO-8601 timestamp")
+    return epoch
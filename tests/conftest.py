@@ -0,0 +1,25 @@
+import pytest
+from logsense_ai.benchmarks.run import HashingEmbedder, _HashingModel
+from logsense_ai.src.models.embedder import BatchEmbedder
+
+EMBEDDING_DIMENSION = 32
+
+
+@pytest.fixture
+def embeddings():
+    """
+    A feature-hashing embedder: no model download, deterministic vectors.
+    """
+    embedder = HashingEmbedder(dimension=EMBEDDING_DIMENSION, log_progress=False)
+    yield embedder
+    embedder.close()
+
+
+@pytest.fixture
+def hashing_model(monkeypatch):
+    """
+    Makes every `BatchEmbedder` (e.g. the one `run_pipeline` creates) use the hashing model.
+    """
+    model = _HashingModel(EMBEDDING_DIMENSION)
+    monkeypatch.setattr(BatchEmbedder, "model", property(lambda self: model))
+    return model
@@ -0,0 +1,23 @@
+import json
+from datetime import datetime, timedelta
+
+BASE_TIME = datetime(2026, 10, 1, 12, 0, 0)
+
+
+def log_line(i, service="api", level=None, seconds=None, message=None):
+    """
+    One JSON log line; entry `i` is `i` seconds (or `seconds`) after `BASE_TIME`.
+    """
+    timestamp = BASE_TIME + timedelta(seconds=i if seconds is None else seconds)
+    return json.dumps({
+        "timestamp": timestamp.isoformat(),
+        "level": level or ("ERROR" if i % 5 == 0 else "INFO"),
+        "service": service,
+        "message": message or f"request {i} handled id={i * 7}",
+    }) + "\n"
+
+
+def write_log(path, lines, mode="w"):
+    with open(path, mode) as f:
+        f.writelines(lines)
+    return str(path)
@@ -0,0 +1,14 @@
+from logsense_ai.src.processing.anomaly import template_key
+from logsense_ai.src.processing.templates import mask_message
+
+
+def test_template_key_masks_what_mask_message_masks():
+    assert template_key("payment failed for txn-efbbcccabefb") == template_key("payment failed for txn-aaaabbbbcccc")
+    assert template_key("payment failed for txn-efbbcccabefb") == "payment failed for txn-<*>"
+    assert template_key("user bob@example.com sent abcdefab-abcd-abcd-abcd-abcdefabcdef at 0xff") == "user <*> sent <*> at <*>"
+    assert mask_message("payment failed for txn-efbbcccabefb") == "payment failed for txn-<HEX>"
+
+
+def test_template_key_masks_tokens_with_digits_and_keeps_words():
+    assert template_key("GET /orders/123 took 45ms from 10.0.0.1:8080") == "GET <*> took <*> from <*>"
+    assert template_key("connection reset by peer, decaf faded") == "connection reset by peer, decaf faded"
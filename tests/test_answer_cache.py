@@ -0,0 +1,48 @@
+import numpy as np
+from langchain_core.documents import Document
+from logsense_ai.src.models.answer_cache import AnswerCache, evidence_key
+
+EVIDENCE = evidence_key([Document(page_content="db timeout"), Document(page_content="pool exhausted")])
+
+
+def test_similar_question_with_same_evidence_hits():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put([1.0, 0.0], EVIDENCE, "v000001", "pool exhausted")
+    assert cache.get([0.99, 0.05], EVIDENCE, "v000001") == "pool exhausted"
+    assert cache.get([0.0, 1.0], EVIDENCE, "v000001") is None
+    assert cache.get([1.0, 0.0], evidence_key([Document(page_content="db timeout")]), "v000001") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def test_evidence_key_ignores_order():
+    docs = [Document(page_content="a"), Document(page_content="b", metadata={"content_hash": "h"})]
+    assert evidence_key(docs) == evidence_key(docs[::-1])
+
+
+def test_other_versions_miss_without_evicting_each_other():
+    cache = AnswerCache()
+    cache.put([1.0, 0.0], EVIDENCE, "v000002", "new answer")
+    # A request still on the previous version (mid hot-reload) must not wipe the new one.
+    assert cache.get([1.0, 0.0], EVIDENCE, "v000001") is None
+    assert cache.get([1.0, 0.0], EVIDENCE, "v000002") == "new answer"
+
+
+def test_entries_expire_and_lru_is_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("logsense_ai.src.models.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(ttl=60, max_entries=2)
+    cache.put([1.0, 0.0], EVIDENCE, "v1", "first")
+    now[0] += 61
+    assert cache.get([1.0, 0.0], EVIDENCE, "v1") is None and len(cache) == 0
+
+    for i, vector in enumerate(np.eye(3)):
+        cache.put(vector, EVIDENCE, "v1", f"answer {i}")
+    assert len(cache) == 2 and cache.get(np.eye(3)[0], EVIDENCE, "v1") is None
+
+
+def test_string_keys_match_exactly():
+    cache = AnswerCache()
+    cache.put("err-4521", EVIDENCE, "v1", "bad card")
+    assert cache.get("err-4521", EVIDENCE, "v1") == "bad card"
+    assert cache.get("err-4522", EVIDENCE, "v1") is None
+    assert cache.get([1.0, 0.0], EVIDENCE, "v1") is None
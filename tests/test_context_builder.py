@@ -0,0 +1,52 @@
+import pytest
+from logsense_ai.src.models import context_builder
+from logsense_ai.src.models.context_builder import ContextBuilder, count_tokens
+
+
+@pytest.fixture(autouse=True)
+def length_tokens(monkeypatch):
+    """
+    Counts ~4 characters per token, so budgets do not depend on a tiktoken download.
+    """
+    monkeypatch.setattr(context_builder, "_encoding", None)
+    monkeypatch.setattr(context_builder, "_encoding_failed", True)
+
+
+def entry(second, message, level="ERROR", service="api"):
+    return f"[2026-10-01T12:00:{second:02d}] {level} [{service}]: {message}"
+
+
+def test_entries_are_admitted_by_rank_and_emitted_in_time_order():
+    texts = [entry(30, "db pool exhausted"), entry(10, "cache miss storm"), entry(20, "queue backlog growing")]
+    context, stats = ContextBuilder().build(texts)
+    assert context.splitlines() == [texts[1], texts[2], texts[0]]
+    assert stats["included_entries"] == stats["unique_entries"] == 3
+
+
+def test_budget_keeps_the_best_ranked_entries():
+    texts = [entry(30, "best match " + "x" * 40), entry(10, "second " + "y" * 40), entry(20, "third " + "z" * 40)]
+    budget = 2 * (count_tokens(texts[0]) + 1)
+    context, stats = ContextBuilder(token_budget=budget).build(texts)
+    assert context.splitlines() == [texts[1], texts[0]]
+    assert stats["included_entries"] == 2 and stats["tokens"] <= budget
+
+
+def test_budget_smaller_than_one_entry_keeps_its_head():
+    text = entry(0, "stack overflow in " + "frame " * 50)
+    context, stats = ContextBuilder(token_budget=5).build([text])
+    assert context == text[:20] and stats["included_entries"] == 1
+
+
+def test_near_duplicates_collapse_into_one_annotated_entry():
+    texts = [entry(5, "request 17 failed for user 42"), entry(1, "request 18 failed for user 43"),
+             entry(9, "request 19 failed for user 44"), entry(3, "disk full on /var", service="db")]
+    context, stats = ContextBuilder().build(texts)
+    assert stats["entries"] == 4 and stats["unique_entries"] == 2
+    # The group sorts by its first occurrence.
+    assert context.splitlines() == [texts[0] + " (x3, 2026-10-01T12:00:01 to 2026-10-01T12:00:09)", texts[3]]
+
+
+def test_overlapping_splits_of_one_entry_are_stitched_back():
+    text = entry(0, "worker crashed while flushing the write-ahead log to disk")
+    context, stats = ContextBuilder().build([text[:45], text[25:]])
+    assert context == text and stats["unique_entries"] == 1
@@ -0,0 +1,55 @@
+import os
+import pytest
+from logsense_ai.src.models.docstore import DOCSTORE_FILENAME, DocStore
+
+
+def save_and_reopen(store, directory):
+    os.makedirs(directory)
+    store.save(str(directory))
+    store.close()
+    return DocStore(os.path.join(str(directory), DOCSTORE_FILENAME))
+
+
+def test_added_rows_are_staged_outside_memory_until_saved(tmp_path):
+    store = DocStore()
+    store.add(["a", "b"], metadatas=[{"content_hash": "ha"}, None])
+    assert len(store) == 2 and store._staging is not None
+    assert [doc.page_content for doc in store.get_many([1, 0])] == ["b", "a"]
+
+    store.update_metadata(1, {"service": "api"})
+    assert store.get(1).metadata == {"service": "api"}
+    assert store.find_hashes(["ha", "missing"]) == {"ha": 0}
+
+    store = save_and_reopen(store, tmp_path / "v1")
+    assert len(store) == 2 and store._staging is None
+    assert store.get(1).metadata == {"service": "api"}
+    assert store.find_hashes(["ha"]) == {"ha": 0}
+    store.close()
+
+
+def test_rows_and_updates_on_top_of_a_saved_database(tmp_path):
+    store = DocStore()
+    store.add(["a", "b"])
+    store = save_and_reopen(store, tmp_path / "v1")
+
+    store.add(["c"], metadatas=[{"content_hash": "hc"}])
+    store.update_metadata(0, {"occurrences": 2})
+    docs = store.get_many([2, 0, 1])
+    assert [doc.page_content for doc in docs] == ["c", "a", "b"]
+    assert [doc.metadata for doc in docs] == [{"content_hash": "hc"}, {"occurrences": 2}, {}]
+
+    store = save_and_reopen(store, tmp_path / "v2")
+    assert len(store) == 3
+    assert store.get(0).metadata == {"occurrences": 2}
+    assert store.find_hashes(["hc"]) == {"hc": 2}
+    # The published database is untouched by later saves.
+    assert DocStore(str(tmp_path / "v1" / DOCSTORE_FILENAME)).get(0).metadata == {}
+    store.close()
+
+
+def test_saving_after_close_refuses_to_drop_staged_rows(tmp_path):
+    store = DocStore()
+    store.add(["a"])
+    store.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        store.save(str(tmp_path))
@@ -0,0 +1,38 @@
+import warnings
+import numpy as np
+from logsense_ai.benchmarks.run import _HashingModel
+from logsense_ai.src.models.embedder import BatchEmbedder
+
+
+class PoolModel(_HashingModel):
+    """
+    Hashing model that records how the embedder drives the multi-process pool.
+    """
+    def __init__(self, dimension):
+        super().__init__(dimension)
+        self.pool_calls = []
+
+    def start_multi_process_pool(self, target_devices):
+        return {"devices": target_devices}
+
+    def stop_multi_process_pool(self, pool):
+        pass
+
+    def encode(self, texts, pool=None, **kwargs):
+        if pool is not None:
+            self.pool_calls.append((pool, kwargs))
+        return super().encode(texts, **kwargs)
+
+
+def test_multi_worker_batches_use_the_pool_without_deprecated_calls(monkeypatch):
+    model = PoolModel(16)
+    monkeypatch.setattr(BatchEmbedder, "model", property(lambda self: model))
+    embedder = BatchEmbedder(batch_size=4, workers=2, log_progress=False)
+    texts = [f"entry {i} " + "x" * (i % 7) for i in range(10)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        vectors = embedder.encode(texts)
+    assert [(pool, kwargs["batch_size"]) for pool, kwargs in model.pool_calls] == [({"devices": ["cpu", "cpu"]}, 4)]
+    # Length-bucketed batching must not reorder the output.
+    np.testing.assert_allclose(vectors, _HashingModel(16).encode(texts))
+    embedder.close()
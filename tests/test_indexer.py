@@ -0,0 +1,23 @@
+import os
+import time
+from helpers import log_line, write_log
+from logsense_ai.src.indexer import StreamingIndexer
+
+
+def test_checkpoint_keeps_the_inode_lines_were_read_from(tmp_path, hashing_model):
+    path = write_log(tmp_path / "app.log", [log_line(i) for i in range(3)])
+    indexer = StreamingIndexer([path], str(tmp_path / "index"), use_embedding_cache=False)
+    old_inode = os.stat(path).st_ino
+    raw = log_line(2).encode()
+    offset = os.path.getsize(path) - len(raw)
+    entry = indexer.ingestor.parser_for(path).parse(raw)
+
+    # Rotated after the line was read but before its batch was indexed.
+    os.rename(path, path + ".1")
+    write_log(path, [log_line(9)])
+    indexer.index_batch([(path, entry, offset, raw, old_inode, time.time())])
+
+    checkpoint = indexer.checkpoints.get(path)
+    assert (checkpoint.inode, checkpoint.offset) == (old_inode, offset + len(raw))
+    assert not indexer.ingestor.validate_checkpoint(path, checkpoint)
+    indexer.vector_store.close()
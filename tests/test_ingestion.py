@@ -0,0 +1,188 @@
+import gzip
+import os
+import threading
+import pytest
+from helpers import log_line, write_log
+from logsense_ai.src.ingestion.ingestor import LogIngestor
+from logsense_ai.src.ingestion.parsers import detect_format
+from logsense_ai.src.ingestion.sources import MultiFileSource, expand_sources
+from logsense_ai.src.utils.timeutils import to_epoch
+
+
+def test_reads_plain_and_gzip_logs(tmp_path):
+    lines = [log_line(i) for i in range(50)]
+    plain = write_log(tmp_path / "app.log", lines)
+    compressed = str(tmp_path / "app.log.1.gz")
+    with gzip.open(compressed, "wt") as f:
+        f.writelines(lines)
+
+    ingestor = LogIngestor()
+    assert ingestor.load_file(plain) == ingestor.load_file(compressed)
+    assert len(ingestor.load_file(compressed)) == 50
+
+
+def test_resumes_from_checkpoint(tmp_path):
+    path = write_log(tmp_path / "app.log", [log_line(i) for i in range(10)])
+    ingestor = LogIngestor()
+    logs, checkpoint, resumed = ingestor.load_appended(path)
+    assert len(logs) == 10 and not resumed
+
+    write_log(path, [log_line(i) for i in range(10, 15)], mode="a")
+    logs, checkpoint, resumed = ingestor.load_appended(path, checkpoint)
+    assert resumed
+    assert [log["message"] for log in logs] == [f"request {i} handled id={i * 7}" for i in range(10, 15)]
+
+    logs, _, resumed = ingestor.load_appended(path, checkpoint)
+    assert resumed and logs == []
+
+
+def test_resumes_gzip_from_checkpoint(tmp_path):
+    path = str(tmp_path / "app.log.gz")
+    with gzip.open(path, "wt") as f:
+        f.writelines(log_line(i) for i in range(20))
+    ingestor = LogIngestor()
+    _, checkpoint, _ = ingestor.load_appended(path)
+    logs, _, resumed = ingestor.load_appended(path, checkpoint)
+    assert resumed and logs == []
+
+
+def test_partial_trailing_line_waits_for_the_rest(tmp_path):
+    path = write_log(tmp_path / "app.log", [log_line(0), log_line(1)[:20]])
+    ingestor = LogIngestor(log_format="json")
+    logs, checkpoint, _ = ingestor.load_appended(path)
+    assert len(logs) == 1
+
+    write_log(path, [log_line(1)[20:]], mode="a")
+    logs, _, resumed = ingestor.load_appended(path, checkpoint)
+    assert resumed and len(logs) == 1
+
+
+def test_rotation_truncation_and_rewrite_restart_from_the_top(tmp_path):
+    path = write_log(tmp_path / "app.log", [log_line(i) for i in range(10)])
+    ingestor = LogIngestor()
+    _, checkpoint, _ = ingestor.load_appended(path)
+
+    # Rewritten in place with different content of the same size.
+    write_log(path, [log_line(i, service="abc") for i in range(10)])
+    assert not ingestor.validate_checkpoint(path, checkpoint)
+
+    # Truncated.
+    write_log(path, [log_line(0)])
+    assert not ingestor.validate_checkpoint(path, checkpoint)
+
+    # Rotated: a new file (new inode) under the same name.
+    write_log(path, [log_line(i) for i in range(10)])
+    _, checkpoint, _ = ingestor.load_appended(path)
+    os.rename(path, path + ".1")
+    write_log(path, [log_line(i) for i in range(12)])
+    logs, _, resumed = ingestor.load_appended(path, checkpoint)
+    assert not resumed and len(logs) == 12
+
+
+def test_detects_formats_and_joins_stack_traces(tmp_path):
+    nginx = '10.0.0.1 - - [01/Oct/2026:12:00:01 +0000] "GET /x HTTP/1.1" 502 12 "-" "curl"\n'
+    assert detect_format([log_line(0).encode()]) == "json"
+    assert detect_format([nginx.encode()]) == "nginx"
+    assert detect_format([b"ts=2026-10-01T12:00:00Z level=error msg=boom svc=api\n"]) == "logfmt"
+
+    path = write_log(tmp_path / "worker.log", [
+        "2026-10-01T12:00:00 ERROR job 1 failed\n",
+        "Traceback (most recent call last):\n",
+        "  File \"job.py\", line 3, in run\n",
+        "2026-10-01T12:00:01 INFO job 2 ok\n",
+    ])
+    logs = LogIngestor().load_file(path)
+    assert [log["level"] for log in logs] == ["ERROR", "INFO"]
+    assert "job.py" in logs[0]["stack_trace"]
+    assert logs[0]["service"] == "worker"
+
+
+def test_multi_file_source_merges_by_timestamp(tmp_path):
+    (tmp_path / "logs").mkdir()
+    write_log(tmp_path / "logs" / "api.log", [log_line(i, service="api") for i in range(0, 40, 2)])
+    write_log(tmp_path / "logs" / "db.log", [log_line(i, service="db") for i in range(1, 40, 2)])
+    paths = expand_sources(str(tmp_path / "logs"))
+    assert len(paths) == 2
+
+    source = MultiFileSource(LogIngestor(), paths, workers=2, batch_size=3)
+    entries, checkpoints, resumed = source.iter_appended()
+    timestamps = [to_epoch(entry["timestamp"]) for entry in entries]
+    assert len(timestamps) == 40 and timestamps == sorted(timestamps)
+    assert len(checkpoints) == 2 and all(cp.offset > 0 for cp in checkpoints)
+
+
+def write_zstd(path, lines):
+    zstandard = pytest.importorskip("zstandard")
+    with open(path, "wb") as f:
+        f.write(zstandard.ZstdCompressor().compress("".join(lines).encode()))
+    return str(path)
+
+
+def test_reads_and_resumes_zstd_logs(tmp_path):
+    path = write_zstd(tmp_path / "app.log.1.zst", [log_line(i) for i in range(30)])
+    ingestor = LogIngestor()
+    entries, checkpoint, resumed = ingestor.iter_appended(path)
+    assert len(list(entries)) == 30 and not resumed
+    assert checkpoint.offset > 0 and ingestor.validate_checkpoint(path, checkpoint)
+
+    # A zstd stream cannot seek: resuming reads forward to the checkpoint.
+    logs, _, resumed = ingestor.load_appended(path, checkpoint)
+    assert resumed and logs == []
+
+
+def test_pipeline_indexes_zstd_logs(tmp_path, hashing_model):
+    from logsense_ai.src.models.vector_store import LogVectorStore
+    from logsense_ai.src.pipeline import run_pipeline
+
+    path = write_zstd(tmp_path / "app.log.zst", [log_line(i) for i in range(40)])
+    index_path = str(tmp_path / "index")
+    run_pipeline(path, index_path, use_embedding_cache=False, chunking="entry")
+    run_pipeline(path, index_path, incremental=True, use_embedding_cache=False, chunking="entry")
+
+    store = LogVectorStore(index_path=index_path, embedding_batch_size=8)
+    store.load(read_only=True)
+    assert store.index.ntotal == 40
+    store.close()
+
+
+def test_monitor_stream_reports_the_inode_each_line_came_from(tmp_path):
+    path = write_log(tmp_path / "app.log", [log_line(0)])
+    old_inode = os.stat(path).st_ino
+    stop = threading.Event()
+    stream = LogIngestor().monitor_stream(path, poll_interval=0.05, start_offset=0, stop_event=stop, with_offsets=True)
+    _, line_offset, raw, inode = next(stream)
+    assert (line_offset, inode) == (0, old_inode)
+
+    os.rename(path, path + ".1")
+    write_log(path, [log_line(1)])
+    _, line_offset, raw, inode = next(stream)
+    stop.set()
+    assert (line_offset, raw.decode()) == (0, log_line(1))
+    assert inode == os.stat(path).st_ino != old_inode
+
+
+@pytest.mark.parametrize("chunking", ["entry", "grouped"])
+def test_parallel_parser_matches_the_sequential_path(tmp_path, chunking):
+    from logsense_ai.src.ingestion.parallel import ParallelParser
+    from logsense_ai.src.processing.processor import LogProcessor
+
+    lines = [log_line(i, service=("api", "db")[i % 2], level="ERROR" if i % 7 == 0 else "INFO") for i in range(300)]
+    path = write_log(tmp_path / "app.log", lines[:200] + ["not json\n"] + lines[200:])
+    ingestor = LogIngestor(log_format="json")
+    # Small ranges, so the file is split across many tasks and both workers.
+    parser = ParallelParser(workers=2, range_bytes=2048, chunking=chunking)
+
+    entries, checkpoint, _ = ingestor.iter_appended(path)
+    entries = list(entries)
+    items, parallel_checkpoint, _ = ingestor.iter_appended_parallel(path, parser, documents=False)
+    assert list(items) == entries and len(entries) == 300
+    assert vars(parallel_checkpoint) == vars(checkpoint)
+
+    documents = list(LogProcessor(chunking=chunking).iter_documents(entries))
+    items = list(ingestor.iter_appended_parallel(path, parser)[0])
+    if chunking == "entry":
+        assert items == documents
+    else:
+        # Grouped chunks never span two ranges, so only the entries they cover must match.
+        lines = [line for text, _ in items for line in text.splitlines()]
+        assert sorted(lines) == sorted(line for text, _ in documents for line in text.splitlines())
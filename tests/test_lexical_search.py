@@ -0,0 +1,57 @@
+import pytest
+from logsense_ai.src.models.lexical_index import exact_query_terms
+from logsense_ai.src.models.vector_store import LogVectorStore
+
+TEXTS = [
+    "[2026-10-01T12:00:00] ERROR [payments]: charge failed ERR_CARD_DECLINED txn=a1",
+    "[2026-10-01T12:00:05] INFO [payments]: charge retried for txn=a1",
+    "[2026-10-01T12:00:10] ERROR [payments]: charge failed ERR_CARD_DECLINED txn=b2",
+    "[2026-10-01T12:00:20] ERROR [api]: upstream returned 504 for /checkout",
+    "[2026-10-01T12:00:30] WARN [api]: ConnectionRefusedError talking to db-7",
+]
+METADATAS = [{"service": service, "level": level} for service, level in
+             [("payments", "ERROR"), ("payments", "INFO"), ("payments", "ERROR"), ("api", "ERROR"), ("api", "WARN")]]
+
+
+@pytest.fixture
+def store(tmp_path, embeddings):
+    store = LogVectorStore(index_path=str(tmp_path / "index"), embeddings=embeddings)
+    store.add_texts(TEXTS, metadatas=METADATAS)
+    return store
+
+
+def no_embedding(text):
+    raise AssertionError(f"embedded {text!r}")
+
+
+def test_identifier_queries_are_recognised():
+    assert exact_query_terms("ERR_CARD_DECLINED") == ["err_card_declined"]
+    assert exact_query_terms("504") == ["504"]
+    assert exact_query_terms("ConnectionRefusedError") == ["connectionrefusederror"]
+    assert exact_query_terms("why did the card charge fail") is None
+
+
+def test_identifier_query_returns_exact_matches_newest_first_without_embedding(store, monkeypatch):
+    monkeypatch.setattr(store.embeddings, "embed_query", no_embedding)
+    docs = store.search("ERR_CARD_DECLINED", k=5)
+    assert [doc.page_content for doc in docs] == [TEXTS[2], TEXTS[0]]
+    assert [doc.page_content for doc in store.search("504", k=5)] == [TEXTS[3]]
+    assert [doc.page_content for doc in store.search("ConnectionRefusedError", k=5)] == [TEXTS[4]]
+    assert store.search("ERR_CARD_DECLINED", k=1)[0].page_content == TEXTS[2]
+
+
+def test_identifier_query_respects_filters_and_falls_back_when_absent(store, monkeypatch):
+    assert [doc.page_content for doc in store.search("txn=a1", k=5, filters={"level": "INFO"})] == [TEXTS[1]]
+    # No chunk contains the identifier: ranked (hybrid) search answers instead.
+    docs = store.search("ERR_TIMEOUT_42", k=2)
+    assert len(docs) == 2
+
+    monkeypatch.setattr(store.embeddings, "embed_query", no_embedding)
+    with pytest.raises(AssertionError, match="embedded"):
+        store.search("ERR_CARD_DECLINED", k=5, mode="vector")
+
+
+def test_lexical_mode_ranks_by_bm25(store, monkeypatch):
+    monkeypatch.setattr(store.embeddings, "embed_query", no_embedding)
+    docs = store.search("charge retried", k=2, mode="lexical")
+    assert docs[0].page_content == TEXTS[1]
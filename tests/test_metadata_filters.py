@@ -0,0 +1,121 @@
+from datetime import timedelta
+import pytest
+from helpers import BASE_TIME
+from logsense_ai.src.models.metadata_index import MetadataIndex
+from logsense_ai.src.models.vector_store import LogVectorStore
+
+
+def epoch(seconds):
+    return (BASE_TIME + timedelta(seconds=seconds)).timestamp()
+
+
+def metadata(i, service="api", level="INFO"):
+    return {"service": service, "level": level, "timestamp": (BASE_TIME + timedelta(seconds=i)).isoformat()}
+
+
+@pytest.fixture
+def store(tmp_path, embeddings):
+    store = LogVectorStore(index_path=str(tmp_path / "index"), embeddings=embeddings)
+    texts = [f"event {i} on node {i % 3}" for i in range(30)]
+    metadatas = [metadata(i, service=("api", "db", "cache")[i % 3], level="ERROR" if i % 5 == 0 else "INFO")
+                 for i in range(30)]
+    store.add_texts(texts, metadatas=metadatas)
+    return store
+
+
+def test_candidates_apply_every_filter():
+    index = MetadataIndex()
+    index.add([metadata(i, service="api" if i % 2 else "db", level="ERROR" if i % 3 == 0 else "INFO") for i in range(12)])
+    assert list(index.candidates(service="db")) == [0, 2, 4, 6, 8, 10]
+    assert list(index.candidates(level=["ERROR"])) == [0, 3, 6, 9]
+    assert list(index.candidates(service="db", level="ERROR")) == [0, 6]
+    assert list(index.candidates(since=epoch(8))) == [8, 9, 10, 11]
+    assert list(index.candidates(until=epoch(2))) == [0, 1, 2]
+    assert list(index.candidates(service="api", since=epoch(4), until=epoch(9))) == [5, 7, 9]
+    assert list(index.candidates(service="missing")) == []
+
+
+def test_unknown_timestamps_are_excluded_from_time_filters():
+    index = MetadataIndex()
+    index.add([metadata(0), {"service": "api"}, metadata(2)])
+    assert list(index.candidates(since=epoch(0))) == [0, 2]
+    assert list(index.candidates(service="api")) == [0, 1, 2]
+
+
+def test_template_rows_cover_their_first_and_last_seen():
+    index = MetadataIndex()
+    index.add([{"first_seen": (BASE_TIME).isoformat(), "last_seen": (BASE_TIME + timedelta(hours=1)).isoformat()}])
+    assert list(index.candidates(since=epoch(1800), until=epoch(1800))) == [0]
+    assert list(index.candidates(since=epoch(7200))) == []
+
+
+def test_similarity_search_only_returns_matching_documents(store):
+    docs = store.similarity_search("event on node", k=30, filters={"service": "db", "level": "ERROR"})
+    assert docs and all(doc.metadata["service"] == "db" and doc.metadata["level"] == "ERROR" for doc in docs)
+    assert {doc.page_content for doc in docs} == {"event 10 on node 1", "event 25 on node 1"}
+
+    docs = store.similarity_search("event", k=30, filters={"since": epoch(20), "until": epoch(24)})
+    assert sorted(doc.page_content for doc in docs) == sorted(f"event {i} on node {i % 3}" for i in range(20, 25))
+
+    assert store.similarity_search("event", k=5, filters={"service": "missing"}) == []
+
+
+def test_filters_survive_save_and_read_only_load(tmp_path, store, embeddings):
+    store.save()
+    loaded = LogVectorStore(index_path=store.index_path, embeddings=embeddings)
+    loaded.load(read_only=True)
+    docs = loaded.similarity_search("event", k=30, filters={"service": ["api", "cache"], "since": epoch(27)})
+    assert sorted(doc.page_content for doc in docs) == ["event 27 on node 0", "event 29 on node 2"]
+    loaded.docstore.close()
+
+
+def test_deduplicated_repeats_widen_the_time_range(tmp_path, embeddings):
+    store = LogVectorStore(index_path=str(tmp_path / "index"), embeddings=embeddings, dedupe=True)
+    store.add_texts(["disk full on /var", "other"], metadatas=[metadata(0), metadata(1)])
+    # Repeated later, once in a new batch and twice within one.
+    store.add_texts(["disk full on /var"], metadatas=[metadata(600)])
+    store.add_texts(["disk full on /var", "disk full on /var"], metadatas=[metadata(900), metadata(300)])
+
+    docs = store.similarity_search("disk full", k=5, filters={"since": epoch(800)})
+    assert [doc.page_content for doc in docs] == ["disk full on /var"]
+    assert docs[0].metadata["occurrences"] == 4
+    assert docs[0].metadata["first_seen"] == metadata(0)["timestamp"]
+    assert docs[0].metadata["last_seen"] == metadata(900)["timestamp"]
+    assert store.similarity_search("disk full", k=5, filters={"until": epoch(0)})
+
+    store.save()
+    loaded = LogVectorStore(index_path=store.index_path, embeddings=embeddings)
+    loaded.load(read_only=True)
+    assert len(loaded.similarity_search("disk full", k=5, filters={"since": epoch(800)})) == 1
+    loaded.docstore.close()
+    store.docstore.close()
+
+
+def test_in_batch_repeats_cover_their_whole_time_range(tmp_path, embeddings):
+    store = LogVectorStore(index_path=str(tmp_path / "index"), embeddings=embeddings, dedupe=True)
+    store.add_texts(["timeout"] * 3, metadatas=[metadata(50), metadata(10), metadata(90)])
+    assert list(store.metadata_index.candidates(since=epoch(80), until=epoch(20))) == [0]
+
+
+def test_level_filter_matches_any_entry_of_a_grouped_chunk(tmp_path, embeddings):
+    from logsense_ai.src.processing.chunker import EntryGrouper
+
+    entries = [(f"[{metadata(i)['timestamp']}] {level} [api]: step {i}", dict(metadata(i), level=level))
+               for i, level in enumerate(["INFO", "ERROR", "WARN"])]
+    chunks = list(EntryGrouper().group(entries))
+    assert len(chunks) == 1 and chunks[0][1]["level"] == "ERROR"
+
+    store = LogVectorStore(index_path=str(tmp_path / "index"), embeddings=embeddings)
+    store.add_texts([text for text, _ in chunks] + ["debug only"], metadatas=[chunks[0][1], metadata(9, level="DEBUG")])
+    for level in ("INFO", "WARN", "ERROR", ["DEBUG", "WARN"]):
+        assert 0 in store.metadata_index.candidates(level=level)
+    assert list(store.metadata_index.candidates(level="DEBUG")) == [1]
+    assert list(store.metadata_index.candidates(level="FATAL")) == []
+
+    store.save()
+    loaded = LogVectorStore(index_path=store.index_path, embeddings=embeddings)
+    loaded.load(read_only=True)
+    docs = loaded.similarity_search("step", k=5, filters={"level": "INFO"})
+    assert [doc.metadata["level"] for doc in docs] == ["ERROR"]
+    loaded.docstore.close()
+    store.docstore.close()
@@ -0,0 +1,54 @@
+import pytest
+from logsense_ai.benchmarks.llm_stub import DEFAULT_ANSWER, StubLLMServer
+from logsense_ai.src.models.rag_engine import RAGEngine
+from logsense_ai.src.models.vector_store import LogVectorStore
+
+TEXTS = ["payment failed: ERR_CARD_DECLINED for order 77", "db connection reset by peer", "cache miss for user profile"]
+
+
+@pytest.fixture
+def stub_llm():
+    with StubLLMServer() as server:
+        yield server
+
+
+@pytest.fixture
+def index_path(tmp_path, embeddings):
+    store = LogVectorStore(index_path=str(tmp_path / "index"), embeddings=embeddings)
+    store.add_texts(TEXTS, metadatas=[{"service": "api", "level": "ERROR"} for _ in TEXTS])
+    store.save()
+    store.docstore.close()
+    return store.index_path
+
+
+def make_engine(index_path, stub_llm, **kwargs):
+    return RAGEngine(index_path=index_path, llm_base_url=stub_llm.url, max_retries=0, **kwargs)
+
+
+def test_analyze_many_works_across_event_loops(index_path, stub_llm, hashing_model, monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    rag = make_engine(index_path, stub_llm, answer_cache_size=0)
+    # Each call runs its own event loop; pooled async connections must not outlive theirs.
+    for _ in range(3):
+        results = rag.analyze_many(["payment failed", "db reset"], k=1)
+        assert [result["answer"] for result in results] == [DEFAULT_ANSWER, DEFAULT_ANSWER]
+    assert stub_llm.requests == 6
+    assert rag.analyze_incident("payment failed", k=1)["answer"] == DEFAULT_ANSWER
+
+
+def test_identifier_queries_are_cached_without_the_embedding_model(index_path, stub_llm, hashing_model, monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    encoded = []
+    original = hashing_model.encode
+    monkeypatch.setattr(hashing_model, "encode", lambda texts, **kwargs: encoded.extend(texts) or original(texts, **kwargs))
+    rag = make_engine(index_path, stub_llm)
+
+    first = rag.analyze_incident("ERR_CARD_DECLINED", k=2)
+    second = rag.analyze_incident("err_card_declined", k=2)
+    assert first["source_logs"] == ["payment failed: ERR_CARD_DECLINED for order 77"]
+    assert second["answer"] == DEFAULT_ANSWER and second.get("cached")
+    assert stub_llm.requests == 1 and encoded == []
+
+    rag.analyze_incident("why did the database connection drop", k=2)
+    assert rag.analyze_incident("why did the database connection drop", k=2).get("cached")
+    assert stub_llm.requests == 2
@@ -0,0 +1,22 @@
+import os
+from logsense_ai.benchmarks.startup import HEAVY_MODULES, IMPORT_BUDGETS, measure_startup
+
+# Slow CI machines can loosen the budgets, e.g. STARTUP_BUDGET_SCALE=2.
+BUDGET_SCALE = float(os.getenv("STARTUP_BUDGET_SCALE", "1"))
+
+
+def test_entry_points_import_within_budget_without_heavy_modules():
+    results = measure_startup(IMPORT_BUDGETS, repeat=3, budget_scale=BUDGET_SCALE)
+    assert set(results) == set(IMPORT_BUDGETS)
+    for module, result in results.items():
+        assert not set(result["heavy_modules"]) & set(HEAVY_MODULES), f"{module} imports {result['heavy_modules']}"
+        assert result["import_ms"] <= IMPORT_BUDGETS[module] * BUDGET_SCALE * 1000, \
+            f"{module} took {result['import_ms']} ms (budget {result['budget_ms']} ms)"
+        assert result["ok"]
+
+
+def test_budgets_cover_every_cli_entry_point():
+    for module in ("logsense_ai.src.search", "logsense_ai.src.pipeline", "logsense_ai.src.detector", "logsense_ai.src.client"):
+        assert module in IMPORT_BUDGETS
+    for heavy in ("torch", "sentence_transformers", "faiss", "langchain_openai", "numpy"):
+        assert heavy in HEAVY_MODULES
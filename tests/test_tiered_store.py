@@ -0,0 +1,36 @@
+import pytest
+from logsense_ai.src.models.sharded_store import open_vector_store
+
+ERRORS = [f"[2026-10-01T12:00:{i:02d}] ERROR [api]: request {i} failed with upstream timeout" for i in range(20)]
+INFO = "[2026-10-01T12:01:00] INFO [billing]: invoice batch reconciled for tenant globex"
+
+
+def build(index_path, embeddings, info_tier):
+    store = open_vector_store(index_path, info_tier=info_tier, embeddings=embeddings)
+    store.add_texts(ERRORS + [INFO], metadatas=[{"service": "api", "level": "ERROR"}] * len(ERRORS)
+                    + [{"service": "billing", "level": "INFO"}])
+    store.save()
+    store.close()
+    store = open_vector_store(index_path, embeddings=embeddings)
+    store.load(read_only=True)
+    return store
+
+
+@pytest.mark.parametrize("info_tier", ["lexical", "templates"])
+def test_info_only_query_reaches_lower_tiers(tmp_path, embeddings, info_tier):
+    store = build(str(tmp_path / "index"), embeddings, info_tier)
+    # The hot tier alone has more than k chunks; the INFO evidence lives only in a lower tier.
+    docs = store.search("invoice batch reconciled for tenant", k=5)
+    assert len(docs) == 5
+    assert any("invoice batch reconciled" in doc.page_content for doc in docs)
+    assert any("ERROR" in doc.page_content for doc in docs)
+    store.close()
+
+
+def test_vector_mode_and_filters_stay_within_matching_tiers(tmp_path, embeddings):
+    store = build(str(tmp_path / "index"), embeddings, "lexical")
+    docs = store.search("invoice batch reconciled", k=5, mode="vector")
+    assert len(docs) == 5 and all(doc.metadata["level"] == "ERROR" for doc in docs)
+    docs = store.search("invoice", k=5, filters={"level": "INFO"})
+    assert [doc.page_content for doc in docs] == [INFO]
+    store.close()
@@ -0,0 +1,132 @@
+import os
+import subprocess
+import sys
+import textwrap
+from datetime import timedelta
+import pytest
+from helpers import BASE_TIME
+from logsense_ai.src.models.sharded_store import ShardedVectorStore, index_version
+from logsense_ai.src.models.vector_store import LogVectorStore
+from logsense_ai.src.models.versions import (IndexLockedError, VersionPin, WriterLock, current_version,
+                                             gc_versions, staged_version, versions_dir)
+
+
+def build(index_path, embeddings, texts):
+    store = LogVectorStore(index_path=index_path, embeddings=embeddings)
+    store.load()
+    store.add_texts(texts, metadatas=[{"service": "api"} for _ in texts])
+    store.save()
+    store.docstore.close()
+
+
+def count(index_path, embeddings):
+    store = LogVectorStore(index_path=index_path, embeddings=embeddings)
+    store.load(read_only=True)
+    total = store.index.ntotal
+    store.docstore.close()
+    return total
+
+
+def test_each_save_publishes_a_new_version(tmp_path, embeddings):
+    index_path = str(tmp_path / "index")
+    build(index_path, embeddings, ["first", "second"])
+    assert os.path.islink(index_path) and current_version(index_path) == "v000001"
+    assert index_version(index_path) == "v000001"
+
+    build(index_path, embeddings, ["third"])
+    assert current_version(index_path) == "v000002"
+    assert count(index_path, embeddings) == 3
+    assert sorted(os.listdir(versions_dir(index_path))) == ["v000001", "v000002"]
+
+
+def test_failed_write_publishes_nothing(tmp_path):
+    index_path = str(tmp_path / "index")
+    with pytest.raises(ValueError):
+        with staged_version(index_path) as staging_path:
+            open(os.path.join(staging_path, "partial"), "w").close()
+            raise ValueError("boom")
+    assert not os.path.lexists(index_path)
+    assert os.listdir(versions_dir(index_path)) == []
+
+
+def test_gc_keeps_versions_pinned_by_readers(tmp_path, embeddings):
+    index_path = str(tmp_path / "index")
+    build(index_path, embeddings, ["first"])
+    reader = LogVectorStore(index_path=index_path, embeddings=embeddings)
+    reader.load(read_only=True)
+    assert reader.version.version == "v000001"
+
+    for i in range(3):
+        build(index_path, embeddings, [f"more {i}"])
+    assert sorted(os.listdir(versions_dir(index_path))) == ["v000001", "v000003", "v000004"]
+    assert reader.similarity_search("first", k=1)[0].page_content == "first"
+
+    reader.docstore.close()
+    reader.version.release()
+    with WriterLock(index_path):
+        assert gc_versions(index_path) == ["v000001"]
+
+
+def test_pin_follows_the_current_version(tmp_path, embeddings):
+    index_path = str(tmp_path / "index")
+    build(index_path, embeddings, ["first"])
+    pin = VersionPin()
+    first = pin.acquire(index_path)
+    build(index_path, embeddings, ["second"])
+    assert pin.acquire(index_path) != first and pin.version == "v000002"
+    pin.release()
+
+
+def test_writer_lock_is_exclusive_across_processes(tmp_path):
+    index_path = str(tmp_path / "index")
+    holder = subprocess.Popen([sys.executable, "-c", textwrap.dedent(f"""
+        import sys
+        from logsense_ai.src.models.versions import WriterLock
+        with WriterLock({index_path!r}):
+            print("locked", flush=True)
+            sys.stdin.readline()
+        """)], cwd=os.getcwd(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        with pytest.raises(IndexLockedError, match=f"pid {holder.pid}"):
+            WriterLock(index_path, timeout=0.2, poll_interval=0.05).acquire()
+    finally:
+        holder.communicate("\n")
+    with WriterLock(index_path):
+        # Re-entrant within the process.
+        with WriterLock(index_path):
+            pass
+
+
+def test_unversioned_index_becomes_the_first_version(tmp_path, embeddings):
+    index_path = str(tmp_path / "index")
+    store = LogVectorStore(index_path=index_path, embeddings=embeddings)
+    store.add_texts(["legacy"], metadatas=[{"service": "api"}])
+    store.write(index_path)
+    store.docstore.close()
+    assert not os.path.islink(index_path)
+
+    build(index_path, embeddings, ["new"])
+    assert current_version(index_path) == "v000002"
+    assert count(index_path, embeddings) == 2
+    assert os.path.exists(os.path.join(versions_dir(index_path), "v000001", "index.faiss"))
+
+
+def test_sharded_versions_hard_link_unchanged_shards(tmp_path, embeddings):
+    index_path = str(tmp_path / "index")
+
+    def add(day, text):
+        store = ShardedVectorStore(index_path, shard_by="day", embeddings=embeddings)
+        store.load()
+        store.add_texts([text], metadatas=[{"service": "api", "timestamp": (BASE_TIME + timedelta(days=day)).isoformat()}])
+        store.save()
+        store.close()
+
+    add(0, "day zero")
+    add(1, "day one")
+    first_shard = BASE_TIME.strftime("%Y%m%d")
+    old = os.path.join(versions_dir(index_path), "v000001", "shards", first_shard, "index.faiss")
+    new = os.path.join(versions_dir(index_path), "v000002", "shards", first_shard, "index.faiss")
+    assert os.stat(old).st_ino == os.stat(new).st_ino
+    assert len(os.listdir(os.path.join(index_path, "shards"))) == 2